@@ -0,0 +1,63 @@
+"""
+Memory of Project.files as a FileSet compared to a list and to a deduplicating list and set of paths.
+FileSet is a list of the paths with a {path: stat} table, so it uses about as much as list + set.
+
+    python benchmarks/bench_file_set.py --files 1000000
+"""
+
+from __future__ import print_function
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets.file_set import FileSet
+
+
+def make_paths(count, frames=250):
+    """ frame sequences of render passes in deep shot folders, like a render farm project """
+
+    for i in range(count):
+        shot, frame = divmod(i, frames)
+        yield 'shots/sq{0:03d}/sh{1:04d}/renders/lighting/v003/beauty/beauty.{2:04d}.exr'.format(
+            shot // 50, shot, 1001 + frame)
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    container = build(make_paths(count))
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return container, memory
+
+
+def list_and_set(paths):
+    files = list()
+    seen = set()
+    for path in paths:
+        if path not in seen:
+            seen.add(path)
+            files.append(path)
+    return files, seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=1000000)
+    args = parser.parse_args()
+
+    results = list()
+    for name, build in (('list', list), ('list + set', list_and_set), ('FileSet', FileSet)):
+        container, memory = measure(build, args.files)
+        results.append(container)
+        print('{0:<12} {1:8.1f} MiB'.format(name, memory / 1024.0 / 1024.0))
+
+    assert list(results[2]) == results[0]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Project.compute_digests in one thread compared to pools of threads or processes, on synthetic files.
+
+    python benchmarks/bench_hashing.py --files 200 --size 16 --workers 1 4 8 --processes
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import Project
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--size', type=int, default=16, help='MiB per file')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--processes', action='store_true', help='hash in processes instead of threads')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+
+    try:
+        block = os.urandom(1024 * 1024)
+        for i in range(args.files):
+            with open(os.path.join(root, 'cache.{0:04d}.bgeo'.format(i)), 'wb') as f:
+                for _ in range(args.size):
+                    f.write(block)
+
+        expected = None
+        for workers in args.workers:
+            project = Project(root)
+            project.hash_workers = workers
+            project.hash_processes = args.processes
+            project.add_folders('.')
+
+            start = time.time()
+            digests = project.compute_digests()
+            elapsed = time.time() - start
+
+            assert expected is None or digests == expected
+            expected = digests
+            print('{0:3d} {1} {2:8.3f}s  {3:8.1f} MiB/s'.format(
+                workers, 'processes' if args.processes else 'threads  ', elapsed, args.files * args.size / elapsed))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Cost of the instrumentation hooks: requests to the stub Envoy without instrumentation, with the
+no-op Instrumentation and with a HistogramCollector, and the per endpoint summary it collects.
+
+    python benchmarks/bench_instrumentation.py --requests 500
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import HistogramCollector, Instrumentation
+from gridmarkets.http_client import HttpClient
+from stub_envoy import StubEnvoy
+
+
+def measure(url, requests, instrumentation):
+    client = HttpClient(instrumentation=instrumentation)
+    client.request('get', url)
+
+    start = time.time()
+    for _ in range(requests):
+        client.request('get', url)
+    return (time.time() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    stub = StubEnvoy().start()
+    url = stub.url + '/credits-info'
+    collector = HistogramCollector()
+
+    try:
+        for label, instrumentation in (('none', None), ('no-op', Instrumentation()), ('histograms', collector)):
+            print('{0:<12} {1:8.1f} us/request'.format(label, measure(url, args.requests, instrumentation) * 1e6))
+    finally:
+        stub.stop()
+
+    summary = collector.summary()['credits-info']
+    print('credits-info: {0} requests, network p50 {1:.2f} ms, p99 {2:.2f} ms'.format(
+        summary['requests'], summary['network_time']['p50'] * 1e3, summary['network_time']['p99'] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
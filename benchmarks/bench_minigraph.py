@@ -0,0 +1,53 @@
+"""
+Memory and build time of a Resolver on MiniGraph compared to CompactMiniGraph.
+
+    python benchmarks/bench_minigraph.py --products 20000 --plugins 8
+"""
+
+from __future__ import print_function
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import Resolver
+from synthetic import make_products
+
+
+def measure(products, compact):
+    gc.collect()
+    tracemalloc.start()
+    resolver = Resolver(products, compact=compact)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # time the build separately without tracing overhead
+    gc.collect()
+    start = time.time()
+    Resolver(products, compact=compact)
+    elapsed = time.time() - start
+
+    return resolver, memory, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--plugins', type=int, default=8)
+    args = parser.parse_args()
+
+    products = make_products(args.products, args.plugins, plugin_versions=2000)
+
+    for compact in (False, True):
+        resolver, memory, build = measure(products, compact)
+        print('{0:<16} nodes {1:>7} edges {2:>8}  memory {3:8.1f} MiB  build {4:6.3f}s'.format(
+            'CompactMiniGraph' if compact else 'MiniGraph', resolver.graph.order(), resolver.graph.size(),
+            memory / 1024.0 / 1024.0, build))
+
+
+if __name__ == '__main__':
+    main()
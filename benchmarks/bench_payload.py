@@ -0,0 +1,54 @@
+"""
+Size and encode time of the submit payload with the flat, grouped and tree file list encodings,
+each payload is sent to the stub Envoy which decodes it back.
+
+    python benchmarks/bench_payload.py --files 1000000
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import EnvoyClient, Project
+from gridmarkets.payload import FILES_ENCODINGS
+from bench_file_set import make_paths
+from stub_envoy import StubEnvoy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=1000000)
+    args = parser.parse_args()
+
+    server = StubEnvoy().start()
+
+    try:
+        project = Project(os.getcwd(), 'bench')
+        project.files = make_paths(args.files)
+        expected = list(project.files)
+
+        for encoding in FILES_ENCODINGS:
+            client = EnvoyClient('user@example.com', 'key', server.url, files_encoding=encoding)
+
+            start = time.time()
+            _, _, payload = client._submit_request(project, False, False)
+            size = len(json.dumps(payload))
+            encode = time.time() - start
+
+            client.submit_project(project)
+            assert sorted(server.last_files) == sorted(expected)
+            if encoding != 'tree':
+                assert server.last_files == expected
+
+            print('{0:<8} {1:8.1f} MiB  encode {2:6.3f}s'.format(encoding, size / 1024.0 / 1024.0, encode))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
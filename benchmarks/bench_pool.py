@@ -0,0 +1,55 @@
+"""
+Connections opened by repeated submit_projects batches with the default per thread sessions compared
+to a connection pool shared by all threads, against the stub Envoy.
+
+    python benchmarks/bench_pool.py --batches 20 --projects 16 --latency 0.005
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import EnvoyClient, Project
+from gridmarkets.connection_pool import PoolConfig
+from stub_envoy import StubEnvoy
+
+
+def measure(stub, batches, projects, pool):
+    client = EnvoyClient(email="EMAIL_ADDRESS", access_key="ACCESS_KEY", url=stub.url, pool=pool)
+    stub.connections = 0
+
+    start = time.time()
+    for _ in range(batches):
+        # every batch runs on new worker threads
+        batch = [Project('/tmp', 'bench_pool_{0}'.format(i)) for i in range(projects)]
+        results = client.submit_projects(batch, max_workers=projects, skip_upload=True)
+        assert all(r.ok for r in results)
+
+    return time.time() - start, stub.connections, client.http_client.metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--projects', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.005)
+    args = parser.parse_args()
+
+    stub = StubEnvoy(latency=args.latency).start()
+
+    try:
+        for label, pool in (('per thread sessions', None),
+                            ('shared pool', PoolConfig(max_per_host=args.projects))):
+            elapsed, connections, metrics = measure(stub, args.batches, args.projects, pool)
+            print('{0:<20} {1:7.3f}s  {2:5d} connections opened  {3}'.format(
+                label, elapsed, connections, metrics.snapshot() if metrics else ''))
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Resolver.resolve_many compared to one get_compatible_combinations call per query.
+
+    python benchmarks/bench_resolver.py --products 2000 --queries 1000 10000
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import Resolver
+from synthetic import make_products, make_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--queries', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+
+    for count in args.queries:
+        queries = make_queries(products, count)
+
+        # disable the query cache so both sides do the full work
+        resolver = Resolver(products, cache_size=0)
+        start = time.time()
+        expected = [resolver.get_compatible_combinations(q) for q in queries]
+        single = time.time() - start
+
+        resolver = Resolver(products, cache_size=0)
+        start = time.time()
+        results = resolver.resolve_many(queries)
+        batch = time.time() - start
+
+        assert results == expected
+        print('{0:>6} queries  single {1:8.3f}s  resolve_many {2:8.3f}s  speedup {3:5.1f}x'.format(
+            count, single, batch, single / batch))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Project.add_folders scanning compared to the former os.walk and os.path.relpath based scan,
+on a synthetic tree of files.
+
+    python benchmarks/bench_scan.py --files 1000000 --workers 8
+    python benchmarks/bench_scan.py --dir /mnt/nfs/bench_tree --files 1000000
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import Project
+
+
+def make_tree(root, files, files_per_dir=200, dirs_per_dir=10):
+    """ creates empty files spread over nested shot/frame like folders, unless the tree already exists """
+
+    marker = os.path.join(root, '.bench_files_{0}'.format(files))
+    if os.path.exists(marker):
+        return
+
+    folders = ['']
+    created = 0
+
+    while created < files:
+        folder = folders.pop(0)
+        for i in range(dirs_per_dir):
+            sub_folder = os.path.join(folder, 'dir{0:03d}'.format(i))
+            os.makedirs(os.path.join(root, sub_folder))
+            folders.append(sub_folder)
+
+            for j in range(min(files_per_dir, files - created)):
+                open(os.path.join(root, sub_folder, 'frame.{0:05d}.exr'.format(j)), 'w').close()
+                created += 1
+
+            if created >= files:
+                break
+
+    open(marker, 'w').close()
+
+
+def walk_files(root):
+    # the os.walk based scan add_folders used before
+    files = list()
+    for dir_name, _, dir_files in os.walk(root):
+        for dir_file in dir_files:
+            src_file = os.path.join(dir_name, dir_file)
+            src_file = os.path.relpath(src_file, root)
+            src_file = src_file.replace("\\", "/")
+            files.append(src_file)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--dir', help='folder to create the tree in and keep it for later runs')
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp()
+
+    try:
+        start = time.time()
+        make_tree(root, args.files)
+        print('tree of {0} files ready in {1:.1f}s'.format(args.files, time.time() - start))
+
+        start = time.time()
+        expected = walk_files(root)
+        walk = time.time() - start
+        print('os.walk           {0:8.3f}s'.format(walk))
+
+        for workers in args.workers:
+            project = Project(root)
+            project.scan_workers = workers
+            start = time.time()
+            project.add_folders(root)
+            elapsed = time.time() - start
+
+            files = [f for f in project.files if not f.startswith('.bench_files_')]
+            assert files == [f for f in expected if not f.startswith('.bench_files_')]
+            print('scandir {0:3d} workers {1:8.3f}s  speedup {2:5.1f}x'.format(workers, elapsed, walk / elapsed))
+    finally:
+        if not args.dir:
+            shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Time to build a Resolver from the products compared to loading it from a Resolver.save snapshot.
+
+    python benchmarks/bench_snapshot.py --products 20000 --plugins 8
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import Resolver
+from synthetic import make_products, make_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--plugins', type=int, default=8)
+    args = parser.parse_args()
+
+    products = make_products(args.products, args.plugins, plugin_versions=2000)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'resolver.snapshot')
+
+    try:
+        start = time.time()
+        built = Resolver(products)
+        build = time.time() - start
+
+        start = time.time()
+        built.save(path)
+        save = time.time() - start
+
+        start = time.time()
+        loaded = Resolver.load(path)
+        load = time.time() - start
+
+        queries = make_queries(products, 1000)
+        assert loaded.resolve_many(queries) == built.resolve_many(queries)
+
+        print('nodes {0}  edges {1}  snapshot {2:.1f} MiB'.format(
+            built.graph.order(), built.graph.size(), os.path.getsize(path) / 1024.0 / 1024.0))
+        print('build {0:6.3f}s  save {1:6.3f}s  load {2:6.3f}s  speedup {3:5.1f}x'.format(
+            build, save, load, build / load))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
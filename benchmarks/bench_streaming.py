@@ -0,0 +1,80 @@
+"""
+Peak memory of submit_project with the payload built in memory compared to a streamed payload,
+against the stub Envoy running in its own process so only the client's memory is measured.
+
+    python benchmarks/bench_streaming.py --files 100000 1000000
+"""
+
+from __future__ import print_function
+import argparse
+import gc
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import EnvoyClient, Project
+from bench_file_set import make_paths
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def start_stub(port):
+    stub = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_envoy.py'),
+                             '--port', str(port)], stdout=subprocess.PIPE)
+    # wait for the listening message
+    stub.stdout.readline()
+    return stub
+
+
+def measure(url, project, stream):
+    client = EnvoyClient('user@example.com', 'key', url, stream_payloads=stream)
+    client.validate_auth()
+    client.validate_credits()
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    client.submit_project(project)
+    elapsed = time.time() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, nargs='+', default=[100000, 1000000])
+    args = parser.parse_args()
+
+    port = free_port()
+    stub = start_stub(port)
+    url = 'http://127.0.0.1:{0}'.format(port)
+
+    try:
+        for count in args.files:
+            project = Project(os.getcwd(), 'bench')
+            project.files = make_paths(count)
+
+            for stream in (False, True):
+                peak, elapsed = measure(url, project, stream)
+                print('{0:>8} files  {1:<9} peak {2:8.1f} MiB  {3:6.2f}s'.format(
+                    count, 'streamed' if stream else 'in memory', peak / 1024.0 / 1024.0, elapsed))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == '__main__':
+    main()
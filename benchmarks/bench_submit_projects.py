@@ -0,0 +1,65 @@
+"""
+Throughput of EnvoyClient.submit_projects against a local stub Envoy with simulated latency.
+
+    python benchmarks/bench_submit_projects.py --projects 200 --latency 0.05
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets import EnvoyClient, Project, Job
+from stub_envoy import StubEnvoy
+
+
+def make_projects(count, root):
+    projects = list()
+
+    for i in range(count):
+        project = Project(root, 'bench {0}'.format(i))
+        project.add_jobs(Job('job', 'hou', '17.5.229', 'render', '/bench/scene.hip', frames='1 10 1'))
+        projects.append(project)
+
+    return projects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    server = StubEnvoy(latency=args.latency).start()
+    root = tempfile.mkdtemp()
+
+    try:
+        projects = make_projects(args.projects, root)
+
+        # baseline, what callers do today
+        client = EnvoyClient('bench@example.com', 'key', url=server.url)
+        start = time.time()
+        for project in projects:
+            client.submit_project(project)
+        elapsed = time.time() - start
+        print('serial submit_project      {0:8.2f} projects/s'.format(len(projects) / elapsed))
+
+        for workers in args.workers:
+            client = EnvoyClient('bench@example.com', 'key', url=server.url)
+            start = time.time()
+            results = client.submit_projects(projects, max_workers=workers)
+            elapsed = time.time() - start
+            assert all(r.ok for r in results)
+            print('submit_projects workers={0:<3} {1:8.2f} projects/s'.format(
+                workers, len(projects) / elapsed))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Minimal stand-in for the local Envoy web service used by the benchmarks.
+
+Run it standalone with `python benchmarks/stub_envoy.py --port 8090 --latency 0.05`
+or start it in-process with `StubEnvoy(latency=0.05).start()`.
+"""
+
+from __future__ import print_function
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gridmarkets.payload import ENCODINGS_HEADER, decode_files
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+
+PRODUCTS = [
+    {"app_type": "hou", "version": "17.5.229", "compatible_modules": ["hou_redshift:2.6.38", "hou_redshift:2.6.39"]},
+    {"app_type": "hou", "version": "17.5.173", "compatible_modules": ["hou_redshift:2.6.38"]},
+    {"app_type": "nuke", "version": "10.5v1", "compatible_modules": []},
+]
+
+
+class StubEnvoyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # send the headers and body in one write, separate small writes wait on delayed ACKs with keep-alive
+    wbufsize = -1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        body = self._read_raw_body()
+
+        encoding = self.headers.get('Content-Encoding')
+        self.server.request_encodings.append(encoding)
+
+        if encoding == 'gzip':
+            return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        if encoding == 'deflate':
+            return zlib.decompress(body)
+        return body
+
+    def _read_raw_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            return self._read_chunked()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _read_chunked(self):
+        chunks = list()
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+            if size == 0:
+                # skip the trailers up to the empty line ending the body
+                while self.rfile.readline().strip():
+                    pass
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _send_json(self, status, content, headers=None):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+
+        # compress large responses like /products for clients accepting it
+        if self.server.compress_responses and len(body) >= 1024 and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            self.send_header('Content-Encoding', 'gzip')
+
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_products(self):
+        etag = '"{0}"'.format(hashlib.sha1(json.dumps(self.server.products).encode('utf-8')).hexdigest())
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self._send_json(200, self.server.products, {'ETag': etag})
+
+    def _simulate_latency(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _unavailable(self):
+        # answers 503 like a restarting Envoy while server.unavailable is positive
+        with self.server._lock:
+            if self.server.unavailable <= 0:
+                return False
+            self.server.unavailable -= 1
+
+        self._send_json(503, {'error': 'starting'}, {'Retry-After': str(self.server.retry_after)})
+        return True
+
+    def do_GET(self):
+        self._simulate_latency()
+        self.server.count(self.path)
+
+        if self._unavailable():
+            return
+
+        if self.path == '/credits-info':
+            return self._send_json(200, {'credits_available': 100.0})
+
+        if self.path == '/products':
+            return self._send_products()
+
+        if self.path.startswith('/project-status/'):
+            return self._send_json(200, {'Code': 200, 'State': 'Submitted'})
+
+        self._send_json(404, {})
+
+    def do_POST(self):
+        if self.headers.get('Content-Encoding') and not self.server.accept_compressed:
+            self._read_raw_body()
+            return self._send_json(415, {'error': 'unsupported content encoding'})
+
+        body = self._read_body()
+        self._simulate_latency()
+        self.server.count(self.path)
+
+        if self._unavailable():
+            return
+
+        if self.path == '/auth':
+            headers = dict()
+            if self.server.files_encodings:
+                headers[ENCODINGS_HEADER] = ', '.join(self.server.files_encodings)
+            return self._send_json(200, {}, headers)
+
+        if self.path == '/project-submit':
+            payload = json.loads(body.decode('utf-8'))
+            self.server.last_files = decode_files(payload['project_files'])
+            return self._send_json(201, {})
+
+        if self.path == '/upload':
+            payload = json.loads(body.decode('utf-8'))
+            self.server.last_files = decode_files(payload['upload'][0])
+            name = payload['upload'][0]['remoteRoot'].lstrip('/')
+            return self._send_json(200, {'ID': name})
+
+        self._send_json(404, {})
+
+
+class StubEnvoy(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, products=None, handler=StubEnvoyHandler, files_encodings=('grouped', 'tree')):
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', port), handler)
+        self.latency = latency
+        self.products = products if products is not None else PRODUCTS
+        # compact file list encodings advertised to the clients, the decoded files of the last payload
+        self.files_encodings = files_encodings
+        self.last_files = None
+        # whether compressed request bodies are decoded or rejected with 415, and responses compressed
+        self.accept_compressed = True
+        self.compress_responses = True
+        self.request_encodings = list()
+        self.requests = dict()
+        self.connections = 0
+        # number of next requests answered 503, with a Retry-After of retry_after seconds
+        self.unavailable = 0
+        self.retry_after = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.server_address[1])
+
+    def count(self, path):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        ThreadingHTTPServer.process_request(self, request, client_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubEnvoy(args.port, args.latency)
+    print('stub Envoy listening on {0}'.format(server.url))
+    server.serve_forever()
@@ -0,0 +1,72 @@
+"""
+Synthetic product catalogs shaped like the Envoy /products response, for the resolver benchmarks.
+"""
+
+import random
+
+APP_TYPES = ['hou', 'maya', 'nuke', 'c4d', 'blender', 'vray', 'max', 'katana']
+PLUGIN_TYPES = ['redshift', 'arnold', 'vray', 'octane', 'renderman', 'yeti', 'ofx', 'xgen']
+
+
+def _version(rnd, app_type):
+    # mix the formats seen in the catalog, ex. Houdini's 17.5.229 and Nuke's 10.5v1
+    if app_type == 'nuke':
+        return '{0}.{1}v{2}'.format(rnd.randint(9, 13), rnd.randint(0, 5), rnd.randint(1, 9))
+
+    return '{0}.{1}.{2}'.format(rnd.randint(10, 25), rnd.randint(0, 9), rnd.randint(0, 500))
+
+
+def make_products(count, plugins_per_product=8, plugin_versions=200, seed=0):
+    """ returns count products, each compatible with plugins_per_product plugin versions """
+
+    rnd = random.Random(seed)
+    plugins = dict()
+
+    for app_type in APP_TYPES:
+        plugins[app_type] = ['{0}_{1}:{2}.{3}.{4}'.format(app_type, plugin_type, rnd.randint(1, 4), rnd.randint(0, 9), i)
+                             for plugin_type in PLUGIN_TYPES for i in range(plugin_versions // len(PLUGIN_TYPES))]
+
+    products = list()
+    seen = set()
+
+    while len(products) < count:
+        app_type = rnd.choice(APP_TYPES)
+        version = _version(rnd, app_type)
+
+        if (app_type, version) in seen:
+            continue
+
+        seen.add((app_type, version))
+        products.append({
+            'app_type': app_type,
+            'version': version,
+            'compatible_modules': rnd.sample(plugins[app_type], plugins_per_product),
+        })
+
+    return products
+
+
+def make_queries(products, count, seed=0):
+    """ returns count queries mixing types, partial versions and full versions of products and plugins """
+
+    rnd = random.Random(seed)
+    nodes = ['{0}:{1}'.format(p['app_type'], p['version']) for p in products]
+    nodes.extend(m for p in products for m in p['compatible_modules'])
+
+    queries = list()
+
+    for _ in range(count):
+        node = rnd.choice(nodes)
+        item_type, version = node.split(':')
+        kind = rnd.random()
+
+        if kind < 0.2:
+            queries.append([item_type])
+        elif kind < 0.6:
+            queries.append([node])
+        elif kind < 0.9:
+            queries.append(['{0}:{1}'.format(item_type, version.split('.')[0])])
+        else:
+            queries.append([node, rnd.choice(nodes)])
+
+    return queries
@@ -1,6 +1,15 @@
-from .envoy_client import EnvoyClient
+import sys
+from .envoy_client import EnvoyClient, SubmitResult
 from .project import Project
 from .resolver import Resolver
 from .job import Job
 from .watch_file import WatchFile
-from .errors import *
\ No newline at end of file
+from .catalog_cache import CatalogCache
+from .connection_pool import PoolConfig
+from .retry import RetryPolicy, CircuitBreaker
+from .instrumentation import Instrumentation, HistogramCollector
+from .status_watcher import StatusWatcher, StatusTransition
+from .errors import *
+
+if sys.version_info >= (3, 5):
+    from .async_envoy_client import AsyncEnvoyClient
@@ -0,0 +1,139 @@
+from . import errors
+from .async_http_client import AsyncHttpClient
+from .envoy_client import BaseEnvoyClient, AUTH_TTL, CREDITS_TTL
+from .payload import FILES_FLAT
+from .resolver import Resolver
+from .retry import CircuitBreaker, RetryPolicy
+
+
+class AsyncEnvoyClient(BaseEnvoyClient):
+    """asyncio client to access Envoy Service API
+
+    Exposes the same methods as EnvoyClient as coroutines and raises the same errors.
+    The client should be closed when no longer needed, either with `await client.close()`
+    or by using it as an async context manager.
+    """
+
+    def __init__(self, email=None, access_key=None, url=None, auth_ttl=AUTH_TTL, credits_ttl=CREDITS_TTL,
+                 files_encoding=FILES_FLAT, stream_payloads=False, compression=None, pool=None,
+                 retry=None, circuit_breaker=None, instrumentation=None):
+        super(AsyncEnvoyClient, self).__init__(email, access_key, url, auth_ttl, credits_ttl, files_encoding,
+                                               stream_payloads)
+        self.http_client = AsyncHttpClient(compression=compression, pool=pool,
+                                           retry=RetryPolicy() if retry is True else retry,
+                                           circuit_breaker=CircuitBreaker() if circuit_breaker is True else circuit_breaker,
+                                           instrumentation=instrumentation)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self.http_client.close()
+
+    async def _get_products(self):
+        url = self._products_request()
+
+        try:
+            resp = await self.http_client.request('get', url, handled=True)
+        except errors.APIError:
+            raise
+        except Exception as e:
+            raise errors.APIError(e)
+        else:
+            return self.http_client.handle_response(resp, self._handle_products_response, url, resp)
+
+    async def validate_auth(self):
+        if self.validation_cache.is_valid('auth'):
+            return True
+
+        url, headers, post_data = self._auth_request()
+
+        try:
+            resp = await self.http_client.request('post', url, headers, post_data, idempotent=True, handled=True)
+        except errors.APIError:
+            raise
+        except Exception as e:
+            raise errors.APIError(e)
+        else:
+            return self.http_client.handle_response(resp, self._handle_auth_response, url, resp)
+
+    async def validate_credits(self):
+        if self.validation_cache.is_valid('credits'):
+            return
+
+        url = self._credits_request()
+
+        try:
+            resp = await self.http_client.request('get', url, handled=True)
+        except errors.APIError:
+            raise
+        except Exception as e:
+            raise errors.APIError(e)
+        else:
+            self.http_client.handle_response(resp, self._handle_credits_response, url, resp)
+
+    async def get_product_resolver(self, type_labels=None):
+        await self.validate_auth()
+
+        products = await self._get_products()
+        return Resolver(products)
+
+    async def upload_project_files(self, project):
+        await self.validate_auth()
+        await self.validate_credits()
+
+        url, headers, post_data = self._upload_request(project)
+
+        try:
+            resp = await self.http_client.request(
+                'post', url, headers, post_data, idempotent=True, handled=True)
+        except errors.APIError:
+            raise
+        except Exception as e:
+            raise errors.APIError(e)
+        else:
+            return self.http_client.handle_response(resp, self._handle_upload_response, project, resp)
+
+    async def submit_project(self, project, skip_upload=False, skip_auto_download=False):
+        await self.validate_auth()
+        await self.validate_credits()
+
+        url, headers, post_data = self._submit_request(project, skip_upload, skip_auto_download)
+
+        try:
+            resp = await self.http_client.request(
+                'post', url, headers, post_data, handled=True)
+        except errors.APIError:
+            raise
+        except Exception as e:
+            raise errors.APIError(str(e))
+        else:
+            return self.http_client.handle_response(resp, self._handle_submit_response, url, project, resp)
+
+    async def record_upload(self, project, status=None):
+        """ records the files of an incremental_upload project as uploaded once Envoy finished uploading them
+
+        See EnvoyClient.record_upload.
+        """
+
+        if status is None:
+            status = await self.get_project_status(project.name)
+
+        return self._record_upload(project, status)
+
+    async def get_project_status(self, name):
+        await self.validate_auth()
+
+        url = self._project_status_request(name)
+
+        try:
+            resp = await self.http_client.request('get', url, handled=True)
+        except errors.APIError:
+            raise
+        except Exception as e:
+            raise errors.APIError(e)
+        else:
+            return self.http_client.handle_response(resp, self._handle_project_status_response, url, resp)
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import textwrap
+import time
+from . import errors
+from .compression import COMPRESSION_THRESHOLD, DEFLATE, GZIP, REJECTED_STATUS, compress, compress_chunks
+from .connection_pool import ConnectionMetrics
+from .instrumentation import RequestInfo, finish_request, handle_response
+from .payload import JsonStream
+from .retry import FAILURE_STATUSES, IDEMPOTENT_METHODS, RetryMetrics
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class HttpResponse(object):
+    """Fully read response exposing the subset of requests.Response used by the Envoy clients"""
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers else dict()
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _AsyncChunks(object):
+    """Async iterator over the byte chunks of a streamed body, aiohttp sends it with chunked transfer encoding"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncHttpClient(object):
+    """asyncio HTTP transport for AsyncEnvoyClient, requires the aiohttp package"""
+
+    def __init__(self, timeout=80, session=None, compression=None, compression_threshold=COMPRESSION_THRESHOLD,
+                 pool=None, retry=None, circuit_breaker=None, instrumentation=None, **kwargs):
+        """Constructor
+
+        :param compression: 'gzip' or 'deflate' to compress request bodies, like HttpClient
+        :param compression_threshold: minimum bytes of a request body to be compressed
+        :param pool: PoolConfig of the session's connector, which then counts its connections in metrics
+        :param retry: RetryPolicy of failed requests, like HttpClient
+        :param circuit_breaker: CircuitBreaker failing requests fast while Envoy is down
+        :param instrumentation: Instrumentation whose hooks are called around every request, like HttpClient
+        """
+
+        if compression not in (None, GZIP, DEFLATE):
+            raise ValueError("unknown compression: {0}".format(compression))
+
+        self._session = session
+        self._owns_session = session is None
+        self._timeout = timeout
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compression_rejected = False
+
+        self.pool = pool
+        self.metrics = ConnectionMetrics() if pool is not None else None
+
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.retry_metrics = RetryMetrics()
+
+        self.instrumentation = instrumentation
+
+    def _connector_kwargs(self, aiohttp):
+        if self.pool is None:
+            return dict()
+
+        # aiohttp counts reused connections, a connection it had to open is counted once it is ready
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._count_created)
+        trace_config.on_connection_reuseconn.append(self._count_reused)
+
+        connector = aiohttp.TCPConnector(
+            limit=self.pool.max_connections or 0,
+            limit_per_host=self.pool.max_per_host,
+            force_close=not self.pool.keep_alive,
+            **({'keepalive_timeout': self.pool.idle_timeout}
+               if self.pool.keep_alive and self.pool.idle_timeout is not None else {}))
+
+        return {'connector': connector, 'trace_configs': [trace_config]}
+
+    async def _count_created(self, session, context, params):
+        self.metrics.count('created')
+
+    async def _count_reused(self, session, context, params):
+        self.metrics.count('reused')
+
+    def _get_session(self):
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError(
+                    "AsyncEnvoyClient requires aiohttp, install it with `pip install aiohttp`")
+
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self._timeout), **self._connector_kwargs(aiohttp))
+
+        return self._session
+
+    async def request(self, method, url, headers=None, post_data=None, idempotent=None, endpoint=None,
+                      handled=False):
+        """ sends the request, retrying it according to the retry policy and reporting it like HttpClient
+
+        Responses of requests made with handled=True are reported once passed to handle_response, which must be called.
+        """
+
+        # fails early with a helpful message if aiohttp is missing
+        self._get_session()
+
+        if idempotent is None:
+            idempotent = method.lower() in IDEMPOTENT_METHODS
+
+        info = None
+        if self.instrumentation is not None:
+            info = RequestInfo(method, url, endpoint)
+            self.instrumentation.before_request(info)
+
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            if self.circuit_breaker is not None:
+                try:
+                    self.circuit_breaker.allow()
+                except errors.CircuitOpenError as e:
+                    self.retry_metrics.count('rejected')
+                    self._report_error(info, e)
+                    raise
+
+            self.retry_metrics.count('attempts')
+
+            try:
+                response = await self._attempt(method, url, headers, post_data, info)
+            except Exception as e:
+                self._record_outcome(False)
+
+                delay = None
+                if self.retry is not None and self._is_transport_error(e):
+                    delay = self.retry.error_delay(attempt, idempotent, self._request_sent(e))
+
+                if delay is None:
+                    self._report_error(info, e)
+                    self._handle_request_error(e)
+            else:
+                self._record_outcome(response.status_code not in FAILURE_STATUSES)
+
+                delay = None
+                if self.retry is not None:
+                    delay = self.retry.response_delay(
+                        attempt, idempotent, response.status_code, response.headers.get('Retry-After'))
+
+                if delay is None:
+                    if info is not None:
+                        info.status = response.status_code
+                        if handled:
+                            response.request_info = info
+                        else:
+                            finish_request(self.instrumentation, info)
+                    return response
+
+            self.retry_metrics.count('retries')
+            await asyncio.sleep(delay)
+
+    def handle_response(self, response, handler, *args):
+        """ returns handler(*args), the handler's time is reported as the decode time of the response's request
+
+        Required for the responses of requests made with handled=True, like HttpClient.handle_response.
+        """
+
+        return handle_response(self.instrumentation, response, handler, *args)
+
+    def _report_error(self, info, e):
+        if info is not None:
+            info.error = e
+            finish_request(self.instrumentation, info)
+
+    def _record_outcome(self, success):
+        if self.circuit_breaker is None:
+            return
+
+        if success:
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+
+    def _is_transport_error(self, e):
+        import aiohttp
+
+        return isinstance(e, (asyncio.TimeoutError, aiohttp.ClientError))
+
+    def _request_sent(self, e):
+        import aiohttp
+
+        # a refused connection means the server never saw the request
+        return not isinstance(e, aiohttp.ClientConnectorError)
+
+    async def _attempt(self, method, url, headers, post_data, info=None):
+        if info is None:
+            return await self._send_body(method, url, headers, post_data)
+
+        info.attempts += 1
+        start = _now()
+        network_time = info.network_time
+
+        try:
+            return await self._send_body(method, url, headers, post_data, info)
+        finally:
+            # the attempt's time not spent sending is spent encoding and compressing the body
+            info.serialize_time += (_now() - start) - (info.network_time - network_time)
+
+    async def _send_body(self, method, url, headers, post_data, info=None):
+        body = self._body(post_data)
+
+        if not self._should_compress(body):
+            return await self._send(method, url, headers, body, info)
+
+        compressed_headers = dict(headers or dict())
+        compressed_headers['Content-Encoding'] = self.compression
+
+        if isinstance(body, bytes):
+            response = await self._send(method, url, compressed_headers, compress(body, self.compression), info)
+        else:
+            response = await self._send(
+                method, url, compressed_headers, compress_chunks(body, self.compression), info)
+            body = self._body(post_data)
+
+        if response.status_code != REJECTED_STATUS:
+            return response
+
+        # the server may not decode compressed bodies, send it again as is
+        plain = await self._send(method, url, headers, body, info)
+
+        self.compression_rejected = True
+
+        return plain
+
+    def _body(self, post_data):
+        if isinstance(post_data, JsonStream):
+            return iter(post_data)
+
+        return json.dumps(post_data).encode('utf-8') if post_data else None
+
+    def _should_compress(self, body):
+        if not self.compression or self.compression_rejected or body is None:
+            return False
+
+        return not isinstance(body, bytes) or len(body) >= self.compression_threshold
+
+    async def _send(self, method, url, headers, body, info=None):
+        if info is None:
+            return await self._session_request(method, url, headers, body)
+
+        if isinstance(body, bytes):
+            info.bytes_sent += len(body)
+        elif body is not None:
+            body = info.count_chunks(body)
+
+        start = _now()
+        try:
+            response = await self._session_request(method, url, headers, body)
+        finally:
+            info.network_time += _now() - start
+
+        info.bytes_received += len(response.content)
+        return response
+
+    async def _session_request(self, method, url, headers, body):
+        session = self._get_session()
+
+        async with session.request(
+            method,
+            url,
+            headers=headers,
+            data=body if body is None or isinstance(body, bytes) else _AsyncChunks(body)
+        ) as resp:
+            content = await resp.read()
+            return HttpResponse(resp.status, content, dict(resp.headers))
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _handle_request_error(self, e):
+        import aiohttp
+
+        if isinstance(e, asyncio.TimeoutError) or isinstance(
+            e, aiohttp.ClientConnectionError
+        ):
+            msg = (
+                "Unexpected error communicating with Envoy."
+                "Please start Envoy and retry."
+            )
+            err = "%s: %s" % (type(e).__name__, str(e))
+        # Catch remaining client exceptions
+        elif isinstance(e, aiohttp.ClientError):
+            msg = (
+                "Unexpected error communicating with Envoy."
+            )
+            err = "%s: %s" % (type(e).__name__, str(e))
+        else:
+            msg = (
+                "Unexpected error communicating with Envoy."
+            )
+            err = "A %s was raised" % (type(e).__name__,)
+            if str(e):
+                err += " with error message %s" % (str(e),)
+            else:
+                err += " with no error message"
+
+        msg = textwrap.fill(msg) + "\n\n(Network error: %s)" % (err,)
+        raise errors.APIError(msg)
@@ -0,0 +1,103 @@
+from __future__ import absolute_import
+from builtins import object
+import errno
+import hashlib
+import json
+import logging
+import os
+import time
+from .fileutil import atomic_write, user_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# default seconds after which a cached catalog is revalidated with Envoy
+CATALOG_MAX_AGE = 3600
+
+
+def content_hash(content):
+    """ hash used to detect unchanged catalogs when Envoy does not support conditional requests """
+
+    return hashlib.sha256(content).hexdigest()
+
+
+class CatalogCache(object):
+    """On-disk cache of the product catalog shared by all processes of the user on the workstation"""
+
+    def __init__(self, cache_dir=None, max_age=CATALOG_MAX_AGE):
+        """Constructor
+
+        :param cache_dir: folder of the cache files, defaults to the user's cache folder
+        :param max_age: seconds after which a cached catalog is stale and revalidated
+        """
+
+        self.cache_dir = cache_dir or user_cache_dir()
+        self.max_age = max_age
+
+    def path(self, url):
+        """ returns the cache file path of the catalog served at url """
+
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, 'products-{0}.json'.format(key))
+
+    def load(self, url):
+        """ returns the cached entry for url or None if missing or unreadable
+
+        The entry is a dict with the keys products, hash, etag, last_modified and fetched_at.
+        """
+
+        path = self.path(url)
+
+        try:
+            with open(path, 'rb') as f:
+                entry = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOENT:
+                logger.warning("cannot read the product catalog cache %s: %s", path, e)
+            return None
+        except ValueError as e:
+            logger.warning("ignoring the corrupt product catalog cache %s: %s", path, e)
+            return None
+
+        if not isinstance(entry, dict) or entry.get('url') != url or 'products' not in entry:
+            return None
+
+        return entry
+
+    def save(self, url, products, digest=None, etag=None, last_modified=None):
+        """ writes the catalog to the cache and returns its entry
+
+        The cache only saves requests, so the entry is returned even if it could not be written,
+        ex. to a read-only or full cache folder.
+        """
+
+        entry = dict()
+        entry['url'] = url
+        entry['fetched_at'] = time.time()
+        entry['hash'] = digest
+        entry['etag'] = etag
+        entry['last_modified'] = last_modified
+        entry['products'] = products
+
+        path = self.path(url)
+
+        try:
+            atomic_write(path, json.dumps(entry).encode('utf-8'))
+        except (IOError, OSError) as e:
+            logger.warning("cannot write the product catalog cache %s: %s", path, e)
+
+        return entry
+
+    def touch(self, entry):
+        """ marks a revalidated entry as fresh """
+
+        return self.save(entry['url'], entry['products'], entry.get('hash'), entry.get('etag'),
+                         entry.get('last_modified'))
+
+    def is_stale(self, entry):
+        return self.max_age is not None and time.time() - entry.get('fetched_at', 0) >= self.max_age
+
+    def clear(self, url):
+        try:
+            os.remove(self.path(url))
+        except OSError:
+            pass
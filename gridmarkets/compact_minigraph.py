@@ -0,0 +1,300 @@
+from __future__ import absolute_import
+from builtins import object
+from array import array
+from .minigraph import MiniGraphError
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    MappingProxyType = dict
+
+# edges of a compact graph carry no data, they all share one read only empty mapping
+EMPTY_DATA = MappingProxyType({})
+
+# nodes without edges in one direction share one empty adjacency until their first edge
+_NO_EDGES = ()
+
+_TYPECODE = 'i'
+
+
+def _check_edge(edge):
+    edgelen = len(edge)
+    if edgelen == 5:
+        start, end, label, data, directed = edge
+    elif edgelen == 2:
+        start, end = edge; label = data = None; directed = True
+    elif edgelen == 4:
+        start, end, label, data = edge; directed = True
+    elif edgelen == 3:
+        start, end, label = edge; data = None; directed = True
+    else:
+        raise MiniGraphError('Invalid edge: {}'.format(edge))
+
+    if label is not None or data or directed is not True:
+        raise MiniGraphError(
+            'CompactMiniGraph only supports directed edges without label or data: {}'.format(edge))
+
+    return start, end
+
+
+class CompactMiniGraph(object):
+    """
+    Memory compact variant of MiniGraph for graphs of directed edges without labels or data,
+    like the product catalog graph.
+
+    Node ids are interned to integers and the adjacency of every node is kept in integer arrays.
+    Edge tuples have the same (start, end, label, data, directed) shape as in MiniGraph but are
+    created on demand and share one read only empty data mapping.
+    """
+
+    __slots__ = ('_ids', '_index', '_data', '_out', '_in', '_size', '_mutations',
+                 '_edge_cache', '_edge_cache_mutations')
+
+    def __init__(self, nodes=None, edges=None):
+        self._ids = []
+        self._index = {}
+        self._data = []
+        self._out = []
+        self._in = []
+        self._size = 0
+        self._mutations = 0
+        self._edge_cache = None
+        self._edge_cache_mutations = None
+        if nodes is not None:
+            self.add_nodes(nodes)
+        if edges is not None:
+            self.add_edges(edges)
+
+    @classmethod
+    def fast_init(cls, nodes=None, edges=None):
+        return cls(nodes, edges)
+
+    fast_init2 = fast_init
+
+    @classmethod
+    def from_adjacency(cls, nodeids, data, offsets, targets, in_offsets=None, in_targets=None):
+        """
+        Builds the graph from interned node ids and a CSR style out adjacency, where the
+        successors of node i are targets[offsets[i]:offsets[i + 1]]. The in adjacency is
+        derived from it unless given in the same form.
+        """
+        g = cls()
+        g._ids = list(nodeids)
+        g._index = dict((nid, i) for i, nid in enumerate(g._ids))
+        g._data = list(data)
+        g._out = _split_adjacency(offsets, targets)
+
+        if in_offsets is not None:
+            g._in = _split_adjacency(in_offsets, in_targets)
+        else:
+            ins = [None] * len(g._ids)
+            for i, out in enumerate(g._out):
+                for j in out:
+                    if ins[j] is None:
+                        ins[j] = array(_TYPECODE)
+                    ins[j].append(i)
+            g._in = [a if a is not None else _NO_EDGES for a in ins]
+
+        g._size = len(targets)
+        return g
+
+    @property
+    def mutation_count(self):
+        """Number of changes made to the graph, lets callers invalidate derived data"""
+        return self._mutations
+
+    def _intern(self, nodeid, data=None):
+        idx = self._index.get(nodeid)
+        if idx is None:
+            idx = len(self._ids)
+            self._index[nodeid] = idx
+            self._ids.append(nodeid)
+            self._data.append({} if data is None else data)
+            self._out.append(_NO_EDGES)
+            self._in.append(_NO_EDGES)
+        elif data is not None:
+            self._data[idx].update(data)
+        return idx
+
+    def add_node(self, nodeid, data=None):
+        self._mutations += 1
+        self._intern(nodeid, data)
+
+    def add_nodes(self, nodes):
+        for node in nodes:
+            try:
+                node, data = node
+            except TypeError:
+                data = {}
+            self.add_node(node, data=data)
+
+    def remove_node(self, nodeid):
+        idx = self._index.pop(nodeid)
+        self._mutations += 1
+
+        removed = 0
+        for end in set(self._out[idx]):
+            if end != idx:
+                self._in[end] = _without(self._in[end], idx)
+            removed += 1
+        for start in set(self._in[idx]):
+            if start != idx:
+                self._out[start] = _without(self._out[start], idx)
+                removed += 1
+        self._size -= removed
+
+        # leave a hole so the ids of the other nodes stay valid
+        self._ids[idx] = None
+        self._data[idx] = None
+        self._out[idx] = _NO_EDGES
+        self._in[idx] = _NO_EDGES
+
+    def __contains__(self, nodeid):
+        return nodeid in self._index
+
+    def node(self, nodeid):
+        idx = self._index[nodeid]
+        return (nodeid, self._data[idx], _AdjacencyView(self, idx, True), _AdjacencyView(self, idx, False))
+
+    def nodes(self):
+        data = self._data
+        return [(nid, data[i]) for nid, i in self._index.items()]
+
+    def add_edge(self, start, end, label=None, data=None, directed=True):
+        self.add_edges([(start, end, label, data, directed)])
+
+    def add_edges(self, edges):
+        self._mutations += 1
+        out, ins, intern = self._out, self._in, self._intern
+
+        for edge in edges:
+            start, end = _check_edge(edge)
+            s = intern(start)
+            e = intern(end)
+
+            if e in out[s]:
+                continue
+
+            if not out[s]:
+                out[s] = array(_TYPECODE)
+            out[s].append(e)
+            if not ins[e]:
+                ins[e] = array(_TYPECODE)
+            ins[e].append(s)
+            self._size += 1
+
+    def remove_edge(self, start, end, label=None, directed=None):
+        if label is not None:
+            raise KeyError(label)
+        s = self._index[start]
+        e = self._index[end]
+        if e not in self._out[s]:
+            raise KeyError(end)
+        if directed is not None:
+            assert directed is True
+        self._mutations += 1
+        self._out[s] = _without(self._out[s], e)
+        self._in[e] = _without(self._in[e], s)
+        self._size -= 1
+
+    def edge(self, start, end, label=None, directed=None):
+        if label is not None:
+            raise KeyError(label)
+        if self._index[end] not in self._out[self._index[start]]:
+            raise KeyError(end)
+        if directed is not None:
+            assert directed is True
+        return (start, end, None, EMPTY_DATA, True)
+
+    def iter_edges(self):
+        """Iterates the edges without building a list, the graph must not change while iterating"""
+        ids = self._ids
+        for s, out in enumerate(self._out):
+            for e in out:
+                yield (ids[s], ids[e], None, EMPTY_DATA, True)
+
+    def edges(self):
+        """Returns a new list of the edges, copied from a snapshot cached until the graph changes"""
+        if self._edge_cache_mutations != self._mutations:
+            self._edge_cache = tuple(self.iter_edges())
+            self._edge_cache_mutations = self._mutations
+        return list(self._edge_cache)
+
+    def successors(self, nodeid):
+        ids = self._ids
+        return [ids[j] for j in self._out[self._index[nodeid]]]
+
+    def predecessors(self, nodeid):
+        ids = self._ids
+        return [ids[j] for j in self._in[self._index[nodeid]]]
+
+    def order(self):
+        return len(self._index)
+
+    def size(self):
+        return self._size
+
+    def degree(self, nodeid):
+        idx = self._index[nodeid]
+        return len(self._out[idx]) + len(self._in[idx])
+
+    def out_degree(self, nodeid):
+        return len(self._out[self._index[nodeid]])
+
+    def in_degree(self, nodeid):
+        return len(self._in[self._index[nodeid]])
+
+    def subgraph(self, nodeids):
+        nidset = set(nodeids)
+        return CompactMiniGraph(
+            nodes=[(nid, self._data[self._index[nid]]) for nid in nodeids],
+            edges=[(start, end) for start in nodeids
+                   for end in self.successors(start) if end in nidset]
+        )
+
+
+class _AdjacencyView(Mapping):
+    """Read only {label: {nodeid: edge}} view of a node's adjacency, shaped like the MiniGraph node dicts"""
+
+    __slots__ = ('_graph', '_idx', '_outgoing')
+
+    def __init__(self, graph, idx, outgoing):
+        self._graph = graph
+        self._idx = idx
+        self._outgoing = outgoing
+
+    def _adjacency(self):
+        g = self._graph
+        return g._out[self._idx] if self._outgoing else g._in[self._idx]
+
+    def __getitem__(self, label):
+        adjacency = self._adjacency()
+        if label is not None or not adjacency:
+            raise KeyError(label)
+        ids = self._graph._ids
+        nodeid = ids[self._idx]
+        if self._outgoing:
+            return dict((ids[j], (nodeid, ids[j], None, EMPTY_DATA, True)) for j in adjacency)
+        return dict((ids[j], (ids[j], nodeid, None, EMPTY_DATA, True)) for j in adjacency)
+
+    def __iter__(self):
+        if self._adjacency():
+            yield None
+
+    def __len__(self):
+        return 1 if self._adjacency() else 0
+
+
+def _split_adjacency(offsets, targets):
+    return [array(_TYPECODE, targets[offsets[i]:offsets[i + 1]]) if offsets[i] != offsets[i + 1] else _NO_EDGES
+            for i in range(len(offsets) - 1)]
+
+
+def _without(adjacency, idx):
+    remaining = array(_TYPECODE, (j for j in adjacency if j != idx))
+    return remaining if remaining else _NO_EDGES
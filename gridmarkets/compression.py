@@ -0,0 +1,43 @@
+from __future__ import absolute_import
+import zlib
+
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+
+# request bodies smaller than this are sent uncompressed, compressing them saves less than it costs
+COMPRESSION_THRESHOLD = 16 * 1024
+
+# status of a server rejecting a compressed body, other errors may be genuine so the body is not sent again
+REJECTED_STATUS = 415
+
+_WBITS = {
+    GZIP: 16 + zlib.MAX_WBITS,
+    # HTTP deflate is the zlib format
+    DEFLATE: zlib.MAX_WBITS,
+}
+
+
+def _compressor(encoding, level):
+    if encoding not in _WBITS:
+        raise ValueError("unknown content encoding: {0}".format(encoding))
+    return zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+
+
+def compress(data, encoding=GZIP, level=6):
+    """ returns the bytes compressed in the gzip or deflate content encoding """
+
+    compressor = _compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_chunks(chunks, encoding=GZIP, level=6):
+    """ yields the compressed stream of byte chunks, for streamed request bodies """
+
+    compressor = _compressor(encoding, level)
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
@@ -0,0 +1,105 @@
+from __future__ import absolute_import
+from builtins import object
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_now = getattr(time, 'monotonic', time.time)
+
+
+class PoolConfig(object):
+    """Connection pool settings of HttpClient and AsyncHttpClient"""
+
+    def __init__(self, max_connections=None, max_per_host=10, max_hosts=10, keep_alive=True, idle_timeout=None,
+                 block=False):
+        """Constructor
+
+        :param max_connections: maximum requests in flight over all hosts, None for no limit
+        :param max_per_host: connections kept open to each host
+        :param max_hosts: hosts whose connections are kept open
+        :param keep_alive: reuse connections, False closes them after every request
+        :param idle_timeout: seconds after which an unused connection is closed rather than reused, None to
+            reuse it until the server closes it
+        :param block: wait for a free connection once max_per_host are in use, instead of opening extra
+            connections which are closed afterwards
+        """
+
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.max_hosts = max_hosts
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self.block = block
+
+
+class ConnectionMetrics(object):
+    """Thread safe counters of the connections opened and reused by a pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.expired = 0
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        """ returns the counters as a dict """
+        with self._lock:
+            return {'created': self.created, 'reused': self.reused, 'expired': self.expired}
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.snapshot())
+
+
+class _MeteredPoolMixin(object):
+    metrics = None
+    idle_timeout = None
+
+    def _get_conn(self, timeout=None):
+        conn = super(_MeteredPoolMixin, self)._get_conn(timeout)
+
+        if getattr(conn, 'sock', None) is not None:
+            idle_since = getattr(conn, '_idle_since', None)
+            if self.idle_timeout is not None and idle_since is not None and _now() - idle_since > self.idle_timeout:
+                # the server may have closed it in the meantime, reconnect instead
+                conn.close()
+                self.metrics.count('expired')
+            else:
+                self.metrics.count('reused')
+                return conn
+
+        # the connection opens its socket when sending the request
+        self.metrics.count('created')
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._idle_since = _now()
+        super(_MeteredPoolMixin, self)._put_conn(conn)
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    requests transport adapter with a PoolConfig sized pool counting its connections in a ConnectionMetrics.
+    One adapter can be mounted on the sessions of many threads, which then share its pool.
+    """
+
+    def __init__(self, config=None, metrics=None):
+        self.pool_config = config or PoolConfig()
+        self.metrics = metrics or ConnectionMetrics()
+        super(PooledAdapter, self).__init__(
+            pool_connections=self.pool_config.max_hosts, pool_maxsize=self.pool_config.max_per_host,
+            pool_block=self.pool_config.block)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super(PooledAdapter, self).init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+        attributes = {'metrics': self.metrics, 'idle_timeout': self.pool_config.idle_timeout}
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('MeteredHTTPConnectionPool', (_MeteredPoolMixin, HTTPConnectionPool), attributes),
+            'https': type('MeteredHTTPSConnectionPool', (_MeteredPoolMixin, HTTPSConnectionPool), attributes),
+        }
@@ -0,0 +1,267 @@
+from __future__ import absolute_import
+from builtins import object
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+import threading
+from .fileutil import atomic_write, user_cache_dir
+
+# bumped when the parsers change, so cached results of older parsers are not used
+PARSER_VERSION = 1
+
+# Nuke: file and proxy knobs of Read, ReadGeo, Camera... nodes, ex. 'file /shots/plate.####.exr'
+_NUKE_RE = re.compile(r'^\s*(?:file|proxy|vfield_file)\s+(?:"((?:[^"\\]|\\.)*)"|(\S+))', re.MULTILINE)
+
+# Arnold: filename parameters of image and procedural nodes, ex. 'filename "textures/wood.tx"'
+_ARNOLD_RE = re.compile(r'(?:^|\s)(?:filename|dso)\s+"([^"]*)"', re.MULTILINE)
+
+# USD: asset paths of references, payloads, sublayers and asset attributes, ex. @./props/chair.usda@
+_USD_RE = re.compile(r'@@@(.+?)@@@|@([^@\s]+)@')
+
+# Maya ASCII: file references and string file attributes of file textures, caches and image planes
+_MAYA_REFERENCE_RE = re.compile(r'^\s*file\s[^;]*?"([^"]+)"\s*;', re.MULTILINE)
+_MAYA_ATTR_RE = re.compile(
+    r'setAttr\s+"\.(?:ftn|fileTextureName|fn|cfn|cacheFileName|imn|imageName|filename)"\s+-type\s+"string"\s+"([^"]*)"')
+
+# frame and tile tokens of sequences, ex. ####, %04d, $F4, <UDIM> or <UVTILE>
+_SEQUENCE_RE = re.compile(r'#+|%0?\d*d|\$F\d*|<UDIM>|<udim>|<UVTILE>|<uvtile>|_MAPID_')
+
+
+def parse_nuke(content):
+    return [quoted.replace('\\"', '"') if quoted else bare for quoted, bare in _NUKE_RE.findall(content)]
+
+
+def parse_arnold(content):
+    return _ARNOLD_RE.findall(content)
+
+
+def parse_usd(content):
+    return [triple or single for triple, single in _USD_RE.findall(content)]
+
+
+def parse_maya_ascii(content):
+    return _MAYA_REFERENCE_RE.findall(content) + _MAYA_ATTR_RE.findall(content)
+
+
+# parsers of scene files by lower case extension, each returns the file paths referenced in the scene content
+SCENE_PARSERS = {
+    '.nk': parse_nuke,
+    '.ass': parse_arnold,
+    '.usda': parse_usd,
+    '.ma': parse_maya_ascii,
+}
+
+
+def register_parser(extension, parser):
+    """ adds or replaces the parser of a scene file extension
+
+    :param extension: file extension including the dot, ex. '.hip'
+    :param parser: function receiving the scene file content and returning the referenced file paths
+    """
+
+    SCENE_PARSERS[extension.lower()] = parser
+
+
+def _sequence_regex(name):
+    # the pattern of the file names of a sequence, with the tokens matching frame or tile numbers
+    parts = list()
+    last = 0
+    for m in _SEQUENCE_RE.finditer(name):
+        parts.append(re.escape(name[last:m.start()]))
+        token = m.group(0)
+        if token.lower() == '<udim>':
+            parts.append(r'\d{4}')
+        elif token.lower() == '<uvtile>':
+            parts.append(r'u\d+_v\d+')
+        else:
+            parts.append(r'-?\d+')
+        last = m.end()
+    parts.append(re.escape(name[last:]))
+    return re.compile(''.join(parts) + '$')
+
+
+def expand_sequence(path):
+    """ returns the files of a frame or tile sequence path, or the path itself if it is a single file """
+
+    folder, name = os.path.split(path)
+
+    if not _SEQUENCE_RE.search(name):
+        return [path] if os.path.isfile(path) else []
+
+    pattern = _sequence_regex(name)
+
+    try:
+        names = sorted(os.listdir(folder))
+    except OSError:
+        return []
+
+    return [os.path.join(folder, n) for n in names if pattern.match(n) and os.path.isfile(os.path.join(folder, n))]
+
+
+class DependencyCache(object):
+    """On-disk cache of the files referenced by scene files, invalidated by the scene size and mtime"""
+
+    def __init__(self, cache_dir=None):
+        """Constructor
+
+        :param cache_dir: folder of the cache file, defaults to the user's cache folder
+        """
+
+        self.path = os.path.join(cache_dir or user_cache_dir(), 'scene-dependencies.json')
+        self._entries = None
+        self._changed = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    cache = json.loads(f.read().decode('utf-8'))
+            except (IOError, OSError, ValueError):
+                cache = None
+
+            if not isinstance(cache, dict) or cache.get('version') != PARSER_VERSION:
+                cache = dict()
+
+            self._entries = cache.get('scenes') or dict()
+
+        return self._entries
+
+    def get(self, path, st):
+        """ returns the cached references of the scene file or None if missing or outdated """
+
+        with self._lock:
+            entry = self._load().get(path)
+
+        if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime:
+            return None
+
+        return entry[2]
+
+    def put(self, path, st, references):
+        with self._lock:
+            self._load()[path] = [st.st_size, st.st_mtime, references]
+            self._changed = True
+
+    def save(self):
+        """ writes the cache file if entries were added """
+
+        with self._lock:
+            if not self._changed:
+                return
+
+            cache = dict()
+            cache['version'] = PARSER_VERSION
+            cache['scenes'] = self._entries
+
+            atomic_write(self.path, json.dumps(cache).encode('utf-8'))
+            self._changed = False
+
+
+class DependencyScanner(object):
+    """Finds the files referenced by scene files, following references to other scene files"""
+
+    def __init__(self, local_root, cache=None, max_workers=1, parsers=None):
+        """Constructor
+
+        :param local_root: folder relative references are resolved against when not found next to the scene
+        :param cache: optional DependencyCache, lets repeated scans skip parsing unchanged scenes
+        :param max_workers: number of scene files parsed concurrently
+        :param parsers: parsers by extension, defaults to SCENE_PARSERS
+        """
+
+        self.local_root = os.path.abspath(local_root)
+        self.cache = cache
+        self.max_workers = max_workers
+        self.parsers = parsers if parsers is not None else SCENE_PARSERS
+
+    def _parser(self, path):
+        return self.parsers.get(os.path.splitext(path)[1].lower())
+
+    def references(self, scene):
+        """ returns the referenced paths of a scene file as written in the scene, [] if it can't be read """
+
+        try:
+            st = os.stat(scene)
+
+            if self.cache is not None:
+                references = self.cache.get(scene, st)
+                if references is not None:
+                    return references
+
+            with open(scene, 'rb') as f:
+                content = f.read().decode('utf-8', 'replace')
+        except (IOError, OSError):
+            return []
+
+        references = [r for r in self._parser(scene)(content) if r]
+
+        if self.cache is not None:
+            self.cache.put(scene, st, references)
+
+        return references
+
+    def resolve(self, reference, scene):
+        """ returns the existing files of a reference, relative references are looked up next to the scene then in local_root """
+
+        reference = os.path.expandvars(os.path.expanduser(reference.strip()))
+
+        if os.path.isabs(reference):
+            candidates = [reference]
+        else:
+            candidates = [os.path.join(os.path.dirname(scene), reference), os.path.join(self.local_root, reference)]
+
+        for candidate in candidates:
+            files = expand_sequence(os.path.normpath(candidate))
+            if files:
+                return files
+
+        return []
+
+    def _scan_scene(self, scene):
+        files = list()
+        for reference in self.references(scene):
+            files.extend(self.resolve(reference, scene))
+        return files
+
+    def scan(self, scenes):
+        """ returns the scene files and all files they reference, directly or through other scene files
+
+        :param scenes: scene file paths
+        :return: list of absolute file paths without duplicates, in the order they were found
+        """
+
+        found = list()
+        seen = set()
+        pending = list()
+
+        def add(paths):
+            for path in paths:
+                path = os.path.abspath(path)
+                if path not in seen:
+                    seen.add(path)
+                    found.append(path)
+                    if self._parser(path) is not None:
+                        pending.append(path)
+
+        add(scene for scene in scenes if os.path.isfile(scene))
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+
+        try:
+            # parse one level of referenced scenes at a time, keeping the order of the references
+            while pending:
+                level = pending[:]
+                del pending[:]
+                results = executor.map(self._scan_scene, level) if executor else map(self._scan_scene, level)
+                for files in results:
+                    add(files)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if self.cache is not None:
+            self.cache.save()
+
+        return found
@@ -4,18 +4,83 @@ from future import standard_library
 standard_library.install_aliases()
 from builtins import str
 from builtins import object
+import threading
 import urllib.request, urllib.parse, urllib.error
+from concurrent.futures import ThreadPoolExecutor
 from . import errors
+from .catalog_cache import CatalogCache, content_hash
 from .http_client import HttpClient
+from .payload import ENCODINGS_HEADER, FILES_AUTO, FILES_ENCODINGS, FILES_FLAT, negotiate_encoding
 from .resolver import Resolver
+from .retry import CircuitBreaker, RetryPolicy
+from .validation_cache import ValidationCache
 
 API_BASE = "http://localhost:8090"
 
+# default time to live in seconds of the cached auth and credit checks
+AUTH_TTL = 300
+CREDITS_TTL = 60
 
-class EnvoyClient(object):
-    """Client to access Envoy Service API"""
+# default number of worker threads used by bulk submissions
+SUBMIT_WORKERS = 8
+
+# project states while Envoy uploads the project files in the background, and of projects which failed
+UPLOADING_STATES = ('Uploading',)
+FAILED_STATES = ('Failed', 'Cancelled', 'Error')
+
+
+def upload_finished(status):
+    """ returns if a project status response reports that Envoy finished uploading the project files """
+
+    state = status.get('State') if status else None
+
+    if state is None or state in UPLOADING_STATES or state in FAILED_STATES:
+        return False
+
+    bytes_total = status.get('BytesTotal')
+    return bytes_total is None or status.get('BytesDone', 0) >= bytes_total
+
+
+class SubmitResult(object):
+    """Outcome of a single project submission made by EnvoyClient.submit_projects"""
+
+    def __init__(self, project, name=None, error=None):
+        self.project = project
+        self.name = name
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "%s(name=%r, error=%r)" % (
+            self.__class__.__name__,
+            self.name,
+            self.error)
+
+
+class BaseEnvoyClient(object):
+    """Request building and response handling shared by the blocking and asyncio Envoy clients"""
+
+    def __init__(self, email=None, access_key=None, url=None, auth_ttl=AUTH_TTL, credits_ttl=CREDITS_TTL,
+                 files_encoding=FILES_FLAT, stream_payloads=False):
+        """Constructor
+
+        :param email: email address of the registered GridMarkets account
+        :param access_key: access key from the user's profile page in the GridMarkets portal
+        :param url: Envoy service url, defaults to http://localhost:8090
+        :param auth_ttl: seconds a successful auth check is reused for, 0 or None to validate on every call
+        :param credits_ttl: seconds a successful credits check is reused for, 0 or None to validate on every call
+        :param files_encoding: encoding of the file lists sent to Envoy, 'flat', 'grouped', 'tree' or 'auto'
+            to use a compact encoding if Envoy advertises one
+        :param stream_payloads: encode the upload and submit payloads while sending them with chunked transfer
+            encoding, keeps the memory flat for projects with millions of files
+        """
+
+        if files_encoding != FILES_AUTO and files_encoding not in FILES_ENCODINGS:
+            raise ValueError("unknown files encoding: {0}".format(files_encoding))
 
-    def __init__(self, email=None, access_key=None, url=None):
         from . import version
         self.version = version.VERSION
 
@@ -25,152 +90,431 @@ class EnvoyClient(object):
         self.url = url
         self.email = email
         self.access_key = access_key
-        self.http_client = HttpClient()
+        self.validation_cache = ValidationCache({'auth': auth_ttl, 'credits': credits_ttl})
+        self.files_encoding = files_encoding
+        self._offered_files_encoding = None
+        self.stream_payloads = stream_payloads
+
+    def invalidate_validation_cache(self):
+        """ forces the next calls to re-validate auth and credits with Envoy """
+        self.validation_cache.invalidate()
+
+    def _handle_auth_failure(self, resp):
+        # the cached auth check is stale if Envoy rejects our credentials
+        self.validation_cache.invalidate('auth', 'credits')
+        raise errors.AuthenticationError(resp.text, resp.status_code)
+
+    def _handle_insufficient_credits(self):
+        self.validation_cache.invalidate('credits')
+        raise errors.InsufficientCreditsError("Insufficient credits balance")
+
+    def _negotiated_files_encoding(self):
+        if self.files_encoding == FILES_AUTO:
+            return self._offered_files_encoding or FILES_FLAT
+        return self.files_encoding
+
+    def _note_files_encodings(self, resp):
+        # Envoy versions decoding compact file lists advertise them in their responses
+        offered = None
+        for name, value in resp.headers.items():
+            if name.lower() == ENCODINGS_HEADER.lower():
+                offered = value
+        self._offered_files_encoding = negotiate_encoding(offered)
+
+    def _products_request(self):
+        return '{0}/products'.format(self.url)
+
+    def _handle_products_response(self, url, resp):
+        if resp.status_code == 200:
+            return resp.json()
+
+        if resp.status_code == 401:
+            self._handle_auth_failure(resp)
+
+        if resp.status_code == 404:
+            raise errors.InvalidRequestError(
+                "404: {0} not found".format(url))
+
+    def _auth_request(self):
+        url = '{0}/auth'.format(self.url)
+
+        post_data = {
+            "Username": self.email,
+            "AccessKey": self.access_key
+        }
+
+        headers = {'content-type': 'application/json'}
+
+        return url, headers, post_data
+
+    def _handle_auth_response(self, url, resp):
+        if resp.status_code == 200:
+            self._note_files_encodings(resp)
+            self.validation_cache.mark_valid('auth')
+            return True
+
+        if resp.status_code == 401:
+            self._handle_auth_failure(resp)
+
+        if resp.status_code == 404:
+            raise errors.InvalidRequestError(
+                "404: {0} not found".format(url))
+
+    def _credits_request(self):
+        return '{0}/credits-info'.format(self.url)
+
+    def _handle_credits_response(self, url, resp):
+        credits_available = 0.0
+
+        if resp.status_code == 200:
+            content = resp.json()
+            credits_available = content.get('credits_available')
+
+        if resp.status_code == 404:
+            raise errors.InvalidRequestError(
+                "404: {0} not found".format(url))
+
+        if credits_available <= 0.0:
+            self._handle_insufficient_credits()
+
+        self.validation_cache.mark_valid('credits')
+
+    def _upload_request(self, project):
+        if not project:
+            raise ValueError("project parameter is None")
+
+        url = "{0}/upload".format(self.url)
+        headers = {'content-type': 'application/json'}
+
+        project.files_encoding = self._negotiated_files_encoding()
+
+        if self.stream_payloads:
+            return url, headers, project.upload_serialize_stream
+
+        return url, headers, project.upload_serialize
+
+    def _handle_upload_response(self, project, resp):
+        if resp.status_code == 401:
+            self._handle_auth_failure(resp)
+
+        if resp.status_code == 402:
+            self._handle_insufficient_credits()
+
+        if resp.status_code == 200 and resp.json()['ID'] == project.name:
+            return project.name
+        else:
+            raise errors.APIError('status code:{0}, msg:{1}'.format(
+                resp.status_code, resp.text))
+
+    def _submit_request(self, project, skip_upload, skip_auto_download):
+        if not project:
+            raise ValueError("project parameter is None")
+
+        url = '{0}/project-submit'.format(self.url)
+
+        headers = {'content-type': 'application/json'}
+
+        project.skip_upload = skip_upload
+        project.skip_auto_download = skip_auto_download
+        project.files_encoding = self._negotiated_files_encoding()
+
+        if self.stream_payloads:
+            return url, headers, project.serialize_stream
+
+        return url, headers, project.serialize
+
+    def _handle_submit_response(self, url, project, resp):
+        if resp.status_code == 201:
+            return project.name
+
+        if resp.status_code == 401:
+            self._handle_auth_failure(resp)
+
+        if resp.status_code == 402:
+            self._handle_insufficient_credits()
+
+        if resp.status_code == 404:
+            raise errors.InvalidRequestError(
+                "404: {0} not found".format(url))
+
+        if resp.status_code == 400:
+            raise errors.InvalidRequestError(
+                "Invalid request", resp.json())
+
+        if resp.status_code in (500, 503):
+            raise errors.APIError("{0} {1}".format(
+                resp.status_code, resp.text))
+
+    def _record_upload(self, project, status):
+        if not upload_finished(status):
+            return False
+
+        project.record_upload()
+        return True
+
+    def _project_status_request(self, name):
+        return '{0}/project-status/{1}'.format(self.url, urllib.parse.quote(name))
+
+    def _handle_project_status_response(self, url, resp):
+        if resp.status_code == 200:
+            return resp.json()
+
+        if resp.status_code == 401:
+            self._handle_auth_failure(resp)
+
+        if resp.status_code == 404:
+            raise errors.InvalidRequestError(
+                "404: {0} not found".format(url))
+
+
+class EnvoyClient(BaseEnvoyClient):
+    """Client to access Envoy Service API"""
+
+    def __init__(self, email=None, access_key=None, url=None, auth_ttl=AUTH_TTL, credits_ttl=CREDITS_TTL,
+                 catalog_cache=None, files_encoding=FILES_FLAT, stream_payloads=False, compression=None, pool=None,
+                 retry=None, circuit_breaker=None, instrumentation=None):
+        """Constructor
+
+        :param catalog_cache: CatalogCache used by get_product_resolver, pass True to use the default cache location
+        :param compression: 'gzip' or 'deflate' to compress large request bodies, see HttpClient
+        :param pool: PoolConfig of the connection pool shared by the threads using the client, see HttpClient
+        :param retry: RetryPolicy of failed requests, pass True for the default policy. Auth checks and uploads
+            are retried like GET requests, submissions only if they could not be sent.
+        :param circuit_breaker: CircuitBreaker failing requests fast while Envoy is down, pass True for the default
+        :param instrumentation: Instrumentation called before and after every request, ex. a HistogramCollector
+        """
+
+        super(EnvoyClient, self).__init__(email, access_key, url, auth_ttl, credits_ttl, files_encoding,
+                                          stream_payloads)
+        self.http_client = HttpClient(compression=compression, pool=pool,
+                                      retry=RetryPolicy() if retry is True else retry,
+                                      circuit_breaker=CircuitBreaker() if circuit_breaker is True else circuit_breaker,
+                                      instrumentation=instrumentation)
+        self.catalog_cache = CatalogCache() if catalog_cache is True else catalog_cache
+        self.catalog_refresh_error = None
+        self._catalog_refresh = None
+        self._catalog_lock = threading.Lock()
 
     def _get_products(self):
-        url = '{0}/products'.format(self.url)
+        url = self._products_request()
 
         try:
-            resp = self.http_client.request('get', url)
+            resp = self.http_client.request('get', url, handled=True)
+        except errors.APIError:
+            raise
         except Exception as e:
             raise errors.APIError(e)
         else:
-            if resp.status_code == 200:
-                return resp.json()
-
-            if resp.status_code == 404:
-                raise errors.InvalidRequestError(
-                    "404: {0} not found".format(url))
+            return self.http_client.handle_response(resp, self._handle_products_response, url, resp)
 
     def validate_auth(self):
-        url = '{0}/auth'.format(self.url)
+        if self.validation_cache.is_valid('auth'):
+            return True
 
-        post_data = {
-            "Username": self.email,
-            "AccessKey": self.access_key
-        }
+        url, headers, post_data = self._auth_request()
 
-        headers = {'content-type': 'application/json'}
+        try:
+            resp = self.http_client.request('post', url, headers, post_data, idempotent=True, handled=True)
+        except errors.APIError:
+            raise
+        except Exception as e:
+            raise errors.APIError(e)
+        else:
+            return self.http_client.handle_response(resp, self._handle_auth_response, url, resp)
+
+    def validate_credits(self):
+        if self.validation_cache.is_valid('credits'):
+            return
+
+        url = self._credits_request()
 
         try:
-            resp = self.http_client.request('post', url, headers, post_data)
+            resp = self.http_client.request('get', url, handled=True)
+        except errors.APIError:
+            raise
         except Exception as e:
             raise errors.APIError(e)
         else:
-            if resp.status_code == 200:
-                return True
+            self.http_client.handle_response(resp, self._handle_credits_response, url, resp)
 
-            if resp.status_code == 401:
-                raise errors.AuthenticationError(resp.text, resp.status_code)
+    def _fetch_catalog(self, entry=None):
+        """ fetches the products into the catalog cache, revalidating entry if passed """
 
-            if resp.status_code == 404:
-                raise errors.InvalidRequestError(
-                    "404: {0} not found".format(url))
+        url = self._products_request()
+        headers = dict()
 
-    def validate_credits(self):
-        url = '{0}/credits-info'.format(self.url)
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
 
-        credits_available = 0.0
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
 
         try:
-            resp = self.http_client.request('get', url)
+            resp = self.http_client.request('get', url, headers, handled=True)
+        except errors.APIError:
+            raise
         except Exception as e:
             raise errors.APIError(e)
         else:
-            if resp.status_code == 200:
-                content = resp.json()
-                credits_available = content.get('credits_available')
+            return self.http_client.handle_response(resp, self._handle_catalog_response, url, entry, resp)
+
+    def _handle_catalog_response(self, url, entry, resp):
+        if entry is not None and resp.status_code == 304:
+            return self.catalog_cache.touch(entry)
 
-            if resp.status_code == 404:
-                raise errors.InvalidRequestError(
-                    "404: {0} not found".format(url))
+        products = self._handle_products_response(url, resp)
 
-            if credits_available <= 0.0:
-                raise errors.InsufficientCreditsError(
-                    "Insufficient credits balance")
+        if products is None:
+            raise errors.APIError('status code:{0}, msg:{1}'.format(
+                resp.status_code, resp.text))
+
+        # Envoy may not support conditional requests, skip rewriting an unchanged catalog
+        digest = content_hash(resp.content)
+
+        if entry is not None and entry.get('hash') == digest:
+            return self.catalog_cache.touch(entry)
+
+        return self.catalog_cache.save(
+            url, products, digest, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+
+    def _refresh_catalog(self, entry):
+        with self._catalog_lock:
+            if self._catalog_refresh is not None and self._catalog_refresh.is_alive():
+                return
+
+            self._catalog_refresh = threading.Thread(target=self._refresh_catalog_worker, args=(entry,))
+            self._catalog_refresh.daemon = True
+            self._catalog_refresh.start()
+
+    def _refresh_catalog_worker(self, entry):
+        try:
+            self.validate_auth()
+            self._fetch_catalog(entry)
+        except Exception as e:
+            self.catalog_refresh_error = e
+        else:
+            self.catalog_refresh_error = None
 
     def get_product_resolver(self, type_labels=None):
-        self.validate_auth()
+        """ returns a Resolver of the product catalog
+
+        With a catalog cache the resolver is built from the cached catalog when available,
+        a stale catalog is revalidated in the background and used by later calls.
+        """
+
+        if self.catalog_cache is None:
+            self.validate_auth()
+
+            products = self._get_products()
+            return Resolver(products)
 
-        products = self._get_products()
-        return Resolver(products)
+        entry = self.catalog_cache.load(self._products_request())
+
+        if entry is None:
+            self.validate_auth()
+            entry = self._fetch_catalog()
+
+        elif self.catalog_cache.is_stale(entry):
+            self._refresh_catalog(entry)
+
+        return Resolver(entry['products'])
 
     def upload_project_files(self, project):
         self.validate_auth()
         self.validate_credits()
 
-        if not project:
-            raise ValueError("project parameter is None")
-
-        url = "{0}/upload".format(self.url)
-        headers = {'content-type': 'application/json'}
-
-        import json
-        print(json.dumps(project.upload_serialize))
+        url, headers, post_data = self._upload_request(project)
 
         try:
             resp = self.http_client.request(
-                'post', url, headers, project.upload_serialize)
+                'post', url, headers, post_data, idempotent=True, handled=True)
+        except errors.APIError:
+            raise
         except Exception as e:
             raise errors.APIError(e)
         else:
-            print(resp.json())
-            if resp.status_code == 200 and resp.json()['ID'] == project.name:
-                return project.name
-            else:
-                raise errors.APIError('status code:{0}, msg:{1}'.format(
-                    resp.status_code, resp.text))
+            return self.http_client.handle_response(resp, self._handle_upload_response, project, resp)
 
     def submit_project(self, project, skip_upload=False, skip_auto_download=False):
         self.validate_auth()
         self.validate_credits()
 
-        if not project:
-            raise ValueError("project parameter is None")
+        return self._submit_project(project, skip_upload, skip_auto_download)
 
-        url = '{0}/project-submit'.format(self.url)
+    def submit_projects(self, projects, max_workers=SUBMIT_WORKERS, skip_upload=False, skip_auto_download=False):
+        """ submits many projects concurrently on a bounded thread pool
 
-        headers = {'content-type': 'application/json'}
+        Auth and credits are validated once for the whole batch. A failing project does not abort the others,
+        its exception is reported in the returned result instead.
 
-        project.skip_upload = skip_upload
-        project.skip_auto_download = skip_auto_download
+        :param projects: list of projects to submit
+        :param max_workers: maximum number of concurrent submissions
+        :return: list of SubmitResult in the same order as projects
+        """
+
+        self.validate_auth()
+        self.validate_credits()
+
+        def submit(project):
+            try:
+                name = self._submit_project(project, skip_upload, skip_auto_download)
+            except Exception as e:
+                return SubmitResult(project, error=e)
+            else:
+                return SubmitResult(project, name=name)
+
+        projects = list(projects)
+
+        if not projects:
+            return list()
+
+        # sessions are thread local in HttpClient, so each worker keeps reusing its own connections
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(projects)))) as executor:
+            return list(executor.map(submit, projects))
+
+    def _submit_project(self, project, skip_upload, skip_auto_download):
+        url, headers, post_data = self._submit_request(project, skip_upload, skip_auto_download)
 
         try:
             resp = self.http_client.request(
-                'post', url, headers, project.serialize)
+                'post', url, headers, post_data, handled=True)
         except errors.InsufficientCreditsError as e:
             raise e
+        except errors.APIError:
+            raise
         except Exception as e:
             raise errors.APIError(str(e))
         else:
-            if resp.status_code == 201:
-                return project.name
+            return self.http_client.handle_response(resp, self._handle_submit_response, url, project, resp)
+
+    def record_upload(self, project, status=None):
+        """ records the files of an incremental_upload project as uploaded once Envoy finished uploading them
 
-            if resp.status_code == 404:
-                raise errors.InvalidRequestError(
-                    "404: {0} not found".format(url))
+        Envoy accepts upload and submit requests before it transfers the files, so the manifest of the project
+        is only written once the project status no longer reports the upload in progress or failed. Call it
+        when the upload ended, ex. on a StatusWatcher transition, otherwise the files are sent again next time.
 
-            if resp.status_code == 400:
-                raise errors.InvalidRequestError(
-                    "Invalid request", resp.json())
+        :param project: the uploaded or submitted project
+        :param status: project status response, fetched with get_project_status if not given
+        :return: True if the upload finished and the files were recorded
+        """
 
-            if resp.status_code in (500, 503):
-                raise errors.APIError("{0} {1}".format(
-                    resp.status_code, resp.text))
+        if status is None:
+            status = self.get_project_status(project.name)
+
+        return self._record_upload(project, status)
 
     def get_project_status(self, name):
         self.validate_auth()
 
-        url = '{0}/project-status/{1}'.format(self.url, urllib.parse.quote(name))
+        url = self._project_status_request(name)
 
         try:
-            resp = self.http_client.request('get', url)
+            resp = self.http_client.request('get', url, handled=True)
+        except errors.APIError:
+            raise
         except Exception as e:
             raise errors.APIError(e)
         else:
-            if resp.status_code == 200:
-                return resp.json()
-
-            if resp.status_code == 404:
-                raise errors.InvalidRequestError(
-                    "404: {0} not found".format(url))
+            return self.http_client.handle_response(resp, self._handle_project_status_response, url, resp)
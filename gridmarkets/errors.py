@@ -21,7 +21,8 @@ class GridMarketsError(Exception):
     def __str__(self):
         msg = self._message or '<empty message>'
 
-        return msg
+        # clients wrap transport errors which are exceptions themselves
+        return msg if isinstance(msg, str) else str(msg)
 
     @property
     def user_message(self):
@@ -43,6 +44,11 @@ class APIError(GridMarketsError):
     pass
 
 
+class CircuitOpenError(APIError):
+    """Raised without sending the request while the circuit breaker of the client is open"""
+    pass
+
+
 class InsufficientCreditsError(GridMarketsError):
     def __init__(self, message=None):
         super(InsufficientCreditsError, self).__init__(message)
@@ -0,0 +1,169 @@
+from __future__ import absolute_import
+
+
+class FileSet(list):
+    """
+    Insertion ordered list of relative file paths without duplicates, used for Project.files.
+
+    Adding a path twice keeps the first one, so overlapping add_files and add_folders calls don't
+    upload files twice. It is a list, so it serializes with json.dumps and supports the list methods,
+    and the paths are also kept in a {path: stat} table, so membership tests take constant time and
+    a FileStat can be kept with every path.
+
+    Like list.remove, discard and remove take time proportional to the number of paths,
+    use difference_update to remove many paths at once.
+    """
+
+    __slots__ = ('_stats',)
+
+    def __init__(self, paths=None):
+        super(FileSet, self).__init__()
+        self._stats = dict()
+
+        if paths is not None:
+            self.update(paths)
+
+    def add(self, path, stat=None):
+        """ adds the path if missing, returns False if it was already in the set
+
+        :param path: relative file path
+        :param stat: optional FileStat of the file, replaces the known one
+        """
+
+        if path in self._stats:
+            if stat is not None:
+                self._stats[path] = stat
+            return False
+
+        self._stats[path] = stat
+        list.append(self, path)
+        return True
+
+    def append(self, path):
+        self.add(path)
+
+    def insert(self, index, path):
+        if path not in self._stats:
+            self._stats[path] = None
+            list.insert(self, index, path)
+
+    def update(self, paths):
+        for path in paths:
+            self.add(path)
+
+    extend = update
+
+    def __iadd__(self, paths):
+        self.update(paths)
+        return self
+
+    def __imul__(self, count):
+        # repeating would only add duplicates
+        if count < 1:
+            self.clear()
+        return self
+
+    def discard(self, path):
+        """ removes the path if present """
+
+        if path in self._stats:
+            self.remove(path)
+
+    def remove(self, path):
+        """ removes the path, like list.remove
+
+        :raises ValueError: if the path is not in the set
+        """
+
+        list.remove(self, path)
+        del self._stats[path]
+
+    def difference_update(self, paths):
+        """ removes the paths which are present, in a single pass over the set """
+
+        removed = set(path for path in paths if path in self._stats)
+
+        if removed:
+            self._replace([path for path in self if path not in removed])
+
+    def pop(self, index=-1):
+        path = list.pop(self, index)
+        del self._stats[path]
+        return path
+
+    def clear(self):
+        del self[:]
+
+    def copy(self):
+        files = FileSet()
+        list.extend(files, self)
+        files._stats.update(self._stats)
+        return files
+
+    def _replace(self, paths):
+        # keeps the first of duplicate paths and the stats of the paths still present
+        stats = self._stats
+        list.__delitem__(self, slice(None))
+        self._stats = dict()
+
+        for path in paths:
+            self.add(path, stats.get(path))
+
+    def __setitem__(self, index, value):
+        paths = list(self)
+        paths[index] = value
+        self._replace(paths)
+
+    def __delitem__(self, index):
+        removed = list.__getitem__(self, index)
+        list.__delitem__(self, index)
+
+        for path in (removed if isinstance(index, slice) else [removed]):
+            del self._stats[path]
+
+    # Python 2 lists handle simple slices with these instead of __setitem__ and __delitem__
+    def __setslice__(self, start, stop, paths):
+        self.__setitem__(slice(max(start, 0), max(stop, 0)), paths)
+
+    def __delslice__(self, start, stop):
+        self.__delitem__(slice(max(start, 0), max(stop, 0)))
+
+    def stat(self, path):
+        """ returns the FileStat kept with the path, None if unknown
+
+        :raises KeyError: if the path is not in the set
+        """
+
+        return self._stats[path]
+
+    def set_stat(self, path, stat):
+        if path not in self._stats:
+            raise KeyError(path)
+
+        self._stats[path] = stat
+
+    def count(self, path):
+        return 1 if path in self._stats else 0
+
+    def __contains__(self, path):
+        return path in self._stats
+
+    def __eq__(self, other):
+        if isinstance(other, tuple):
+            other = list(other)
+        return list.__eq__(self, other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return self.__class__, (list(self),), self._stats
+
+    def __setstate__(self, stats):
+        self._stats.update(stats)
+
+    def __repr__(self):
+        return 'FileSet({0!r})'.format(list(self))
@@ -0,0 +1,54 @@
+from __future__ import absolute_import
+import errno
+import os
+import tempfile
+
+# os.replace is atomic on all platforms but only available on Python 3.3+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def user_cache_dir():
+    """ returns the folder of the package's caches shared by all processes of the user """
+
+    if os.name == 'nt':
+        root = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(root, 'gridmarkets')
+
+
+def makedirs(path):
+    """ creates the folder path, ignoring the error if it already exists """
+
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+
+def atomic_write(path, data):
+    """ writes data to path so that concurrent readers see either the old or the new content, never a partial file
+
+    :param path: destination file path, its folder is created if missing
+    :param data: bytes to write
+    """
+
+    folder = os.path.dirname(os.path.abspath(path))
+    makedirs(folder)
+
+    # the temporary file must be on the same file system for the rename to be atomic
+    fd, tmp_path = tempfile.mkstemp(prefix='.{0}.'.format(os.path.basename(path)), suffix='.tmp', dir=folder)
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        _replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
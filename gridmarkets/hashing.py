@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import multiprocessing
+import os
+import sys
+
+# digest algorithm of project files, recorded next to the digests so it can change later
+DIGEST_ALGORITHM = 'sha256'
+
+# bytes read at once, large reads keep the disk busy rather than the interpreter
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# default number of hashing threads or processes
+HASH_WORKERS = multiprocessing.cpu_count()
+
+# files sent to a hashing process at once, amortizes the inter process calls over small files
+HASH_BATCH = 16
+
+
+def file_digest(path, algorithm=DIGEST_ALGORITHM, chunk_size=CHUNK_SIZE):
+    """ returns the hex digest of the content of a file
+
+    :param path: file path
+    :param algorithm: hashlib algorithm name
+    :param chunk_size: bytes read at once
+    """
+
+    digest = hashlib.new(algorithm)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+
+    # read into one reused buffer instead of allocating a chunk per read
+    with open(path, 'rb', buffering=0) as f:
+        size = f.readinto(buf)
+        while size:
+            digest.update(view[:size])
+            size = f.readinto(buf)
+
+    return digest.hexdigest()
+
+
+def _file_digest_or_none(args):
+    path, algorithm = args
+    try:
+        return file_digest(path, algorithm)
+    except (IOError, OSError):
+        return None
+
+
+def can_use_processes():
+    """ returns if worker processes can be started, which needs sys.executable to be a python interpreter
+
+    Interpreters embedded in Maya, Nuke or Houdini have the host application as sys.executable, starting
+    workers there launches the application again or hangs.
+    """
+
+    name = os.path.basename(sys.executable or '').lower()
+    return name.startswith(('python', 'pypy'))
+
+
+def hash_files(paths, max_workers=HASH_WORKERS, algorithm=DIGEST_ALGORITHM, processes=False):
+    """ returns the hex digests of the files, hashed in a pool of threads
+
+    hashlib releases the GIL while hashing the large chunks read, so threads hash files in parallel.
+    Unreadable files get a None digest.
+
+    :param paths: file paths
+    :param max_workers: number of hashing threads or processes, 1 hashes in the calling thread
+    :param algorithm: hashlib algorithm name
+    :param processes: hash in a pool of processes instead, ignored unless can_use_processes()
+    """
+
+    tasks = [(path, algorithm) for path in paths]
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        return [_file_digest_or_none(task) for task in tasks]
+
+    max_workers = min(max_workers, len(tasks))
+
+    if processes and can_use_processes():
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_file_digest_or_none, tasks, chunksize=HASH_BATCH))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_file_digest_or_none, tasks))
@@ -4,33 +4,262 @@ from builtins import object
 import json
 import textwrap
 import threading
+import time
 import requests
+from urllib3.exceptions import NewConnectionError
 from . import errors
+from .compression import COMPRESSION_THRESHOLD, DEFLATE, GZIP, REJECTED_STATUS, compress, compress_chunks
+from .connection_pool import PooledAdapter
+from .instrumentation import RequestInfo, finish_request, handle_response
+from .payload import JsonStream
+from .retry import FAILURE_STATUSES, IDEMPOTENT_METHODS, RetryMetrics
+
+_now = getattr(time, 'monotonic', time.time)
 
 
 class HttpClient(object):
-    def __init__(self, timeout=80, session=None, **kwargs):
+    def __init__(self, timeout=80, session=None, compression=None, compression_threshold=COMPRESSION_THRESHOLD,
+                 pool=None, retry=None, circuit_breaker=None, instrumentation=None, **kwargs):
+        """Constructor
+
+        :param compression: 'gzip' or 'deflate' to compress request bodies, None sends them uncompressed.
+            If the server rejects a compressed body, it is sent again uncompressed and compression is turned off.
+        :param compression_threshold: minimum bytes of a request body to be compressed, streamed bodies are
+            always compressed
+        :param pool: PoolConfig of one connection pool shared by all threads, which counts its connections
+            in metrics. By default every thread has its own pool.
+        :param retry: RetryPolicy of failed requests, None sends every request once
+        :param circuit_breaker: CircuitBreaker failing requests fast while Envoy is down, shared by all threads
+        :param instrumentation: Instrumentation whose hooks are called around every request, None skips measuring
+        """
+
+        if compression not in (None, GZIP, DEFLATE):
+            raise ValueError("unknown compression: {0}".format(compression))
+
         self._thread_local = threading.local()
         self._session = session
         self._timeout = timeout
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compression_rejected = False
+
+        self.pool = pool
+        self._adapter = PooledAdapter(pool) if pool is not None else None
+        self.metrics = self._adapter.metrics if self._adapter is not None else None
+        self._slots = threading.BoundedSemaphore(pool.max_connections) if pool and pool.max_connections else None
+
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.retry_metrics = RetryMetrics()
+
+        self.instrumentation = instrumentation
+
+    def _new_session(self):
+        session = requests.Session()
+
+        if self._adapter is not None:
+            # the sessions of all threads share the adapter and so its pool
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+
+            if not self.pool.keep_alive:
+                session.headers['Connection'] = 'close'
+
+        return session
+
+    def request(self, method, url, headers=None, post_data=None, idempotent=None, endpoint=None, handled=False):
+        """ sends the request, retrying it according to the retry policy
+
+        :param idempotent: whether the request can be sent again if it may have reached the server,
+            by default only for idempotent methods like GET
+        :param endpoint: name of the endpoint reported to the instrumentation, by default the first part of the path
+        :param handled: True if the caller passes the response to handle_response, which then reports the request
+            with the time spent handling the response. The request is only reported to the instrumentation's
+            after_request once handle_response is called, a caller setting handled must call it even if
+            handling fails, errors ending the request itself are always reported.
+        """
 
-    def request(self, method, url, headers=None, post_data=None):
         if getattr(self._thread_local, "session", None) is None:
-            self._thread_local.session = self._session or requests.Session()
+            self._thread_local.session = self._session or self._new_session()
+
+        if idempotent is None:
+            idempotent = method.lower() in IDEMPOTENT_METHODS
+
+        info = None
+        if self.instrumentation is not None:
+            info = RequestInfo(method, url, endpoint)
+            self.instrumentation.before_request(info)
+
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            if self.circuit_breaker is not None:
+                try:
+                    self.circuit_breaker.allow()
+                except errors.CircuitOpenError as e:
+                    self.retry_metrics.count('rejected')
+                    self._report_error(info, e)
+                    raise
+
+            self.retry_metrics.count('attempts')
+
+            try:
+                response = self._attempt(method, url, headers, post_data, info)
+            except Exception as e:
+                self._record_outcome(False)
+
+                delay = None
+                if self.retry is not None and isinstance(e, requests.exceptions.RequestException):
+                    delay = self.retry.error_delay(attempt, idempotent, self._request_sent(e))
+
+                if delay is None:
+                    self._report_error(info, e)
+                    self._handle_request_error(e)
+            else:
+                self._record_outcome(response.status_code not in FAILURE_STATUSES)
+
+                delay = None
+                if self.retry is not None:
+                    delay = self.retry.response_delay(
+                        attempt, idempotent, response.status_code, response.headers.get('Retry-After'))
+
+                if delay is None:
+                    if info is not None:
+                        info.status = response.status_code
+                        if handled:
+                            response.request_info = info
+                        else:
+                            finish_request(self.instrumentation, info)
+                    return response
+
+            self.retry_metrics.count('retries')
+            time.sleep(delay)
+
+    def handle_response(self, response, handler, *args):
+        """ returns handler(*args), the handler's time is reported as the decode time of the response's request
+
+        Required for the responses of requests made with handled=True, it reports them with after_request.
+        """
+
+        return handle_response(self.instrumentation, response, handler, *args)
+
+    def _report_error(self, info, e):
+        if info is not None:
+            info.error = e
+            finish_request(self.instrumentation, info)
+
+    def _record_outcome(self, success):
+        if self.circuit_breaker is None:
+            return
+
+        if success:
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+
+    def _request_sent(self, e):
+        # a refused or timed out connection means the server never saw the request
+        if isinstance(e, requests.exceptions.ConnectTimeout):
+            return False
+
+        if isinstance(e, requests.exceptions.ConnectionError):
+            reason = getattr(e.args[0], 'reason', None) if e.args else None
+            return not isinstance(reason, NewConnectionError)
+
+        return True
+
+    def _attempt(self, method, url, headers, post_data, info=None):
+        if info is None:
+            return self._send_body(method, url, headers, post_data)
+
+        info.attempts += 1
+        start = _now()
+        network_time = info.network_time
 
         try:
-            response = self._thread_local.session.request(
-                method,
-                url,
-                headers=headers,
-                data=json.dumps(post_data) if post_data else None,
-                timeout=self._timeout
-            )
-        except Exception as e:
-            self._handle_request_error(e)
+            return self._send_body(method, url, headers, post_data, info)
+        finally:
+            # the attempt's time not spent sending is spent encoding and compressing the body
+            info.serialize_time += (_now() - start) - (info.network_time - network_time)
+
+    def _send_body(self, method, url, headers, post_data, info=None):
+        body = self._body(post_data)
+
+        if self._should_compress(body):
+            return self._request_compressed(method, url, headers, post_data, body, info)
+
+        return self._send(method, url, headers, body, info)
+
+    def _body(self, post_data):
+        if isinstance(post_data, JsonStream):
+            # requests sends an iterator with chunked transfer encoding
+            return iter(post_data)
+
+        return json.dumps(post_data).encode('utf-8') if post_data else None
+
+    def _should_compress(self, body):
+        if not self.compression or self.compression_rejected or body is None:
+            return False
+
+        return not isinstance(body, bytes) or len(body) >= self.compression_threshold
+
+    def _request_compressed(self, method, url, headers, post_data, body, info=None):
+        compressed_headers = dict(headers or dict())
+        compressed_headers['Content-Encoding'] = self.compression
+
+        if isinstance(body, bytes):
+            response = self._send(method, url, compressed_headers, compress(body, self.compression), info)
         else:
+            response = self._send(method, url, compressed_headers, compress_chunks(body, self.compression), info)
+            body = self._body(post_data)
+
+        if response.status_code != REJECTED_STATUS:
             return response
 
+        # the server may not decode compressed bodies, send it again as is
+        plain = self._send(method, url, headers, body, info)
+
+        self.compression_rejected = True
+
+        return plain
+
+    def _send(self, method, url, headers, data, info=None):
+        if info is None:
+            return self._send_limited(method, url, headers, data)
+
+        if isinstance(data, bytes):
+            info.bytes_sent += len(data)
+        elif data is not None:
+            data = info.count_chunks(data)
+
+        start = _now()
+        try:
+            response = self._send_limited(method, url, headers, data)
+        finally:
+            info.network_time += _now() - start
+
+        info.bytes_received += len(response.content)
+        return response
+
+    def _send_limited(self, method, url, headers, data):
+        if self._slots is not None:
+            # wait for one of the max_connections requests in flight to finish
+            with self._slots:
+                return self._session_request(method, url, headers, data)
+
+        return self._session_request(method, url, headers, data)
+
+    def _session_request(self, method, url, headers, data):
+        return self._thread_local.session.request(
+            method,
+            url,
+            headers=headers,
+            data=data,
+            timeout=self._timeout
+        )
+
     def _handle_request_error(self, e):
         if isinstance(e, requests.exceptions.Timeout) or isinstance(
             e, requests.exceptions.ConnectionError
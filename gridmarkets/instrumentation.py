@@ -0,0 +1,220 @@
+from __future__ import absolute_import
+from builtins import object
+from bisect import bisect_left
+import threading
+import time
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+_now = getattr(time, 'monotonic', time.time)
+
+# upper bounds in seconds of the latency histogram buckets, from 1 ms doubling up to about a minute
+LATENCY_BUCKETS = tuple(0.001 * 2 ** i for i in range(17))
+
+
+def endpoint_name(url):
+    """ returns the first part of the url path, ex. 'project-status' for .../project-status/name """
+
+    return urlparse(url).path.strip('/').split('/')[0]
+
+
+class RequestInfo(object):
+    """
+    What a request cost, passed to the Instrumentation hooks. Times are in seconds and add up the
+    attempts of retried requests, encoding streamed bodies happens while they are sent so it is
+    counted in network_time.
+    """
+
+    __slots__ = ('method', 'url', 'endpoint', 'status', 'error', 'attempts', 'bytes_sent', 'bytes_received',
+                 'serialize_time', 'network_time', 'decode_time', 'elapsed', 'started')
+
+    def __init__(self, method, url, endpoint=None):
+        self.method = method.upper()
+        self.url = url
+        self.endpoint = endpoint or endpoint_name(url)
+        # response status, None if no response was received, and the exception ending the request if any
+        self.status = None
+        self.error = None
+        self.attempts = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # encoding and compressing the body, sending it and waiting for the response, handling the response
+        self.serialize_time = 0.0
+        self.network_time = 0.0
+        self.decode_time = 0.0
+        # from before_request to after_request, including the waits between retries
+        self.elapsed = 0.0
+        self.started = _now()
+
+    def count_chunks(self, chunks):
+        """ yields the chunks of a streamed body, counting the bytes sent """
+
+        for chunk in chunks:
+            self.bytes_sent += len(chunk)
+            yield chunk
+
+    def __repr__(self):
+        return "RequestInfo(%s %s, status=%r, elapsed=%.4f)" % (self.method, self.endpoint, self.status, self.elapsed)
+
+
+class Instrumentation(object):
+    """
+    Hooks called around every request of HttpClient and AsyncHttpClient, subclasses export the
+    RequestInfo to a metrics system. The hooks are called on the thread making the request and
+    do nothing by default.
+
+    after_request is called when the request ends, or for requests made with handled=True when
+    the response is passed to the client's handle_response, so the decode time is known. The
+    Envoy clients always do so.
+    """
+
+    def before_request(self, info):
+        pass
+
+    def after_request(self, info):
+        pass
+
+
+def finish_request(instrumentation, info):
+    info.elapsed = _now() - info.started
+    instrumentation.after_request(info)
+
+
+def handle_response(instrumentation, response, handler, *args):
+    """ returns handler(*args), reporting the request of response with the handler's time as its decode time """
+
+    info = getattr(response, 'request_info', None)
+
+    if info is None:
+        return handler(*args)
+
+    start = _now()
+    try:
+        return handler(*args)
+    except Exception as e:
+        info.error = e
+        raise
+    finally:
+        info.decode_time += _now() - start
+        finish_request(instrumentation, info)
+
+
+class Histogram(object):
+    """Counts of values in buckets with the given upper bounds, values above the last bound go to an overflow bucket"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """ returns the upper bound of the bucket holding the p-th percentile, 0 <= p <= 100 """
+
+        if not self.count:
+            return 0.0
+
+        rank = max(1, int(round(p / 100.0 * self.count)))
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bounds[idx], self.max) if idx < len(self.bounds) else self.max
+
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class _EndpointStats(object):
+    TIMES = ('elapsed', 'serialize_time', 'network_time', 'decode_time')
+
+    def __init__(self, bounds):
+        self.requests = 0
+        self.errors = 0
+        self.attempts = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.statuses = dict()
+        self.histograms = dict((name, Histogram(bounds)) for name in self.TIMES)
+
+    def add(self, info):
+        self.requests += 1
+        self.errors += info.error is not None
+        self.attempts += info.attempts
+        self.bytes_sent += info.bytes_sent
+        self.bytes_received += info.bytes_received
+        self.statuses[info.status] = self.statuses.get(info.status, 0) + 1
+
+        for name in self.TIMES:
+            self.histograms[name].add(getattr(info, name))
+
+    def summary(self):
+        network_time = self.histograms['network_time'].total
+
+        summary = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'attempts': self.attempts,
+            'statuses': dict(self.statuses),
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            # bytes per second while waiting on the network
+            'throughput': (self.bytes_sent + self.bytes_received) / network_time if network_time else 0.0,
+        }
+
+        for name, histogram in self.histograms.items():
+            summary[name] = histogram.summary()
+
+        return summary
+
+
+class HistogramCollector(Instrumentation):
+    """Thread safe in-memory latency histograms, byte counts and statuses per endpoint"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        """Constructor
+
+        :param bounds: increasing upper bounds in seconds of the histogram buckets
+        """
+
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._endpoints = dict()
+
+    def after_request(self, info):
+        with self._lock:
+            stats = self._endpoints.get(info.endpoint)
+            if stats is None:
+                stats = self._endpoints[info.endpoint] = _EndpointStats(self.bounds)
+            stats.add(info)
+
+    def summary(self):
+        """ returns a dict of endpoint to its counters and the count, mean, p50, p90, p99 and max of its times """
+
+        with self._lock:
+            return dict((endpoint, stats.summary()) for endpoint, stats in self._endpoints.items())
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = dict()
@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+from builtins import object
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+_missing = object()
+
+
+class LRUCache(object):
+    """Thread safe bounded mapping evicting the least recently used entries"""
+
+    def __init__(self, maxsize=128):
+        """Constructor
+
+        :param maxsize: maximum number of entries, 0 or None disables caching
+        """
+
+        self.maxsize = maxsize or 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.pop(key, _missing)
+
+            if value is _missing:
+                self.misses += 1
+                return default
+
+            # re-insert to mark the entry as most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
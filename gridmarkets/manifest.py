@@ -0,0 +1,99 @@
+from __future__ import absolute_import
+from builtins import object
+import json
+from .fileutil import atomic_write
+from .hashing import DIGEST_ALGORITHM
+
+# name of the manifest file kept in the project folder, it is never uploaded
+MANIFEST_NAME = '.gm_upload_manifest.json'
+
+MANIFEST_VERSION = 1
+
+
+class UploadManifest(object):
+    """Size, mtime and digest of the project files at their last successful upload, by relative path"""
+
+    def __init__(self, path, remote_root):
+        """Constructor
+
+        :param path: manifest file path
+        :param remote_root: remote folder the files were uploaded to, a manifest of another folder is ignored
+        """
+
+        self.path = path
+        self.remote_root = remote_root
+        self.entries = dict()
+
+    def load(self):
+        """ reads the manifest file, a missing, unreadable or outdated manifest is empty """
+
+        self.entries = dict()
+
+        try:
+            with open(self.path, 'rb') as f:
+                manifest = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return self
+
+        if (not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION or
+                manifest.get('remote_root') != self.remote_root or
+                manifest.get('algorithm') != DIGEST_ALGORITHM):
+            return self
+
+        self.entries = manifest.get('files') or dict()
+
+        return self
+
+    def save(self):
+        manifest = dict()
+        manifest['version'] = MANIFEST_VERSION
+        manifest['remote_root'] = self.remote_root
+        manifest['algorithm'] = DIGEST_ALGORITHM
+        manifest['files'] = self.entries
+
+        atomic_write(self.path, json.dumps(manifest).encode('utf-8'))
+
+    def changed(self, files, stats, digest=None):
+        """ returns the files which are new or changed since the last upload
+
+        Without digest a file is changed if its size or mtime differ. With digest, files of the same size
+        are compared by content, so touched but unchanged files are skipped and changes keeping the
+        mtime are found.
+
+        :param files: relative file paths
+        :param stats: function returning the FileStat of a relative path
+        :param digest: optional function returning the content digest of a relative path
+        """
+
+        changed = list()
+
+        for f in files:
+            entry = self.entries.get(f)
+            stat = stats(f)
+
+            if entry is None or stat.size is None or entry[0] != stat.size:
+                changed.append(f)
+            elif digest is None:
+                if entry[1] != stat.mtime:
+                    changed.append(f)
+            elif entry[2] is None or entry[2] != digest(f):
+                changed.append(f)
+
+        return changed
+
+    def record(self, files, stats, digests=None):
+        """ records the files as uploaded
+
+        :param files: relative file paths
+        :param stats: function returning the FileStat of a relative path
+        :param digests: optional dict of known content digests by relative path
+        """
+
+        digests = digests or dict()
+
+        for f in files:
+            stat = stats(f)
+            if stat.size is None:
+                self.entries.pop(f, None)
+            else:
+                self.entries[f] = [stat.size, stat.mtime, digests.get(f)]
@@ -38,11 +38,15 @@ class MiniGraphWarning(Warning): pass
 # todo: consider functools.lru_cache for the retrieval methods
 
 class MiniGraph(object):
-    __slots__ = ('_graph',)
+    __slots__ = ('_graph', '_mutations', '_size', '_edge_cache', '_edge_cache_mutations')
 
     def __init__(self, nodes=None, edges=None):
 
         self._graph = {}
+        self._mutations = 0
+        self._size = 0
+        self._edge_cache = None
+        self._edge_cache_mutations = None
         # nodes
         if nodes is None:
             nodes = {}
@@ -98,7 +102,13 @@ class MiniGraph(object):
         except AttributeError:
             return (idx, self.nodes[idx])
 
+    @property
+    def mutation_count(self):
+        """Number of changes made to the graph, lets callers invalidate derived data"""
+        return self._mutations
+
     def add_node(self, nodeid, data=None):
+        self._mutations += 1
         # if nodeid in self.nodes:
         #     raise MiniGraphError('Node already exists: {}'.format(nodeid))
         #self.nodes[nodeid] = dict(data or [])
@@ -121,9 +131,18 @@ class MiniGraph(object):
         g = self._graph
         if nodeid not in g:
             raise KeyError(nodeid)
+        self._mutations += 1
+        n = g[nodeid]
+        # every edge touching the node is listed in its own edge dicts, undirected ones twice
+        self._size -= len(set(
+            id(e) for d in (n[2], n[3]) for ed in d.values() for e in ed.values()
+        ))
         _prune_edges(g, nodeid)
         del g[nodeid]
 
+    def __contains__(self, nodeid):
+        return nodeid in self._graph
+
     def node(self, nodeid):
         return self._graph[nodeid]
 
@@ -137,6 +156,7 @@ class MiniGraph(object):
     def add_edges(self, edges):
         g = self._graph
         add_edge = _add_edge
+        self._mutations += 1
 
         for edge in edges:
             edgelen = len(edge)
@@ -165,6 +185,7 @@ class MiniGraph(object):
                 innerdict = d[label]
             if end not in innerdict:
                 innerdict[end] = e
+                self._size += 1
             else:
                 if innerdict[end][4] != e[4]:
                     raise MiniGraphError(
@@ -222,6 +243,7 @@ class MiniGraph(object):
     def _fast_add_edges1(self, edges):
         g = self._graph
         add_edge = _add_edge
+        self._mutations += 1
 
         for e in edges:
             start = e[0]
@@ -241,6 +263,7 @@ class MiniGraph(object):
                 innerdict = d[label]
             if end not in innerdict:
                 innerdict[end] = e
+                self._size += 1
             else:
                 if innerdict[end][4] != e[4]:
                     raise MiniGraphError(
@@ -298,13 +321,15 @@ class MiniGraph(object):
     def _fast_add_edges2(self, edges):
         g = self._graph
         add_edge = _add_edge
+        self._mutations += 1
 
         for e in edges:
             start = e[0]
             end = e[1]
             label = e[2]
             directed = e[4]
-            add_edge(g[start][2], label, end, e)
+            if add_edge(g[start][2], label, end, e):
+                self._size += 1
             add_edge(g[end][3], label, start, e)
             if directed is False:
                 add_edge(g[end][2], label, start, e)
@@ -319,6 +344,8 @@ class MiniGraph(object):
         _dir = g[start][2][label][end][4]
         if directed is not None:
             assert _dir == directed
+        self._mutations += 1
+        self._size -= 1
 
         try:
             in_edges = g[end][3]
@@ -348,21 +375,34 @@ class MiniGraph(object):
                 MiniGraphWarning
             )
 
+    def successors(self, nodeid):
+        return [end for ed in self._graph[nodeid][2].values() for end in ed]
+
+    def predecessors(self, nodeid):
+        return [start for ed in self._graph[nodeid][3].values() for start in ed]
+
     def edge(self, start, end, label=None, directed=None):
         e = self._graph[start][2][label][end]
         if directed is not None:
             assert e[4] == directed
         return e
 
+    def iter_edges(self):
+        """Iterates the edges without building a list, the graph must not change while iterating"""
+        for nid, n in self._graph.items():
+            for ed in n[2].values():
+                for e in ed.values():
+                    # only include undirected links from the source node (whatever
+                    # the source node was when it was instantiated)
+                    if e[4] or e[0] == nid:
+                        yield e
+
     def edges(self):
-        return [e
-            for nid, n in list(self._graph.items())
-            for ed in list(n[2].values())
-            for e in list(ed.values())
-            # only include undirected links from the source node (whatever
-            # the source node was when it was instantiated)
-            if e[4] or e[0] == nid
-        ]
+        """Returns a new list of the edges, copied from a snapshot cached until the graph changes"""
+        if self._edge_cache_mutations != self._mutations:
+            self._edge_cache = tuple(self.iter_edges())
+            self._edge_cache_mutations = self._mutations
+        return list(self._edge_cache)
 
     def find_edges(self, start=None, end=None, **kwargs):
         if start is Ellipsis: start = None
@@ -409,7 +449,7 @@ class MiniGraph(object):
         return len(self._graph)
 
     def size(self):
-        return len(self.edges())
+        return self._size
 
     def degree(self, nodeid):
         n = self._graph[nodeid]
@@ -469,30 +509,20 @@ class MiniGraph(object):
 
 def _prune_edges(graph, nodeid):
     g = graph[nodeid]
-    # forward links; remove reverse links on ends
-    edict = defaultdict(list)
-    for ed in list(g[2].values()):
-        for e in list(ed.values()):
-            if e[1] != nodeid:  # this will get removed anyway
-                edict[e[1]].append(e)
-    for end, es in list(edict.items()):
-        ld = graph[end][3]
-        for e in es:
-            del ld[e[2]][e[0]]
-            if len(ld[e[2]]) == 0:
-                del ld[e[2]]
-    # backward links; remove forward links on starts
-    edict = defaultdict(list)
-    for ed in list(g[3].values()):
-        for e in list(ed.values()):
-            if e[0] != nodeid:  # this will get removed anyway
-                edict[e[0]].append(e)
-    for start, es in list(edict.items()):
-        ld = graph[start][2]
-        for e in es:
-            del ld[e[2]][e[1]]
-            if len(ld[e[2]]) == 0:
-                del ld[e[2]]
+    # every edge of the node is keyed by the other node in the node's edge
+    # dicts; remove the entries of the same edge from the other node's dicts,
+    # including the mirrored entries of undirected edges
+    for d in (g[2], g[3]):
+        for ed in list(d.values()):
+            for other, e in list(ed.items()):
+                if other == nodeid:  # this will get removed anyway
+                    continue
+                for od in (graph[other][2], graph[other][3]):
+                    ld = od.get(e[2])
+                    if ld is not None and ld.get(nodeid) is e:
+                        del ld[nodeid]
+                        if len(ld) == 0:
+                            del od[e[2]]
 
 # for a bit more speed, this can be inlined directly
 def _add_edge(d, label, idx, e):
@@ -502,9 +532,11 @@ def _add_edge(d, label, idx, e):
         innerdict = d[label]
     if idx not in innerdict:
         innerdict[idx] = e
+        return True
     else:
         if innerdict[idx][4] != e[4]:
             raise MiniGraphError(
                 'Cannot update directed and undirected edges.'
             )
         innerdict[idx][3].update(e[3])
+        return False
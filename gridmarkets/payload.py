@@ -0,0 +1,232 @@
+from __future__ import absolute_import
+from builtins import object
+import json
+
+# encodings of the file lists of upload and submit payloads
+# flat: list of relative paths, understood by every Envoy version
+FILES_FLAT = 'flat'
+# grouped: list of [folder prefix, [file names]] runs in the order of the files
+FILES_GROUPED = 'grouped'
+# tree: nested [[file names], {folder name: sub tree}] folders
+FILES_TREE = 'tree'
+
+FILES_ENCODINGS = (FILES_FLAT, FILES_GROUPED, FILES_TREE)
+
+# lets EnvoyClient pick a compact encoding advertised by Envoy
+FILES_AUTO = 'auto'
+
+# response header of Envoy versions decoding compact file lists, ex. 'grouped, tree'
+ENCODINGS_HEADER = 'X-Envoy-Files-Encodings'
+
+# approximate bytes of the chunks of streamed request bodies
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _split(path):
+    idx = path.rfind('/') + 1
+    return path[:idx], path[idx:]
+
+
+def iter_grouped(files):
+    """ yields the [folder prefix, [file names]] runs of the grouped encoding one at a time """
+
+    prefix = None
+    names = None
+
+    for path in files:
+        path_prefix, name = _split(path)
+        if path_prefix != prefix:
+            if names is not None:
+                yield [prefix, names]
+            prefix = path_prefix
+            names = list()
+        names.append(name)
+
+    if names is not None:
+        yield [prefix, names]
+
+
+def encode_grouped(files):
+    return list(iter_grouped(files))
+
+
+def decode_grouped(runs):
+    return [prefix + name for prefix, names in runs for name in names]
+
+
+def encode_tree(files):
+    root = [list(), dict()]
+
+    for path in files:
+        node = root
+        parts = path.split('/')
+        for folder in parts[:-1]:
+            sub_folders = node[1]
+            if folder not in sub_folders:
+                sub_folders[folder] = [list(), dict()]
+            node = sub_folders[folder]
+        node[0].append(parts[-1])
+
+    return root
+
+
+def decode_tree(tree, prefix=''):
+    names, sub_folders = tree
+    files = [prefix + name for name in names]
+
+    for folder, sub_tree in sub_folders.items():
+        files.extend(decode_tree(sub_tree, '{0}{1}/'.format(prefix, folder)))
+
+    return files
+
+
+def encode_files(files, encoding=FILES_FLAT):
+    """ returns the payload keys of a file list in the encoding
+
+    The grouped encoding keeps the order of the files, the tree encoding lists the files folder by folder.
+
+    :param files: relative '/' separated file paths
+    :param encoding: one of FILES_ENCODINGS
+    :return: dict with the files key and, unless flat, the filesEncoding key
+    """
+
+    if encoding == FILES_FLAT:
+        return {'files': list(files)}
+
+    if encoding == FILES_GROUPED:
+        return {'filesEncoding': FILES_GROUPED, 'files': encode_grouped(files)}
+
+    if encoding == FILES_TREE:
+        return {'filesEncoding': FILES_TREE, 'files': encode_tree(files)}
+
+    raise ValueError("unknown files encoding: {0}".format(encoding))
+
+
+def decode_files(data):
+    """ returns the relative file paths of payload keys made by encode_files """
+
+    encoding = data.get('filesEncoding', FILES_FLAT)
+
+    if encoding == FILES_FLAT:
+        return list(data['files'])
+
+    if encoding == FILES_GROUPED:
+        return decode_grouped(data['files'])
+
+    if encoding == FILES_TREE:
+        return decode_tree(data['files'])
+
+    raise ValueError("unknown files encoding: {0}".format(encoding))
+
+
+def negotiate_encoding(header):
+    """ returns the compact encoding listed in the Envoy encodings header value, flat if none
+
+    grouped is preferred as it keeps the order of the files.
+    """
+
+    offered = set(e.strip().lower() for e in (header or '').split(','))
+
+    for encoding in (FILES_GROUPED, FILES_TREE):
+        if encoding in offered:
+            return encoding
+
+    return FILES_FLAT
+
+
+class JsonArray(object):
+    """
+    JSON array of a JsonStream encoded item by item, without the list in memory.
+
+    items is an iterable or a function returning one, a function lets the stream be sent again.
+    """
+
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items() if callable(self.items) else self.items)
+
+
+class JsonObject(JsonArray):
+    """JSON object of a JsonStream encoded from (key, value) pairs, like JsonArray"""
+
+    __slots__ = ()
+
+
+_JSON_BATCH = 512
+
+
+def _iter_json(value):
+    # dicts are walked for nested JsonArray and JsonObject values, other values are encoded at once
+    if isinstance(value, JsonObject):
+        items = iter(value)
+    elif isinstance(value, dict):
+        items = iter(value.items())
+    elif isinstance(value, JsonArray):
+        # plain items are encoded in batches, calling json.dumps per item is slow for millions of files
+        yield '['
+        first = True
+        batch = list()
+        for item in value:
+            if isinstance(item, (dict, JsonArray)):
+                if batch:
+                    yield ('{0}' if first else ',{0}').format(json.dumps(batch)[1:-1])
+                    first = False
+                    batch = list()
+                if not first:
+                    yield ','
+                first = False
+                for piece in _iter_json(item):
+                    yield piece
+            else:
+                batch.append(item)
+                if len(batch) >= _JSON_BATCH:
+                    yield ('{0}' if first else ',{0}').format(json.dumps(batch)[1:-1])
+                    first = False
+                    batch = list()
+        if batch:
+            yield ('{0}' if first else ',{0}').format(json.dumps(batch)[1:-1])
+        yield ']'
+        return
+    else:
+        yield json.dumps(value)
+        return
+
+    yield '{'
+    first = True
+    for key, item in items:
+        yield ('{0}:' if first else ',{0}:').format(json.dumps(key))
+        first = False
+        for piece in _iter_json(item):
+            yield piece
+    yield '}'
+
+
+class JsonStream(object):
+    """
+    Request body encoding a payload to JSON while it is sent, HttpClient sends it with chunked
+    transfer encoding. Large lists of the payload are given as JsonArray or JsonObject so they are
+    never held in memory as a whole, iterating the stream again encodes the payload again.
+    """
+
+    def __init__(self, value, chunk_size=STREAM_CHUNK_SIZE):
+        self.value = value
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        pieces = list()
+        size = 0
+
+        for piece in _iter_json(self.value):
+            pieces.append(piece)
+            size += len(piece)
+            if size >= self.chunk_size:
+                yield ''.join(pieces).encode('utf-8')
+                pieces = list()
+                size = 0
+
+        if pieces:
+            yield ''.join(pieces).encode('utf-8')
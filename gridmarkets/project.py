@@ -4,6 +4,12 @@ from builtins import object
 import datetime
 import json
 import os
+from .dependencies import DependencyScanner
+from .file_set import FileSet
+from .hashing import DIGEST_ALGORITHM, HASH_WORKERS, file_digest, hash_files
+from .manifest import MANIFEST_NAME, UploadManifest
+from .payload import FILES_FLAT, FILES_GROUPED, JsonArray, JsonObject, JsonStream, encode_files, iter_grouped
+from .scanner import FileStat, PathMatcher, SCAN_WORKERS, scan_folder
 from .watch_file import WatchFile
 
 
@@ -20,33 +26,62 @@ class Project(object):
             ' ', '_').replace(':', '-').replace('.', '_')
         self.remote_output_folder = "{0}/render_results/{1}".format(self.remote_root, self.remote_output_folder_name)
         self.jobs = list()
-        self.files = list()
+        self.files = FileSet()
+        # number of folders listed concurrently by add_folders
+        self.scan_workers = SCAN_WORKERS
         self.watch_files = list()
         self.skip_upload = False 
+        # only upload the files which are new or changed since the last successful upload
+        self.incremental_upload = False
+        # compare the content digests of files with an unchanged size instead of their mtime
+        self.verify_upload_hashes = False
+        # send the content digests of the files with uploads, so Envoy can skip files it already holds
+        self.include_digests = False
+        # number of threads hashing files, or of processes with hash_processes outside of embedded interpreters
+        self.hash_workers = HASH_WORKERS
+        self.hash_processes = False
+        self.file_digests = dict()
+        # stat of the files when their digest was computed, and when upload_files listed them
+        self._digest_stats = dict()
+        self._upload_stats = None
+        self._manifest = None
         self.skip_auto_download = False
+        # encoding of the file lists in the payloads, set by the client from its files_encoding
+        self.files_encoding = FILES_FLAT
 
         # define default watch files
         download_path = os.path.join(self.local_root, 'gm_results')
         download_pattern = "{0}/.+".format(self.remote_output_folder)
         self.watch_files_default = WatchFile(download_pattern, download_path)
 
+    @property
+    def files(self):
+        """ the relative paths of the project files, in the order they were added and without duplicates """
+        return self._files
+
+    @files.setter
+    def files(self, files):
+        """ assigning a FileSet keeps it, other lists are copied without their duplicates into a new FileSet,
+        so later changes go to project.files rather than to the assigned list
+        """
+
+        self._files = files if isinstance(files, FileSet) else FileSet(files)
+
     def  _is_in_directory(self, path, parent_dir):
         return os.path.commonprefix([path, parent_dir]) == parent_dir
 
     def _rel_path(self, path, parent_dir):
         return os.path.relpath(path, os.path.dirname(parent_dir))
 
-    def _add_folder(self, path):
+    def _add_folder(self, path, include=None, exclude=None):
         if not os.path.isabs(path):
             path = os.path.join(self.local_root, path)
 
         if os.path.isdir(path) and self._is_in_directory(path, self.local_root):
-            for dir_name, _, dir_files in os.walk(path):
-                for dir_file in dir_files:
-                    src_file = os.path.join(dir_name, dir_file)
-                    src_file = os.path.relpath(src_file, self.local_root)
-                    src_file = src_file.replace("\\", "/")
-                    self.files.append(src_file)
+            for src_file, stat in scan_folder(path, self.local_root, self.scan_workers, include, exclude):
+                if src_file == MANIFEST_NAME:
+                    continue
+                self.files.add(src_file, stat)
 
     def add_jobs(self, *jobs):
         for j in jobs:
@@ -62,11 +97,168 @@ class Project(object):
             if os.path.isfile(f) and self._is_in_directory(f, self.local_root):
                 src_file = os.path.relpath(f, self.local_root)
                 src_file = src_file.replace("\\", "/")
-                self.files.append(src_file)
+                if src_file == MANIFEST_NAME:
+                    continue
+                st = os.stat(f)
+                self.files.add(src_file, FileStat(st.st_size, st.st_mtime))
+
+    def add_folders(self, *args, **kwargs):
+        """ adds the files under the folders
+
+        :param include: glob patterns files must match to be added, ex. ['*.exr', '*.abc']
+        :param exclude: glob patterns of files and folders to skip, ex. ['.git', '*.tmp', 'cache/sim']
+        """
+
+        include = kwargs.pop('include', None)
+        exclude = kwargs.pop('exclude', None)
+        if kwargs:
+            raise TypeError("unexpected keyword arguments: {0}".format(', '.join(kwargs)))
+
+        # compile the patterns once for all folders
+        include = PathMatcher(include) if include else None
+        exclude = PathMatcher(exclude) if exclude else None
 
-    def add_folders(self, *args):
         for folder in args:
-            self._add_folder(folder)
+            self._add_folder(folder, include, exclude)
+
+    @property
+    def manifest(self):
+        """ the UploadManifest of the project, kept in the project folder """
+        if self._manifest is None:
+            self._manifest = UploadManifest(os.path.join(self.local_root, MANIFEST_NAME), self.remote_root).load()
+        return self._manifest
+
+    def _file_stat(self, src_file):
+        stat = self.files.stat(src_file) if src_file in self.files else None
+        return self._stat_file(src_file) if stat is None else stat
+
+    def _stat_file(self, src_file):
+        try:
+            st = os.stat(os.path.join(self.local_root, src_file))
+        except OSError:
+            return FileStat(None, None)
+        return FileStat(st.st_size, st.st_mtime)
+
+    def _refresh_stats(self):
+        """ stats the project files now, dropping the digests of the files changed since they were computed """
+
+        stats = dict()
+
+        for f in self.files:
+            stat = stats[f] = self._stat_file(f)
+            self.files.set_stat(f, stat)
+
+            if f in self.file_digests and self._digest_stats.get(f) != stat:
+                del self.file_digests[f]
+
+        return stats
+
+    def _file_digest(self, src_file):
+        digest = self.file_digests.get(src_file)
+        if digest is None:
+            self._digest_stats[src_file] = self._file_stat(src_file)
+            digest = self.file_digests[src_file] = file_digest(os.path.join(self.local_root, src_file))
+        return digest
+
+    def compute_digests(self, files=None):
+        """ computes the content digests of the files missing from file_digests or changed since they were hashed
+
+        Files are hashed in a pool of hash_workers threads. Every file is stat'ed again, a digest is only kept
+        while its file has the size and mtime it was hashed with.
+
+        :param files: relative file paths, defaults to all project files
+        """
+
+        missing = list()
+
+        for f in (self.files if files is None else files):
+            stat = self._stat_file(f)
+
+            # a digest is only valid for the stat the file had when it was hashed
+            if f not in self.file_digests or self._digest_stats.get(f) != stat:
+                self.file_digests.pop(f, None)
+                self._digest_stats[f] = stat
+                missing.append(f)
+
+        digests = hash_files([os.path.join(self.local_root, f) for f in missing], self.hash_workers,
+                             processes=self.hash_processes)
+
+        for f, digest in zip(missing, digests):
+            if digest is not None:
+                self.file_digests[f] = digest
+
+        return self.file_digests
+
+    def upload_files(self):
+        """ returns the files to upload, only the new and changed ones if incremental_upload is set
+
+        With incremental_upload every file is stat'ed again, so files changed since they were added are uploaded.
+        """
+
+        if not self.incremental_upload:
+            return list(self.files)
+
+        stats = self._upload_stats = self._refresh_stats()
+
+        if self.verify_upload_hashes:
+            self.compute_digests()
+
+        return self.manifest.changed(
+            self.files, stats.__getitem__, self._file_digest if self.verify_upload_hashes else None)
+
+    def record_upload(self):
+        """ records the project files in the manifest once their upload finished, if incremental_upload is set
+
+        Envoy uploads in the background, EnvoyClient.record_upload calls this once the project status reports
+        the upload finished. Files changed since upload_files listed them are left out, so the next upload
+        sends them again.
+        """
+
+        if not self.incremental_upload:
+            return
+
+        upload_stats = self._upload_stats
+        stats = self._refresh_stats()
+
+        if self.verify_upload_hashes or self.include_digests:
+            self.compute_digests()
+
+        changed = set()
+        if upload_stats is not None:
+            changed.update(f for f in self.files if upload_stats.get(f) != stats[f])
+
+        for f in changed:
+            self.manifest.entries.pop(f, None)
+
+        self.manifest.record([f for f in self.files if f not in changed], stats.__getitem__, self.file_digests)
+        self.manifest.save()
+        self._upload_stats = None
+
+    def _local_path(self, path):
+        # job paths are expressed in the remote project folder, ex. /sample project/scenes/shot.nk
+        remote_root = self.remote_root + '/'
+        if path.replace('\\', '/').startswith(remote_root):
+            return os.path.join(self.local_root, path.replace('\\', '/')[len(remote_root):])
+        if not os.path.isabs(path):
+            return os.path.join(self.local_root, path)
+        return path
+
+    def add_job_scenes(self, cache=None, max_workers=1, scanner=None):
+        """ adds the scene files of the jobs and the files referenced by them, instead of adding whole folders
+
+        Scene files of the types in dependencies.SCENE_PARSERS are parsed, referenced frame and tile sequences
+        are expanded. Like add_files, files outside the project folder are ignored.
+
+        :param cache: optional DependencyCache, skips parsing the scenes unchanged since the last scan
+        :param max_workers: number of scene files parsed concurrently
+        :param scanner: optional DependencyScanner to use instead of the default one
+        """
+
+        if scanner is None:
+            scanner = DependencyScanner(self.local_root, cache=cache, max_workers=max_workers)
+
+        scenes = [self._local_path(j.path) for j in self.jobs if j.path]
+        self.add_files(*scanner.scan(scenes))
 
     def add_watch_files(self, *watch_files):
         self.watch_files.extend(watch_files)
@@ -76,6 +268,14 @@ class Project(object):
 
     @property
     def serialize(self):
+        return self._serialize(stream=False)
+
+    @property
+    def serialize_stream(self):
+        """ the submit payload as a JsonStream, the file lists are encoded while the request is sent """
+        return JsonStream(self._serialize(stream=True))
+
+    def _serialize(self, stream):
         data = dict()
         data['project_request'] = dict()
         data['project_files'] = dict()
@@ -92,10 +292,7 @@ class Project(object):
 
         data['project_files']['localRoot'] = self.local_root
         data['project_files']['remoteRoot'] = self.remote_root
-        data['project_files']['files'] = list()
-
-        for f in self.files:
-            data['project_files']['files'].append(f)
+        data['project_files'].update(self._serialize_files(stream))
 
         if self.skip_upload:
             data['skip_upload'] = self.skip_upload
@@ -112,18 +309,44 @@ class Project(object):
 
         return data
 
+    def _serialize_files(self, stream):
+        # streamed payloads iterate the file set itself rather than a copy of it
+        files = self.files if stream and not self.incremental_upload else self.upload_files()
+
+        if not stream or self.files_encoding not in (FILES_FLAT, FILES_GROUPED):
+            data = encode_files(files, self.files_encoding)
+        elif self.files_encoding == FILES_GROUPED:
+            data = {'filesEncoding': FILES_GROUPED, 'files': JsonArray(lambda: iter_grouped(files))}
+        else:
+            data = {'files': JsonArray(files)}
+
+        if self.include_digests:
+            digests = self.compute_digests(files)
+            data['digestAlgorithm'] = DIGEST_ALGORITHM
+
+            if stream:
+                data['digests'] = JsonObject(lambda: ((f, digests[f]) for f in files if f in digests))
+            else:
+                data['digests'] = dict((f, digests[f]) for f in files if f in digests)
+
+        return data
+
     @property
     def upload_serialize(self):
+        return self._upload_serialize(stream=False)
+
+    @property
+    def upload_serialize_stream(self):
+        """ the upload payload as a JsonStream, the file lists are encoded while the request is sent """
+        return JsonStream(self._upload_serialize(stream=True))
+
+    def _upload_serialize(self, stream):
         data = dict()
-        data['upload'] = list()
         item = dict()
         item['localRoot'] = self.local_root
         item['remoteRoot'] = self.remote_root
-        item['files'] = list()
-
-        for f in self.files:
-            item['files'].append(f)
+        item.update(self._serialize_files(stream))
 
-        data['upload'].append(item)
+        data['upload'] = JsonArray([item]) if stream else [item]
 
         return data
@@ -1,40 +1,360 @@
 from __future__ import absolute_import
 from builtins import object
+import marshal
 import re
-from distutils.version import LooseVersion
+import sys
+from array import array
+from collections import OrderedDict
 from . import minigraph as mg
+from .compact_minigraph import CompactMiniGraph
+from .fileutil import atomic_write
+from .lru_cache import LRUCache
+from .versions import version_key
+
+# default number of query results kept by a resolver
+QUERY_CACHE_SIZE = 256
+
+# header of resolver snapshot files, followed by the format version and the python version writing it
+SNAPSHOT_MAGIC = b'GMRESOLVER'
+SNAPSHOT_FORMAT = 1
+
+# characters which make a query type part of a regular expression rather than a literal type
+_REGEX_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+def _compile_query_item(item):
+    # if only the product name has been requested, fix the query to match all versions
+    if ":" not in item:
+        item = item+":[0-9]+"
+
+    # check that our pattern either ends in a . or is the end of the string.
+    #   since nuke uses formatting like 10.5v1, we also match v as if it was a .,
+    #   if it is preceded by a number
+    item += "(\\.|$|(?<=[0-9])[v])"
+    return re.compile(item)
+
+
+def _array_bytes(a):
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
+def _bytes_array(b):
+    a = array('i')
+    if hasattr(a, 'frombytes'):
+        a.frombytes(b)
+    else:
+        a.fromstring(b)
+    return a
+
+
+def _product_node(item):
+    return "{0}:{1}".format(item["app_type"], item["version"])
+
+
+def _copy_result(result):
+    # callers get copies so they can't change the cached result
+    return dict((item_type, {'is_plugin': item['is_plugin'], 'versions': list(item['versions'])})
+                for item_type, item in result.items())
+
 
 class Resolver(object):
     """Class to compute compatible combination of products"""
 
-    def __init__(self, products):
+    def __init__(self, products, cache_size=QUERY_CACHE_SIZE, compact=False):
         """Constructor
 
         :param products: pass the products JSON received from the buyer API call
+        :param cache_size: number of query results to keep in the LRU cache, 0 disables caching
+        :param compact: store the graph in a CompactMiniGraph, which uses less memory for large catalogs
         """
 
-        # store the products
-        self.products = products
+        self._cache = LRUCache(cache_size)
+        self._build(products, compact)
+
+    def _build(self, products, compact):
+        # store the products, keyed by their node id so catalog deltas can find them
+        self._products = OrderedDict((_product_node(item), item) for item in products)
+        self._products_list = products
 
         # create a graph (vertices in format product:version and) and create edges with data from compatibility field
         # note that this directed graph by default
-        self.graph = mg.MiniGraph()
+        self.graph = CompactMiniGraph() if compact else mg.MiniGraph()
+
+        for item in products:
+            self._add_product(_product_node(item), item["compatible_modules"])
+
+        self._build_indexes()
+
+    @property
+    def products(self):
+        """ the products of the catalog, including the changes applied by apply_delta """
+        if self._products_list is None:
+            self._products_list = list(self._products.values())
+        return self._products_list
+
+    @products.setter
+    def products(self, products):
+        # replacing the catalog rebuilds the graph and the indexes, like creating a new resolver
+        self._build(products, isinstance(self.graph, CompactMiniGraph))
+
+    def _add_product(self, product_node, compatible_modules):
+        # add the product node and data which we can use later
+        self.graph.add_node(product_node, data={'is_plugin': False})
+
+        for plugin_node in compatible_modules:
+            # add plugin node with data, note that we don't have a friendly name for plugin hence type and name will be same
+            self.graph.add_node(plugin_node, data={'is_plugin': True})
+
+            # add the edge between product node and plugin node
+            self.graph.add_edge(product_node, plugin_node)
+
+    def _build_indexes(self):
+        # node ids by product or plugin type, so queries only look at the nodes of the queried types
+        self._nodes_by_type = dict()
+
+        for nodeid, node_data in self.graph.nodes():
+            # parse the version once and keep it with the node data
+            item_type, _, item_version = nodeid.partition(':')
+            node_data['type'] = item_type
+            node_data['version'] = item_version
+            node_data['version_key'] = version_key(item_version)
+
+            self._nodes_by_type.setdefault(item_type, list()).append(nodeid)
+
+        # keep the node ids of every type sorted by version, so results come out ordered
+        for nodeids in self._nodes_by_type.values():
+            nodeids.sort(key=lambda nodeid: self.graph.node(nodeid)[1]['version_key'])
+
+        self._cache.clear()
+        self._indexed_mutations = self.graph.mutation_count
+
+    def _check_indexes(self):
+        # the graph is public, rebuild the derived data if it was changed since indexing
+        if self._indexed_mutations != self.graph.mutation_count:
+            self._build_indexes()
+
+    def apply_delta(self, added=(), removed=(), changed=()):
+        """ updates the resolver in place with changes of the product catalog, instead of building a new one
+
+        Entries have the same shape as the products JSON. Products are identified by their app_type
+        and version, changed products replace the compatible_modules of the existing product and
+        plugins no longer listed by any product are removed. Removing an unknown product is ignored.
+
+        :param added: products added to the catalog
+        :param removed: products removed from the catalog
+        :param changed: products whose compatible_modules changed
+        """
+
+        self._check_indexes()
+
+        for item in removed:
+            product_node = _product_node(item)
+            if self._products.pop(product_node, None) is None:
+                continue
+
+            plugin_nodes = self.graph.successors(product_node)
+            for plugin_node in plugin_nodes:
+                self.graph.remove_edge(product_node, plugin_node)
+
+            self._remove_if_orphan(product_node)
+            for plugin_node in plugin_nodes:
+                self._remove_if_orphan(plugin_node)
+
+        for item in list(added) + list(changed):
+            product_node = _product_node(item)
+            self._products[product_node] = item
+
+            compatible_modules = set(item["compatible_modules"])
+            dropped = [plugin_node for plugin_node in self.graph.successors(product_node)
+                       if plugin_node not in compatible_modules] if product_node in self.graph else []
+
+            for plugin_node in dropped:
+                self.graph.remove_edge(product_node, plugin_node)
+
+            new_nodes = [nodeid for nodeid in OrderedDict.fromkeys([product_node] + item["compatible_modules"])
+                         if nodeid not in self.graph]
+            self._add_product(product_node, item["compatible_modules"])
+
+            for nodeid in new_nodes:
+                self._index_node(nodeid)
+            for plugin_node in dropped:
+                self._remove_if_orphan(plugin_node)
+
+        self._products_list = None
+        self._cache.clear()
+        self._indexed_mutations = self.graph.mutation_count
+
+    def _index_node(self, nodeid):
+        # add a new node to the version sorted list of its type, after the nodes with an equal version
+        node_data = self.graph.node(nodeid)[1]
+        item_type, _, item_version = nodeid.partition(':')
+        node_data['type'] = item_type
+        node_data['version'] = item_version
+        node_data['version_key'] = key = version_key(item_version)
+
+        nodeids = self._nodes_by_type.setdefault(item_type, list())
+        nodeids.insert(self._version_position(nodeids, key), nodeid)
+
+    def _version_position(self, nodeids, key):
+        # binary search of the position after the nodes with a version key lower or equal to key
+        lo, hi = 0, len(nodeids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key < self.graph.node(nodeids[mid])[1]['version_key']:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _remove_if_orphan(self, nodeid):
+        # nodes only exist for listed products and the plugins compatible with at least one product
+        if nodeid in self._products or self.graph.in_degree(nodeid) or self.graph.out_degree(nodeid):
+            return
+
+        key = self.graph.node(nodeid)[1]['version_key']
+
+        item_type = nodeid.partition(':')[0]
+        nodeids = self._nodes_by_type[item_type]
+
+        # the node is among the nodes with an equal version key, just before the search position
+        idx = self._version_position(nodeids, key) - 1
+        while nodeids[idx] != nodeid:
+            idx -= 1
+        del nodeids[idx]
+
+        if not nodeids:
+            del self._nodes_by_type[item_type]
+
+        self.graph.remove_node(nodeid)
+
+    def save(self, path):
+        """ writes the resolver to a snapshot file which Resolver.load reads back without rebuilding the graph
+
+        The snapshot holds a string table of the node ids, the adjacency as integer arrays and the
+        version sorted node lists of every type. It is written atomically.
+
+        :param path: snapshot file path
+        """
+
+        self._check_indexes()
+
+        nodeids = [nodeid for nodeid, _ in self.graph.nodes()]
+        index = dict((nodeid, i) for i, nodeid in enumerate(nodeids))
+        node_data = [self.graph.node(nodeid)[1] for nodeid in nodeids]
+
+        csr = []
+        for neighbours in (self.graph.successors, self.graph.predecessors):
+            offsets = array('i', [0])
+            targets = array('i')
+            for nodeid in nodeids:
+                targets.extend(index[other] for other in neighbours(nodeid))
+                offsets.append(len(targets))
+            csr.extend((offsets, targets))
+
+        types = list(self._nodes_by_type)
+        type_nodes = [_array_bytes(array('i', [index[nodeid] for nodeid in self._nodes_by_type[item_type]]))
+                      for item_type in types]
+
+        snapshot = {
+            'products': self.products,
+            'nodes': nodeids,
+            'is_plugin': bytes(bytearray(1 if data.get('is_plugin') else 0 for data in node_data)),
+            'versions': [data['version'] for data in node_data],
+            'version_keys': [data['version_key'] for data in node_data],
+            'adjacency': [_array_bytes(a) for a in csr],
+            'types': types,
+            'type_nodes': type_nodes,
+        }
+
+        header = SNAPSHOT_MAGIC + bytes(bytearray([SNAPSHOT_FORMAT, sys.version_info[0], sys.version_info[1]]))
+        atomic_write(path, header + marshal.dumps(snapshot))
+
+    @classmethod
+    def load(cls, path, cache_size=QUERY_CACHE_SIZE):
+        """ reads a resolver written by Resolver.save, the graph is loaded into a CompactMiniGraph
+
+        :param path: snapshot file path
+        :raises ValueError: if the file is not a snapshot or was written by another python version
+        """
 
-        for item in self.products:
-            app_type = item["app_type"]
-            app_version = item["version"]
-            product_node = "{0}:{1}".format(app_type, app_version)
-            compatible_modules = item["compatible_modules"]
+        with open(path, 'rb') as f:
+            content = f.read()
 
-            # add the product node and data which we can use later
-            self.graph.add_node(product_node, data={'is_plugin': False})
+        header_size = len(SNAPSHOT_MAGIC) + 3
+        header = bytearray(content[:header_size])
 
-            for plugin_node in compatible_modules:
-                # add plugin node with data, note that we don't have a friendly name for plugin hence type and name will be same
-                self.graph.add_node(plugin_node, data={'is_plugin': True})
+        if not content.startswith(SNAPSHOT_MAGIC) or len(header) != header_size:
+            raise ValueError("{0} is not a resolver snapshot".format(path))
 
-                # add the edge between product node and plugin node
-                self.graph.add_edge(product_node, plugin_node)
+        if list(header[-3:]) != [SNAPSHOT_FORMAT, sys.version_info[0], sys.version_info[1]]:
+            raise ValueError("{0} was written by an incompatible version, rebuild the resolver".format(path))
+
+        snapshot = marshal.loads(content[header_size:])
+
+        nodeids = snapshot['nodes']
+        types = snapshot['types']
+        node_data = [{'is_plugin': bool(is_plugin), 'type': nodeid.partition(':')[0], 'version': version,
+                      'version_key': key}
+                     for nodeid, is_plugin, version, key in zip(
+                         nodeids, bytearray(snapshot['is_plugin']), snapshot['versions'], snapshot['version_keys'])]
+
+        csr = [_bytes_array(b) for b in snapshot['adjacency']]
+
+        resolver = cls.__new__(cls)
+        resolver._cache = LRUCache(cache_size)
+        resolver._products = OrderedDict((_product_node(item), item) for item in snapshot['products'])
+        resolver._products_list = snapshot['products']
+        resolver.graph = CompactMiniGraph.from_adjacency(nodeids, node_data, *csr)
+
+        resolver._nodes_by_type = dict()
+        for item_type, type_nodes in zip(types, snapshot['type_nodes']):
+            resolver._nodes_by_type[item_type] = [nodeids[i] for i in _bytes_array(type_nodes)]
+
+        resolver._indexed_mutations = resolver.graph.mutation_count
+
+        return resolver
+
+    def cache_info(self):
+        """ returns the hits, misses, maxsize and currsize of the query cache """
+        return self._cache.info()
+
+    def cache_clear(self):
+        self._cache.clear()
+
+    def _sorted_versions(self, item_type, nodeids=None):
+        """ returns the sorted versions of a type, restricted to nodeids if passed """
+
+        graph = self.graph
+        return [graph.node(nodeid)[1]['version']
+                for nodeid in self._nodes_by_type.get(item_type, ())
+                if nodeids is None or nodeid in nodeids]
+
+    def _has_node(self, nodeid):
+        try:
+            return nodeid in self.graph
+        except TypeError:
+            return False
+
+    def _neighbours(self, nodeid):
+        """ returns the nodes linked to nodeid by an edge in either direction """
+
+        neighbours = self.graph.successors(nodeid)
+        neighbours.extend(self.graph.predecessors(nodeid))
+        return neighbours
+
+    def _match_query_item(self, item):
+        """ returns the nodes matching a partial version query item such as hou, hou:17 or hou:17.5 """
+
+        item_type = item.split(':')[0]
+
+        # a query starting with a literal type can only match nodes of that type
+        if _REGEX_CHARS.isdisjoint(item_type):
+            candidates = self._nodes_by_type.get(item_type, ())
+        else:
+            candidates = [nodeid for nodeid, _ in self.graph.nodes()]
+
+        re_query = _compile_query_item(item)
+        return [nodeid for nodeid in candidates if re_query.match(nodeid)]
 
     def get_compatible_combinations(self, query, strict_version_matches=False, include_query_types=False):
         """ Method to get bi-directional queries to get compatible combinations between product and plugins
@@ -46,91 +366,120 @@ class Resolver(object):
         if not query or not isinstance(query, (list, tuple)):
             raise ValueError("query parameter should be list or tuple")
 
-        # get the types from query
-        qry_item_types = [item.split(':')[0] for item in query]
+        self._check_indexes()
+
+        # results do not depend on the order or repetition of the query items
+        cache_key = ('combinations', tuple(sorted(set(query))), bool(strict_version_matches), bool(include_query_types))
+        result = self._cache.get(cache_key)
+
+        if result is None:
+            result = self._get_compatible_combinations(query, strict_version_matches, include_query_types)
+            self._cache.put(cache_key, result)
+
+        return _copy_result(result)
+
+    def resolve_many(self, queries, strict_version_matches=False, include_query_types=False):
+        """ Method to answer many compatible combination queries at once
+
+        Query items shared by several queries are matched against the graph only once.
+
+        :param queries: list of queries, each in the format accepted by get_compatible_combinations
+        :return: list with the result of get_compatible_combinations for every query, in the same order
+        """
+
+        # queries are walked twice, so generators must be read once up front
+        queries = list(queries)
+
+        for query in queries:
+            if not query or not isinstance(query, (list, tuple)):
+                raise ValueError("query parameter should be list or tuple")
 
-        # # compute matches from the graph edges
-        edges = self.graph.edges()
+        self._check_indexes()
+
+        resolved_items = dict()
+        results = dict()
+        response = list()
+
+        for query in queries:
+            cache_key = ('combinations', tuple(sorted(set(query))), bool(strict_version_matches), bool(include_query_types))
+            result = results.get(cache_key)
+
+            if result is None:
+                result = self._cache.get(cache_key)
+
+                if result is None:
+                    result = self._get_compatible_combinations(
+                        query, strict_version_matches, include_query_types, resolved_items)
+                    self._cache.put(cache_key, result)
+
+                results[cache_key] = result
+
+            response.append(_copy_result(result))
+
+        return response
+
+    def _resolve_query_item(self, item, strict_version_matches):
+        """ returns the nodes matching a query item and the nodes linked by edges to the matched nodes """
 
         if strict_version_matches:
-            left_vertices_match =   [e[1] for e in edges if e[0] in query]
-            right_vertices_match =  [e[0] for e in edges if e[1] in query]
+            # direct neighbours of the queried node
+            return (), set(self._neighbours(item)) if self._has_node(item) else set()
+
+        matched = self._match_query_item(item)
+
+        # matched nodes that have edges, together with the nodes at the other end of those edges
+        linked = set()
+        for match in matched:
+            neighbours = self._neighbours(match)
+            if neighbours:
+                linked.add(match)
+                linked.update(neighbours)
+
+        return matched, linked
+
+    def _get_compatible_combinations(self, query, strict_version_matches, include_query_types, resolved_items=None):
+        if resolved_items is None:
+            resolved_items = dict()
+
+        # get the types from query
+        qry_item_types = set(item.split(':')[0] for item in query)
+
+        queried_matches = set()
+        linked_matches = set()
 
-            # compute matches from the graph edges
-            matches = set(left_vertices_match+right_vertices_match)
+        for item in query:
+            if item not in resolved_items:
+                resolved_items[item] = self._resolve_query_item(item, strict_version_matches)
+
+            matched, linked = resolved_items[item]
+            queried_matches.update(matched)
+            linked_matches.update(linked)
+
+        if strict_version_matches:
+            matches = linked_matches
 
         else:
-            # make regex patterns so we can match partial versions
-            re_queries = []
-            for item in query:
-                # if only the product name has been requested, fix the query to match all versions
-                if ":" not in item:
-                    item = item+":[0-9]+"
-                item += "(\.|$|(?<=[0-9])[v])"
-                re_queries.append(re.compile(item)) # check that our pattern either ends in a . or is the end of the string.
-                                                                            #   since nuke uses formatting like 10.5v1, we also match v as if it was a .,
-                                                                            #   if it is preceded by a number
-
-            # compare each edge to see if it starts with a query
-            matches = set()
-            for edge in edges:
-                for re_query in re_queries:
-                    if re_query.match(edge[0]):
-                        matches.add(edge[1])
-                        matches.add(edge[0])
-
-                    if re_query.match(edge[1]):
-                        matches.add(edge[0])
-                        matches.add(edge[1])
-            # print " > EDGE MATCHES", matches
-
-            # prune the matches to exclude the elements that dont' match
-            pruned_matches = set()
-            non_queried_matches = set()
-            for match in matches:
-                qry_item_type = match.split(':')[0]
-                for re_query in re_queries:
-                    if re_query.match(match):
-                        pruned_matches.add(match)
-
-                    elif qry_item_type not in qry_item_types:
-                        non_queried_matches.add(match)
-
-                matches = pruned_matches
-            # print " > PRUNED MATCHES", matches
-
-            # add back in the nodes we had edges to, but didn't search for explicitly
-            for non_queried_match in non_queried_matches:
-                for edge in edges:
-                    if non_queried_match in edge:
-                        if edge[0] in matches or edge[1] in matches:
-                            matches.add(non_queried_match)
-            # print " > FINAL MATCHES", matches
+            # keep the matching nodes and the linked nodes of types that were not queried
+            matches = set(
+                match for match in linked_matches
+                if match in queried_matches or match.split(':')[0] not in qry_item_types)
 
         # return the matches aggregated by version for each product type
         result = {}
 
-        for item in matches:
-            item_type, item_version = item.split(':')
-
+        for item_type in set(self.graph.node(item)[1]['type'] for item in matches):
             # matches list includes the items from query
             # don't need to include any item with the same product type as in query
             if item_type not in qry_item_types or include_query_types:
+                versions = self._sorted_versions(item_type, matches)
+
                 # get node data
-                node_data = self.graph.node(item)[1]
-
-                if item_type not in result:
-                    result[item_type] = dict()
-                    result[item_type]['is_plugin'] = node_data['is_plugin']
-                    result[item_type]['versions'] = list()
-            
-                result[item_type]['versions'].append(item_version)
-
-        # sorting of versions done using distutils.version
-        # sort the versions in each
-        for item_type, version_items in result.items():
-            result[item_type]['versions'] = sorted(version_items['versions'], key=LooseVersion)
-        
+                node_data = self.graph.node(self._nodes_by_type[item_type][0])[1]
+
+                result[item_type] = dict()
+                result[item_type]['is_plugin'] = node_data['is_plugin']
+                result[item_type]['versions'] = versions
+
         return result
 
     def get_versions_by_type(self, query):
@@ -140,40 +489,32 @@ class Resolver(object):
         :return: returns an array of version for an item type
         """
 
-        result = []
+        self._check_indexes()
 
-        # note it is an O(n) iteration for now, we can re-look at this later if we are dealing with a very large list
-        for item in self.graph.nodes():
-            item_type, item_version = item[0].split(':')
+        cache_key = ('versions', query)
+        result = self._cache.get(cache_key)
 
-            if item_type == query:
-                result.append(item_version)
+        if result is None:
+            result = self._sorted_versions(query)
+            self._cache.put(cache_key, result)
 
-        # sorting of versions done using distutils.version
-        return sorted(result, key=LooseVersion)
+        return list(result)
 
     def get_all_types(self):
         """ get all the types and their respective versions
         "return: returns a dict { "hou": { "versions": ["17.5.173", "17.5.229"], "is_plugin": false } }
         """
 
-        result = {}
+        self._check_indexes()
 
-        for item in self.graph.nodes():
-            item_type, item_version = item[0].split(':')
+        result = {}
 
+        for item_type, nodeids in self._nodes_by_type.items():
             # get the node data
-            node_data = item[1]
-
-            if item_type not in result:
-                result[item_type] = dict()
-                result[item_type]['is_plugin'] = node_data['is_plugin']
-                result[item_type]['versions'] = list()
-            
-            result[item_type]['versions'].append(item_version)
+            node_data = self.graph.node(nodeids[0])[1]
 
-        # sorting of versions done using distutils.version
-        for item_type, version_items in result.items():
-            result[item_type]['versions'] = sorted(version_items['versions'], key=LooseVersion)
+            result[item_type] = dict()
+            result[item_type]['is_plugin'] = node_data['is_plugin']
+            result[item_type]['versions'] = self._sorted_versions(item_type)
 
         return result
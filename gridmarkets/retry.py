@@ -0,0 +1,199 @@
+from __future__ import absolute_import
+from builtins import object
+from email.utils import mktime_tz, parsedate_tz
+import random
+import threading
+import time
+from . import errors
+
+_now = getattr(time, 'monotonic', time.time)
+
+# methods which can be sent again without changing the outcome, other requests are retried only if they
+# were not sent at all or the caller marks them as idempotent
+IDEMPOTENT_METHODS = ('get', 'head', 'options', 'put', 'delete')
+
+# statuses of responses worth retrying, Envoy answers 503 while it starts
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# statuses counted as failures by the circuit breaker, like connection errors
+FAILURE_STATUSES = (502, 503, 504)
+
+
+def parse_retry_after(value):
+    """ returns the seconds to wait of a Retry-After header value, in seconds or as an HTTP date, None if invalid """
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+
+    return max(0.0, mktime_tz(date) - time.time())
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before sending a failed request again.
+
+    Waits grow exponentially from backoff up to max_backoff, with full jitter so clients retrying at
+    the same time spread their attempts instead of hitting a restarting Envoy together. A Retry-After
+    header longer than the computed wait is honoured, one longer than max_backoff ends the retries.
+    """
+
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=30, jitter=True, retry_statuses=RETRY_STATUSES):
+        """Constructor
+
+        :param max_attempts: attempts of a request including the first one
+        :param backoff: seconds to wait before the first retry, doubled for every later one
+        :param max_backoff: maximum seconds to wait before a retry
+        :param jitter: wait a random time between 0 and the backoff instead of the full backoff
+        :param retry_statuses: response statuses retried for idempotent requests
+        """
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+
+    def backoff_delay(self, attempt):
+        """ returns the seconds to wait after the failed attempt number attempt, starting at 1 """
+
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def error_delay(self, attempt, idempotent, sent):
+        """ returns the seconds to wait before retrying a request failing with a connection error, None to give up
+
+        :param sent: False if the connection failed before the request was sent, so it is safe to retry any request
+        """
+
+        if attempt >= self.max_attempts or (sent and not idempotent):
+            return None
+
+        return self.backoff_delay(attempt)
+
+    def response_delay(self, attempt, idempotent, status, retry_after=None):
+        """ returns the seconds to wait before retrying a request answered with status, None to keep the response """
+
+        if attempt >= self.max_attempts or not idempotent or status not in self.retry_statuses:
+            return None
+
+        delay = self.backoff_delay(attempt)
+        wait = parse_retry_after(retry_after)
+
+        if wait is not None:
+            if wait > self.max_backoff:
+                return None
+            delay = max(delay, wait)
+
+        return delay
+
+
+class CircuitBreaker(object):
+    """
+    Thread safe circuit breaker failing requests fast while Envoy is down.
+
+    After failure_threshold consecutive failures the circuit opens and requests raise CircuitOpenError
+    without being sent. Once reset_timeout seconds passed a single trial request is let through, its
+    success closes the circuit and its failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=None):
+        """Constructor
+
+        :param failure_threshold: consecutive failures opening the circuit
+        :param reset_timeout: seconds the circuit stays open before a trial request
+        :param clock: optional callable returning the current time in seconds
+        """
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock or _now
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """ returns if a request can be sent
+
+        :raises errors.CircuitOpenError: if the circuit is open or its trial request is in flight
+        """
+
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+
+            remaining = self.reset_timeout - (self._clock() - self._opened_at)
+
+            if self._state == self.OPEN and remaining <= 0:
+                self._state = self.HALF_OPEN
+                self._trial = False
+
+            if self._state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+
+        if remaining > 0:
+            raise errors.CircuitOpenError(
+                "Envoy is unavailable, requests fail fast for {0:.1f} more seconds".format(remaining))
+        raise errors.CircuitOpenError("Envoy is unavailable, a trial request is in flight")
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial = False
+
+
+class RetryMetrics(object):
+    """Thread safe counters of the attempts made by an HTTP client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # requests sent, including retries
+        self.attempts = 0
+        # attempts made because an earlier one failed
+        self.retries = 0
+        # requests failing fast because the circuit was open
+        self.rejected = 0
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        """ returns the counters as a dict """
+        with self._lock:
+            return {'attempts': self.attempts, 'retries': self.retries, 'rejected': self.rejected}
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.snapshot())
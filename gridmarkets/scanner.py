@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+from builtins import object
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import os
+import re
+
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
+# default number of folders listed concurrently, listing is mostly waiting on the file system
+SCAN_WORKERS = 8
+
+FileStat = namedtuple('FileStat', ['size', 'mtime'])
+
+
+class PathMatcher(object):
+    """
+    Glob patterns compiled into one matcher. Patterns without a '/' match the file or folder name
+    at any depth, ex. '*.tmp' or '.git', patterns with a '/' match the whole '/' separated path,
+    ex. 'cache/sim/*'.
+    """
+
+    def __init__(self, patterns):
+        if isinstance(patterns, (str, type(u''))):
+            patterns = [patterns]
+
+        name_patterns = [fnmatch.translate(p) for p in patterns if '/' not in p]
+        path_patterns = [fnmatch.translate(p.strip('/')) for p in patterns if '/' in p]
+
+        self._name_re = re.compile('|'.join(name_patterns)) if name_patterns else None
+        self._path_re = re.compile('|'.join(path_patterns)) if path_patterns else None
+
+    def match(self, path, name):
+        """ returns True if the relative path or its last part, name, matches one of the patterns """
+
+        return bool((self._name_re is not None and self._name_re.match(name)) or
+                    (self._path_re is not None and self._path_re.match(path)))
+
+
+def _stat(entry):
+    try:
+        st = entry.stat()
+    except OSError:
+        # ex. a broken symbolic link, os.walk lists it as a file too
+        return FileStat(None, None)
+    return FileStat(st.st_size, st.st_mtime)
+
+
+def _scan_dir(executor, path, keep, stat):
+    """ lists one folder and submits its sub folders, returns (files, sub folder futures) in os.walk order """
+
+    files = list()
+    dirs = list()
+
+    try:
+        for entry in scandir(path):
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if not is_dir:
+                if keep(entry.path, entry.name, False):
+                    # stat is a system call per file on most platforms, os.walk doesn't make it
+                    files.append((entry.path, _stat(entry) if stat else None))
+            elif not entry.is_symlink() and keep(entry.path, entry.name, True):
+                # like os.walk, symbolic links to folders are not followed, excluded folders are not listed at all
+                dirs.append(entry.path)
+    except OSError:
+        # like os.walk, folders which can't be listed are skipped
+        pass
+
+    return files, [executor.submit(_scan_dir, executor, d, keep, stat) for d in dirs]
+
+
+def scan_folder(path, root, max_workers=SCAN_WORKERS, include=None, exclude=None, stat=False):
+    """ lists the files under a folder, walking its sub folders concurrently
+
+    Returns the same files in the same order as os.walk, as (relative path, FileStat) pairs with
+    the path relative to root and '/' separated. The FileStat is None unless stat is set.
+
+    :param path: folder to scan
+    :param root: folder the returned paths are relative to
+    :param max_workers: number of folders listed concurrently
+    :param include: glob patterns, or a PathMatcher, files must match to be listed
+    :param exclude: glob patterns, or a PathMatcher, of files and folders to skip, excluded folders are not walked
+    :param stat: stat every file for its FileStat, which costs a system call per file on POSIX
+    """
+
+    path = os.path.abspath(path)
+
+    # every file path starts with the scanned folder, so the relative path is a slice of it
+    strip = len(os.path.join(path, ''))
+    prefix = os.path.relpath(path, root)
+    prefix = '' if prefix == os.curdir else os.path.join(prefix, '')
+
+    if include is not None and not isinstance(include, PathMatcher):
+        include = PathMatcher(include)
+    if exclude is not None and not isinstance(exclude, PathMatcher):
+        exclude = PathMatcher(exclude)
+
+    def relative(entry_path):
+        return (prefix + entry_path[strip:]).replace("\\", "/")
+
+    def keep(entry_path, name, is_dir):
+        if include is None and exclude is None:
+            return True
+
+        rel_path = relative(entry_path)
+        if exclude is not None and exclude.match(rel_path, name):
+            return False
+        # folders can hold included files whatever their name
+        return is_dir or include is None or include.match(rel_path, name)
+
+    result = list()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # walk the folder tree depth first, in the order os.walk yields it
+        pending = [executor.submit(_scan_dir, executor, path, keep, stat)]
+
+        while pending:
+            files, sub_dirs = pending.pop().result()
+            result.extend((relative(file_path), stat) for file_path, stat in files)
+            pending.extend(reversed(sub_dirs))
+
+    return result
@@ -0,0 +1,194 @@
+from __future__ import absolute_import
+from builtins import object
+import heapq
+import itertools
+import time
+from . import errors
+
+# prefer a monotonic clock so poll schedules are not affected by wall clock changes
+_now = getattr(time, 'monotonic', time.time)
+
+# states polled at the fast interval, any other non terminal state backs off
+ACTIVE_STATES = ('Uploading', 'Rendering', 'Running', 'Processing', 'Downloading')
+
+# states after which a project is no longer polled, Submitted is the end state of a successful submission
+TERMINAL_STATES = ('Submitted', 'Completed', 'Failed', 'Cancelled', 'Error')
+
+
+class StatusTransition(object):
+    """Change of state of a watched project"""
+
+    def __init__(self, name, previous_state, state, status, is_terminal=False):
+        self.name = name
+        self.previous_state = previous_state
+        self.state = state
+        self.status = status
+        self.is_terminal = is_terminal
+
+    def __repr__(self):
+        return "%s(name=%r, previous_state=%r, state=%r)" % (
+            self.__class__.__name__,
+            self.name,
+            self.previous_state,
+            self.state)
+
+
+class _WatchedProject(object):
+    __slots__ = ('name', 'state', 'interval', 'generation')
+
+    def __init__(self, name):
+        self.name = name
+        self.state = None
+        self.interval = 0.0
+        self.generation = 0
+
+
+class StatusWatcher(object):
+    """Polls the status of many projects from a single loop with adaptive intervals per project"""
+
+    def __init__(self, client, active_interval=2.0, idle_interval=5.0, max_interval=60.0, backoff=2.0,
+                 active_states=ACTIVE_STATES, terminal_states=TERMINAL_STATES, clock=None, sleep=None):
+        """Constructor
+
+        :param client: EnvoyClient used to fetch the project status
+        :param active_interval: seconds between polls while a project is in one of the active states
+        :param idle_interval: initial seconds between polls while a project is in any other state
+        :param max_interval: upper bound of the idle interval which grows by the backoff factor on every unchanged poll
+        :param backoff: factor applied to the idle interval while the state does not change
+        :param active_states: states polled at the active interval
+        :param terminal_states: states after which the project is no longer watched
+        """
+
+        self.client = client
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.active_states = frozenset(active_states)
+        self.terminal_states = frozenset(terminal_states)
+        self.last_errors = dict()
+
+        self._clock = clock or _now
+        self._sleep = sleep or time.sleep
+        self._projects = dict()
+        self._schedule = list()
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._projects)
+
+    def __contains__(self, name):
+        return name in self._projects
+
+    def add(self, *names):
+        """ starts watching the given project names, the first poll is due immediately """
+
+        now = self._clock()
+
+        for name in names:
+            if name not in self._projects:
+                self._projects[name] = project = _WatchedProject(name)
+                self._push(project, now)
+
+    def remove(self, *names):
+        """ stops watching the given project names """
+
+        for name in names:
+            self._projects.pop(name, None)
+
+    def _push(self, project, due):
+        project.generation += 1
+        heapq.heappush(self._schedule, (due, next(self._counter), project.generation, project))
+
+    def _next_interval(self, project, changed):
+        if project.state in self.active_states:
+            return self.active_interval
+
+        if changed or not project.interval:
+            return self.idle_interval
+
+        return min(project.interval * self.backoff, self.max_interval)
+
+    def poll_once(self):
+        """ polls every project that is due and returns the resulting transitions without sleeping """
+
+        transitions = list()
+        now = self._clock()
+
+        while self._schedule and self._schedule[0][0] <= now:
+            _, _, generation, project = heapq.heappop(self._schedule)
+
+            # skip entries of removed or rescheduled projects
+            if self._projects.get(project.name) is not project or project.generation != generation:
+                continue
+
+            transition = self._poll(project)
+
+            if transition is not None:
+                transitions.append(transition)
+
+        return transitions
+
+    def _poll(self, project):
+        try:
+            status = self.client.get_project_status(project.name)
+        except errors.AuthenticationError:
+            raise
+        except errors.GridMarketsError as e:
+            # transient failures back off like an unchanged idle state
+            self.last_errors[project.name] = e
+            project.interval = min(max(project.interval * self.backoff, self.idle_interval), self.max_interval)
+            self._push(project, self._clock() + project.interval)
+            return None
+
+        self.last_errors.pop(project.name, None)
+
+        state = status.get('State') if status else None
+        changed = state != project.state
+        previous_state = project.state
+        project.state = state
+
+        is_terminal = state in self.terminal_states
+
+        if is_terminal:
+            del self._projects[project.name]
+        else:
+            project.interval = self._next_interval(project, changed)
+            self._push(project, self._clock() + project.interval)
+
+        if changed:
+            return StatusTransition(project.name, previous_state, state, status, is_terminal)
+
+    def watch(self, timeout=None):
+        """ generator of status transitions, ends once all projects reached a terminal state or on timeout
+
+        :param timeout: optional seconds after which the generator stops
+        """
+
+        deadline = self._clock() + timeout if timeout is not None else None
+
+        while self._projects:
+            for transition in self.poll_once():
+                yield transition
+
+            if not self._projects or not self._schedule:
+                return
+
+            now = self._clock()
+
+            if deadline is not None and now >= deadline:
+                return
+
+            due = self._schedule[0][0]
+
+            if deadline is not None:
+                due = min(due, deadline)
+
+            if due > now:
+                self._sleep(due - now)
+
+    def run(self, callback, timeout=None):
+        """ calls callback with every status transition until watching ends """
+
+        for transition in self.watch(timeout):
+            callback(transition)
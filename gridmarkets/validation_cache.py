@@ -0,0 +1,66 @@
+from __future__ import absolute_import
+from builtins import object
+import threading
+import time
+
+# prefer a monotonic clock so TTLs are not affected by wall clock changes
+_now = getattr(time, 'monotonic', time.time)
+
+
+class ValidationCache(object):
+    """Thread safe cache of successful validation checks with a TTL per check"""
+
+    def __init__(self, ttls=None, clock=None):
+        """Constructor
+
+        :param ttls: dict of check name to time to live in seconds, a TTL of 0 or None disables caching of that check
+        :param clock: optional callable returning the current time in seconds
+        """
+
+        self._ttls = dict(ttls) if ttls else dict()
+        self._clock = clock or _now
+        self._expiry = dict()
+        self._lock = threading.Lock()
+
+    def is_enabled(self, check):
+        return bool(self._ttls.get(check))
+
+    def is_valid(self, check):
+        """ returns True if the check passed within its TTL """
+
+        if not self.is_enabled(check):
+            return False
+
+        with self._lock:
+            expiry = self._expiry.get(check)
+
+            if expiry is None:
+                return False
+
+            if self._clock() >= expiry:
+                del self._expiry[check]
+                return False
+
+            return True
+
+    def mark_valid(self, check):
+        """ records a successful check, ignored if caching is disabled for the check """
+
+        ttl = self._ttls.get(check)
+
+        if not ttl:
+            return
+
+        with self._lock:
+            self._expiry[check] = self._clock() + ttl
+
+    def invalidate(self, *checks):
+        """ drops the cached result of the given checks, or all of them if none are passed """
+
+        with self._lock:
+            if not checks:
+                self._expiry.clear()
+                return
+
+            for check in checks:
+                self._expiry.pop(check, None)
@@ -0,0 +1,29 @@
+from __future__ import absolute_import
+import re
+
+# same component split as distutils.version.LooseVersion
+_component_re = re.compile(r'(\d+ | [a-z]+ | \.)', re.VERBOSE)
+
+
+def version_key(version):
+    """ returns a sort key ordering version strings like distutils LooseVersion
+
+    Numeric parts compare as integers and sort before alphabetic parts, so mixed formats such as
+    Nuke's 10.5v1 and Houdini's 17.5.229 can be sorted together without a TypeError.
+
+    :param version: version string, ex. "17.5.229" or "10.5v1"
+    :return: tuple of (0, number) and (1, text) components
+    """
+
+    key = []
+
+    for component in _component_re.split(version):
+        if not component or component == '.':
+            continue
+
+        try:
+            key.append((0, int(component)))
+        except ValueError:
+            key.append((1, component))
+
+    return tuple(key)
@@ -18,5 +18,6 @@ setuptools.setup(
     author_email="support@gridmarkets.com",
     description="Python client for GridMarkets API",
     packages=["gridmarkets"],
-    install_requires=["future", "requests"]
+    install_requires=["future", "requests", "futures; python_version < '3'", "scandir; python_version < '3.5'"],
+    extras_require={"async": ["aiohttp>=3.3"]}
 )
@@ -0,0 +1,124 @@
+from __future__ import absolute_import
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from gridmarkets import EnvoyClient
+from gridmarkets.catalog_cache import CatalogCache, content_hash
+from gridmarkets.http_client import HttpClient
+from .test_http_client import FakeSession, make_response
+
+PRODUCTS = [{'app_type': 'houdini', 'version': '18.0.0', 'compatible_modules': ['mantra:18.0.0']}]
+CHANGED_PRODUCTS = PRODUCTS + [{'app_type': 'maya', 'version': '2020', 'compatible_modules': []}]
+
+
+def catalog_response(products, etag=None, status=200):
+    headers = {'ETag': etag} if etag else None
+    return make_response(status, json.dumps(products).encode('utf-8'), headers)
+
+
+class CatalogCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def client(self, *outcomes, **kwargs):
+        self.cache = CatalogCache(cache_dir=kwargs.get('cache_dir', self.folder), max_age=kwargs.get('max_age', 60))
+        self.session = FakeSession(*outcomes)
+
+        client = EnvoyClient(email='EMAIL_ADDRESS', access_key='ACCESS_KEY', url='http://envoy.test',
+                             catalog_cache=self.cache)
+        client.validation_cache.mark_valid('auth')
+        client.http_client = HttpClient(session=self.session)
+        return client
+
+    def url(self, client):
+        return client._products_request()
+
+    def cache_stale_entry(self, client, products, etag='"v1"'):
+        entry = self.cache.save(self.url(client), products, content_hash(json.dumps(products).encode('utf-8')), etag)
+        entry['fetched_at'] = time.time() - 3600
+        with open(self.cache.path(self.url(client)), 'w') as f:
+            json.dump(entry, f)
+
+    def refresh(self, client):
+        """ returns the resolver of a call revalidating the stale catalog and the entry cached afterwards """
+
+        resolver = client.get_product_resolver()
+        client._catalog_refresh.join()
+        self.assertIsNone(client.catalog_refresh_error)
+        return resolver, self.cache.load(self.url(client))
+
+    def test_catalog_is_cached(self):
+        client = self.client(catalog_response(PRODUCTS, '"v1"'))
+
+        self.assertEqual(client.get_product_resolver().products, PRODUCTS)
+        self.assertEqual(client.get_product_resolver().products, PRODUCTS)
+        self.assertEqual(len(self.session.requests), 1)
+
+        entry = self.cache.load(self.url(client))
+        self.assertEqual((entry['products'], entry['etag']), (PRODUCTS, '"v1"'))
+
+    def test_not_modified_catalog_is_revalidated(self):
+        client = self.client(make_response(304))
+        self.cache_stale_entry(client, PRODUCTS)
+
+        resolver, entry = self.refresh(client)
+
+        self.assertEqual(resolver.products, PRODUCTS)
+        self.assertEqual(self.session.requests[0][2]['If-None-Match'], '"v1"')
+        self.assertEqual((entry['products'], entry['etag']), (PRODUCTS, '"v1"'))
+        self.assertFalse(self.cache.is_stale(entry))
+
+    def test_unchanged_catalog_is_not_rewritten(self):
+        # a server ignoring conditional requests answers the same catalog
+        client = self.client(catalog_response(PRODUCTS, '"v2"'))
+        self.cache_stale_entry(client, PRODUCTS)
+
+        _, entry = self.refresh(client)
+
+        self.assertEqual(entry['products'], PRODUCTS)
+        self.assertEqual(entry['etag'], '"v1"')
+        self.assertFalse(self.cache.is_stale(entry))
+
+    def test_changed_catalog_is_used_by_later_calls(self):
+        client = self.client(catalog_response(CHANGED_PRODUCTS, '"v2"'))
+        self.cache_stale_entry(client, PRODUCTS)
+
+        resolver, entry = self.refresh(client)
+
+        self.assertEqual(resolver.products, PRODUCTS)
+        self.assertEqual((entry['products'], entry['etag']), (CHANGED_PRODUCTS, '"v2"'))
+        self.assertEqual(client.get_product_resolver().products, CHANGED_PRODUCTS)
+
+    def test_corrupt_cache_is_fetched_again(self):
+        client = self.client(catalog_response(PRODUCTS))
+        with open(self.cache.path(self.url(client)), 'wb') as f:
+            f.write(b'{"url": ')
+
+        self.assertIsNone(self.cache.load(self.url(client)))
+        self.assertEqual(client.get_product_resolver().products, PRODUCTS)
+        self.assertEqual(len(self.session.requests), 1)
+        self.assertEqual(self.cache.load(self.url(client))['products'], PRODUCTS)
+
+    def test_unwritable_cache_is_ignored(self):
+        # the cache folder can't be created under a file
+        path = os.path.join(self.folder, 'file')
+        with open(path, 'wb'):
+            pass
+
+        client = self.client(catalog_response(PRODUCTS), catalog_response(PRODUCTS),
+                             cache_dir=os.path.join(path, 'catalog'))
+
+        self.assertEqual(client.get_product_resolver().products, PRODUCTS)
+        self.assertEqual(client.get_product_resolver().products, PRODUCTS)
+        self.assertEqual(len(self.session.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
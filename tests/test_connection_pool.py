@@ -0,0 +1,179 @@
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from gridmarkets.connection_pool import ConnectionMetrics, PoolConfig
+from gridmarkets.http_client import HttpClient
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """Answers every request after the server's latency, recording its connection and the requests in flight"""
+
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.clients.add(self.client_address)
+            server.connection_headers.append(self.headers.get('Connection'))
+
+        time.sleep(server.latency)
+
+        with server.lock:
+            server.in_flight -= 1
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        if self.headers.get('Connection') == 'close':
+            # like HTTP/1.1 servers, tell the client the connection is closed after the response
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RecordingHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.latency = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.clients = set()
+        self.server.connection_headers = list()
+
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.url = 'http://127.0.0.1:{0}/project-status/project'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def run_threads(self, client, threads, requests):
+        """ sends requests from every thread, returns the session and adapter each thread used """
+
+        used = list()
+        failures = list()
+
+        def work():
+            try:
+                for _ in range(requests):
+                    self.assertEqual(client.request('get', self.url).status_code, 200)
+                session = client._thread_local.session
+                used.append((session, session.get_adapter(self.url)))
+            except Exception as e:
+                failures.append(e)
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(failures, [])
+        return used
+
+    def test_threads_share_one_adapter(self):
+        client = HttpClient(pool=PoolConfig(max_per_host=4))
+
+        used = self.run_threads(client, 4, 5)
+
+        self.assertEqual(len(set(id(session) for session, _ in used)), 4)
+        self.assertTrue(all(adapter is client._adapter for _, adapter in used))
+
+        metrics = client.metrics.snapshot()
+        self.assertEqual(metrics['created'] + metrics['reused'], 20)
+        # every thread sends its requests one after the other, so it needs a single connection
+        self.assertEqual(metrics['created'], len(self.server.clients))
+        self.assertTrue(metrics['created'] <= 4)
+
+    def test_threads_have_their_own_pool_by_default(self):
+        client = HttpClient()
+
+        used = self.run_threads(client, 2, 1)
+
+        self.assertIsNone(client.metrics)
+        self.assertIsNot(used[0][1], used[1][1])
+
+    def test_max_connections_bounds_requests_in_flight(self):
+        self.server.latency = 0.05
+
+        self.run_threads(HttpClient(pool=PoolConfig(max_connections=2)), 8, 2)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+        self.server.max_in_flight = 0
+        self.run_threads(HttpClient(pool=PoolConfig()), 8, 2)
+        self.assertTrue(self.server.max_in_flight > 2)
+
+    def test_keep_alive(self):
+        client = HttpClient(pool=PoolConfig())
+
+        self.run_threads(client, 1, 3)
+
+        self.assertEqual(client.metrics.snapshot(), {'created': 1, 'reused': 2, 'expired': 0})
+        self.assertEqual(len(self.server.clients), 1)
+        self.assertNotIn('close', self.server.connection_headers)
+
+    def test_no_keep_alive_closes_connections(self):
+        client = HttpClient(pool=PoolConfig(keep_alive=False))
+
+        self.run_threads(client, 1, 3)
+
+        self.assertEqual(self.server.connection_headers, ['close'] * 3)
+        self.assertEqual(client.metrics.snapshot(), {'created': 3, 'reused': 0, 'expired': 0})
+        self.assertEqual(len(self.server.clients), 3)
+
+    def test_idle_connections_expire(self):
+        client = HttpClient(pool=PoolConfig(idle_timeout=0))
+
+        self.run_threads(client, 1, 3)
+
+        # expired connections are closed and replaced
+        self.assertEqual(client.metrics.snapshot(), {'created': 3, 'reused': 0, 'expired': 2})
+        self.assertEqual(len(self.server.clients), 3)
+
+
+class ConnectionMetricsTest(unittest.TestCase):
+
+    def test_count(self):
+        metrics = ConnectionMetrics()
+
+        def count():
+            for _ in range(1000):
+                metrics.count('reused')
+
+        workers = [threading.Thread(target=count) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        metrics.count('created')
+
+        self.assertEqual(metrics.snapshot(), {'created': 1, 'reused': 4000, 'expired': 0})
+        self.assertEqual(repr(metrics), "ConnectionMetrics({0!r})".format(metrics.snapshot()))
+
+
+if __name__ == '__main__':
+    unittest.main()
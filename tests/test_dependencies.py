@@ -0,0 +1,254 @@
+from __future__ import absolute_import
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from gridmarkets import Job, Project
+from gridmarkets.dependencies import (DependencyCache, DependencyScanner, expand_sequence, parse_arnold,
+                                      parse_maya_ascii, parse_nuke, parse_usd)
+
+NUKE_SCENE = '''Root {
+ inputs 0
+ name /shots/comp.nk
+}
+Read {
+ inputs 0
+ file plates/plate.####.exr
+ proxy "plates/proxy plate.%04d.jpg"
+ name Read1
+}
+ReadGeo2 {
+ file "geo/\\"quoted\\".abc"
+}
+Camera2 {
+ vfield_file cams/cam.chan
+ label "file not/a/reference.exr"
+}
+'''
+
+ARNOLD_SCENE = '''options
+{
+ AA_samples 3
+}
+image
+{
+ name wood
+ filename "textures/wood.<UDIM>.tx"
+}
+procedural
+{
+ name tree
+ dso "geo/tree.ass"
+}
+'''
+
+USD_SCENE = '''#usda 1.0
+(
+    subLayers = [@./layers/anim.usda@]
+)
+
+def Xform "chair" (
+    references = @props/chair.usda@</Chair>
+)
+{
+    asset inputs:file = @@@textures/odd@name.png@@@
+    string note = "user@example.com"
+}
+'''
+
+MAYA_SCENE = '''//Maya ASCII 2020 scene
+file -rdi 1 -ns "chair" -rfn "chairRN" -typ "mayaAscii" "assets/chair.ma";
+file -r -ns "tree" -dr 1 -rfn "treeRN" -typ "mayaAscii" "assets/tree.ma";
+requires maya "2020";
+createNode file -n "file1";
+    setAttr ".ftn" -type "string" "sourceimages/wood.<UDIM>.tif";
+createNode cacheFile -n "cacheFile1";
+    setAttr ".cfn" -type "string" "cache/sim.mcx";
+createNode transform -n "pCube1";
+    setAttr ".t" -type "double3" 0 1 0 ;
+'''
+
+
+class ParserTest(unittest.TestCase):
+
+    def test_nuke(self):
+        self.assertEqual(parse_nuke(NUKE_SCENE),
+                         ['plates/plate.####.exr', 'plates/proxy plate.%04d.jpg', 'geo/"quoted".abc', 'cams/cam.chan'])
+
+    def test_arnold(self):
+        self.assertEqual(parse_arnold(ARNOLD_SCENE), ['textures/wood.<UDIM>.tx', 'geo/tree.ass'])
+
+    def test_usd(self):
+        self.assertEqual(parse_usd(USD_SCENE), ['./layers/anim.usda', 'props/chair.usda', 'textures/odd@name.png'])
+
+    def test_maya_ascii(self):
+        self.assertEqual(parse_maya_ascii(MAYA_SCENE),
+                         ['assets/chair.ma', 'assets/tree.ma', 'sourceimages/wood.<UDIM>.tif', 'cache/sim.mcx'])
+
+
+class FolderMixin(object):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def path(self, name):
+        return os.path.join(self.folder, *name.split('/'))
+
+    def write(self, name, content=''):
+        path = self.path(name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def relative(self, paths):
+        return [os.path.relpath(path, self.folder).replace(os.sep, '/') for path in paths]
+
+
+class ExpandSequenceTest(FolderMixin, unittest.TestCase):
+
+    def test_frame_sequences(self):
+        for name in ('plate.0999.exr', 'plate.1001.exr', 'plate.-001.exr', 'plate.1001.exr.bak', 'plate.abcd.exr',
+                     'plate.exr', 'other.1001.exr'):
+            self.write('plates/' + name)
+        os.makedirs(self.path('plates/plate.1002.exr'))
+
+        expected = ['plates/plate.-001.exr', 'plates/plate.0999.exr', 'plates/plate.1001.exr']
+
+        for token in ('####', '#', '%04d', '%d', '$F4'):
+            self.assertEqual(self.relative(expand_sequence(self.path('plates/plate.{0}.exr'.format(token)))),
+                             expected)
+
+    def test_tile_sequences(self):
+        for name in ('wood.1001.tif', 'wood.1012.tif', 'wood.101.tif', 'wood.u1_v2.tif', 'wood.u10_v1.tif'):
+            self.write('tex/' + name)
+
+        self.assertEqual(self.relative(expand_sequence(self.path('tex/wood.<UDIM>.tif'))),
+                         ['tex/wood.1001.tif', 'tex/wood.1012.tif'])
+        self.assertEqual(self.relative(expand_sequence(self.path('tex/wood.<udim>.tif'))),
+                         ['tex/wood.1001.tif', 'tex/wood.1012.tif'])
+        self.assertEqual(self.relative(expand_sequence(self.path('tex/wood.<UVTILE>.tif'))),
+                         ['tex/wood.u10_v1.tif', 'tex/wood.u1_v2.tif'])
+
+    def test_single_files(self):
+        path = self.write('scene.nk')
+
+        self.assertEqual(expand_sequence(path), [path])
+        self.assertEqual(expand_sequence(self.path('missing.nk')), [])
+        self.assertEqual(expand_sequence(self.path('missing/plate.####.exr')), [])
+
+
+class CountingParser(object):
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.parsed = 0
+
+    def __call__(self, content):
+        self.parsed += 1
+        return self.parser(content)
+
+
+class DependencyCacheTest(FolderMixin, unittest.TestCase):
+
+    def scan(self, scene):
+        self.parser = CountingParser(parse_nuke)
+        cache = DependencyCache(self.path('cache'))
+        scanner = DependencyScanner(self.folder, cache=cache, parsers={'.nk': self.parser})
+        return self.relative(scanner.scan([scene]))
+
+    def test_unchanged_scenes_are_not_parsed_again(self):
+        scene = self.write('comp.nk', 'Read {\n file a.exr\n}\n')
+        self.write('a.exr')
+        self.write('b.exr')
+
+        self.assertEqual(self.scan(scene), ['comp.nk', 'a.exr'])
+        self.assertEqual(self.parser.parsed, 1)
+
+        self.assertEqual(self.scan(scene), ['comp.nk', 'a.exr'])
+        self.assertEqual(self.parser.parsed, 0)
+
+        # a different size or mtime invalidates the entry
+        self.write('comp.nk', 'Read {\n file b.exr\n}\n')
+        self.assertEqual(self.scan(scene), ['comp.nk', 'b.exr'])
+        self.assertEqual(self.parser.parsed, 1)
+
+        st = os.stat(scene)
+        os.utime(scene, (st.st_atime, st.st_mtime + 10))
+        self.scan(scene)
+        self.assertEqual(self.parser.parsed, 1)
+
+    def test_outdated_and_corrupt_caches_are_ignored(self):
+        scene = self.write('comp.nk', 'Read {\n file a.exr\n}\n')
+        self.write('a.exr')
+        self.scan(scene)
+
+        cache_path = DependencyCache(self.path('cache')).path
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+        # entries of older parsers are dropped
+        cache['version'] -= 1
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f)
+
+        self.assertEqual(self.scan(scene), ['comp.nk', 'a.exr'])
+        self.assertEqual(self.parser.parsed, 1)
+
+        with open(cache_path, 'w') as f:
+            f.write('{"version": ')
+
+        self.assertEqual(self.scan(scene), ['comp.nk', 'a.exr'])
+        self.assertEqual(self.parser.parsed, 1)
+        self.assertEqual(DependencyCache(self.path('cache')).get(scene, os.stat(scene)), ['a.exr'])
+
+
+class AddJobScenesTest(FolderMixin, unittest.TestCase):
+
+    def setUp(self):
+        super(AddJobScenesTest, self).setUp()
+        self.outside = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outside)
+        super(AddJobScenesTest, self).tearDown()
+
+    def test_referenced_files_are_added(self):
+        outside_texture = os.path.join(self.outside, 'studio.tx')
+        with open(outside_texture, 'w'):
+            pass
+
+        self.write('scenes/comp.nk', NUKE_SCENE.replace('cams/cam.chan', self.path('cams/cam.chan')))
+        for name in ('plates/plate.1001.exr', 'plates/plate.1002.exr', 'plates/proxy plate.1001.jpg',
+                     'cams/cam.chan', 'scenes/unused.exr'):
+            self.write(name)
+
+        # a USD layer referenced next to its scene, referencing a file outside the project
+        self.write('scenes/shot.usda', '#usda 1.0\n(\n    subLayers = [@layout.usda@, @{0}@]\n)\n'.format(
+            outside_texture.replace(os.sep, '/')))
+        self.write('scenes/layout.usda', '#usda 1.0\ndef "set" (references = @../sets/set.usda@) {}\n')
+        self.write('sets/set.usda', '#usda 1.0\nasset file = @../textures/wood.<UDIM>.tx@\n')
+        self.write('textures/wood.1001.tx')
+        self.write('textures/wood.1002.tx')
+
+        project = Project(self.folder, 'project')
+        project.add_jobs(Job('comp', 'nuke', '12.0', 'render', '/project/scenes/comp.nk'),
+                         Job('shot', 'usd', '21.0', 'render', 'scenes/shot.usda'),
+                         Job('missing', 'nuke', '12.0', 'render', '/project/scenes/missing.nk'))
+
+        project.add_job_scenes(max_workers=2)
+
+        self.assertEqual(list(project.files), [
+            'scenes/comp.nk', 'scenes/shot.usda',
+            'plates/plate.1001.exr', 'plates/plate.1002.exr', 'plates/proxy plate.1001.jpg', 'cams/cam.chan',
+            'scenes/layout.usda', 'sets/set.usda', 'textures/wood.1001.tx', 'textures/wood.1002.tx',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
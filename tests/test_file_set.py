@@ -0,0 +1,117 @@
+from __future__ import absolute_import
+import copy
+import json
+import pickle
+import random
+import unittest
+from gridmarkets.file_set import FileSet
+from gridmarkets.scanner import FileStat
+
+
+class FileSetTest(unittest.TestCase):
+
+    def test_behaves_like_a_deduplicated_list(self):
+        rnd = random.Random(0)
+        paths = ['{0}file{1}.exr'.format(rnd.choice(['', 'a/', 'a/b/', 'c/']), i) for i in range(60)]
+
+        files = FileSet()
+        expected = list()
+
+        for _ in range(500):
+            path = rnd.choice(paths)
+            if rnd.random() < 0.7:
+                self.assertEqual(files.add(path), path not in expected)
+                if path not in expected:
+                    expected.append(path)
+            else:
+                files.discard(path)
+                if path in expected:
+                    expected.remove(path)
+
+            self.assertEqual(len(files), len(expected))
+            self.assertEqual(list(files), expected)
+            self.assertEqual([files[i] for i in range(-len(files), len(files))], expected + expected)
+            self.assertEqual(files[1:-1:2], expected[1:-1:2])
+            self.assertEqual(files, expected)
+            self.assertEqual(path in files, path in expected)
+
+        files.difference_update(paths[::2])
+        self.assertEqual(files, [path for path in expected if path not in paths[::2]])
+
+    def test_sequence_methods(self):
+        files = FileSet(['a/x', 'b/y', 'a/z', 'a/x'])
+
+        self.assertEqual(files, ['a/x', 'b/y', 'a/z'])
+        self.assertEqual(files, ('a/x', 'b/y', 'a/z'))
+        self.assertNotEqual(files, ['a/x', 'b/y'])
+        self.assertEqual(files.index('a/z'), 2)
+        self.assertEqual(files.count('b/y'), 1)
+        self.assertEqual(list(reversed(files)), ['a/z', 'b/y', 'a/x'])
+        self.assertRaises(IndexError, files.__getitem__, 3)
+        self.assertRaises(TypeError, hash, files)
+
+    def test_list_methods(self):
+        files = FileSet(['a/x', 'b/y'])
+
+        files += ['a/z', 'a/x']
+        files.insert(0, 'c/w')
+        files.insert(0, 'b/y')
+        files.append('a/x')
+        self.assertEqual(files, ['c/w', 'a/x', 'b/y', 'a/z'])
+
+        files.remove('b/y')
+        self.assertRaises(ValueError, files.remove, 'b/y')
+        self.assertEqual(files.pop(), 'a/z')
+        self.assertNotIn('a/z', files)
+
+        files.extend(['b/v', 'a/u'])
+        files.sort()
+        self.assertEqual(files, ['a/u', 'a/x', 'b/v', 'c/w'])
+        files.reverse()
+        self.assertEqual(files, ['c/w', 'b/v', 'a/x', 'a/u'])
+
+        # replacing paths keeps the first of duplicates
+        files[0] = 'a/x'
+        self.assertEqual(files, ['a/x', 'b/v', 'a/u'])
+        files[1:] = ['d/t', 'd/t', 'a/x']
+        self.assertEqual(files, ['a/x', 'd/t'])
+
+        del files[0]
+        self.assertNotIn('a/x', files)
+        files.add('a/x')
+        del files[:]
+        self.assertEqual((files, len(files), 'a/x' in files), ([], 0, False))
+
+    def test_serializes_like_a_list(self):
+        files = FileSet(['a/x', 'b/y', 'a/x'])
+        files.set_stat('a/x', FileStat(1, 2.0))
+
+        self.assertIsInstance(files, list)
+        self.assertEqual(json.dumps(files), json.dumps(['a/x', 'b/y']))
+        self.assertEqual(json.dumps({'files': files}, indent=2), json.dumps({'files': ['a/x', 'b/y']}, indent=2))
+
+        for other in (pickle.loads(pickle.dumps(files)), copy.copy(files), files.copy()):
+            self.assertIsInstance(other, FileSet)
+            self.assertEqual(other, files)
+            self.assertEqual(other.stat('a/x'), FileStat(1, 2.0))
+            self.assertFalse(other.add('b/y'))
+
+    def test_stats(self):
+        files = FileSet()
+        files.add('a/x', FileStat(1, 2.0))
+        files.add('a/y')
+
+        self.assertEqual(files.stat('a/x'), FileStat(1, 2.0))
+        self.assertIsNone(files.stat('a/y'))
+
+        # adding again keeps the path and replaces its stat
+        self.assertFalse(files.add('a/x', FileStat(3, 4.0)))
+        files.set_stat('a/y', FileStat(5, 6.0))
+        self.assertEqual([files.stat(f) for f in files], [FileStat(3, 4.0), FileStat(5, 6.0)])
+
+        self.assertRaises(KeyError, files.stat, 'b/x')
+        self.assertRaises(KeyError, files.set_stat, 'a/z', None)
+
+
+if __name__ == '__main__':
+    unittest.main()
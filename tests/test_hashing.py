@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from gridmarkets import Project, hashing
+from gridmarkets.hashing import can_use_processes, file_digest, hash_files
+
+
+class HashingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.folder, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_file_digest(self):
+        content = os.urandom(10000)
+
+        for chunk_size in (1, 4096, 1 << 20):
+            self.assertEqual(file_digest(self.write('a', content), chunk_size=chunk_size),
+                             hashlib.sha256(content).hexdigest())
+
+        self.assertEqual(file_digest(self.write('empty', b'')), hashlib.sha256(b'').hexdigest())
+        self.assertEqual(file_digest(self.write('b', b'x'), 'md5'), hashlib.md5(b'x').hexdigest())
+
+    def test_hash_files(self):
+        contents = [os.urandom(i * 100) for i in range(20)]
+        paths = [self.write('file{0}'.format(i), content) for i, content in enumerate(contents)]
+        paths.insert(5, os.path.join(self.folder, 'missing'))
+
+        expected = [hashlib.sha256(content).hexdigest() for content in contents]
+        expected.insert(5, None)
+
+        for workers in (1, 4):
+            self.assertEqual(hash_files(paths, workers), expected)
+            self.assertEqual(hash_files(paths, workers, processes=True), expected)
+        self.assertEqual(hash_files([]), [])
+
+    def test_no_processes_in_embedded_interpreters(self):
+        executable = sys.executable
+        process_pool = hashing.ProcessPoolExecutor
+
+        def fail(*args, **kwargs):
+            raise AssertionError('worker processes started')
+
+        try:
+            sys.executable = os.path.join('autodesk', 'maya', 'bin', 'maya.exe')
+            hashing.ProcessPoolExecutor = fail
+            self.assertFalse(can_use_processes())
+
+            path = self.write('a', b'a')
+            self.assertEqual(hash_files([path, path], 2, processes=True), [hashlib.sha256(b'a').hexdigest()] * 2)
+        finally:
+            sys.executable = executable
+            hashing.ProcessPoolExecutor = process_pool
+
+    def project(self):
+        project = Project(self.folder, 'project')
+        project.include_digests = True
+        project.hash_workers = 1
+        project.add_folders(self.folder)
+        return project
+
+    def test_edited_files_are_hashed_again(self):
+        self.write('scene.hip', b'v1', 1000000000)
+        project = self.project()
+
+        first = project.serialize['project_files']['digests']
+        self.assertEqual(first, {'scene.hip': hashlib.sha256(b'v1').hexdigest()})
+
+        self.write('scene.hip', b'v2', 1000000100)
+
+        for payload in (project.serialize['project_files'], project.upload_serialize['upload'][0]):
+            self.assertEqual(payload['digests'], {'scene.hip': hashlib.sha256(b'v2').hexdigest()})
+
+    def test_unreadable_files_have_no_digest(self):
+        self.write('scene.hip', b'v1')
+        project = self.project()
+        project.compute_digests()
+
+        os.remove(os.path.join(self.folder, 'scene.hip'))
+        self.assertEqual(project.compute_digests(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
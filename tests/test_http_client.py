@@ -0,0 +1,165 @@
+from __future__ import absolute_import
+import json
+import unittest
+import zlib
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from gridmarkets import EnvoyClient, errors
+from gridmarkets.compression import DEFLATE, GZIP, compress, compress_chunks
+from gridmarkets.http_client import HttpClient
+from gridmarkets.payload import JsonArray, JsonStream
+from gridmarkets.retry import CircuitBreaker, RetryPolicy
+
+URL = 'http://envoy.test/project-submit'
+
+
+def make_response(status, content=b'{}', headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = content
+    response.headers.update(headers or dict())
+    return response
+
+
+class FakeSession(object):
+    """Session answering requests with queued responses or exceptions, recording the requests"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = list()
+
+    def request(self, method, url, headers=None, data=None, timeout=None):
+        if data is not None and not isinstance(data, bytes):
+            data = b''.join(data)
+        self.requests.append((method, url, dict(headers or dict()), data))
+
+        outcome = self.outcomes.pop(0) if self.outcomes else make_response(200)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def decompress(data, encoding):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS if encoding == GZIP else zlib.MAX_WBITS)
+
+
+class CompressionTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = b'project files ' * 1000
+
+        for encoding in (GZIP, DEFLATE):
+            self.assertEqual(decompress(compress(data, encoding), encoding), data)
+            self.assertEqual(decompress(b''.join(compress_chunks([data[:7], b'', data[7:]], encoding)), encoding),
+                             data)
+
+        self.assertRaises(ValueError, compress, data, 'br')
+        self.assertRaises(ValueError, HttpClient, compression='br')
+
+    def test_small_bodies_are_not_compressed(self):
+        session = FakeSession()
+        client = HttpClient(session=session, compression=GZIP, compression_threshold=1024)
+
+        client.request('post', URL, post_data={'name': 'small'})
+
+        self.assertNotIn('Content-Encoding', session.requests[0][2])
+        self.assertEqual(json.loads(session.requests[0][3].decode('utf-8')), {'name': 'small'})
+
+    def test_large_and_streamed_bodies_are_compressed(self):
+        payload = {'files': ['file{0}.exr'.format(i) for i in range(1000)]}
+
+        for post_data in (payload, JsonStream({'files': JsonArray(payload['files'])})):
+            session = FakeSession()
+            client = HttpClient(session=session, compression=DEFLATE, compression_threshold=1024)
+
+            client.request('post', URL, post_data=post_data)
+
+            _, _, headers, data = session.requests[0]
+            self.assertEqual(headers['Content-Encoding'], DEFLATE)
+            self.assertEqual(json.loads(decompress(data, DEFLATE).decode('utf-8')), payload)
+
+    def test_rejected_compression_is_sent_plain(self):
+        payload = {'files': ['file{0}.exr'.format(i) for i in range(1000)]}
+
+        for post_data in (payload, JsonStream({'files': JsonArray(lambda: iter(payload['files']))})):
+            session = FakeSession(make_response(415))
+            client = HttpClient(session=session, compression=GZIP, compression_threshold=1024)
+
+            self.assertEqual(client.request('post', URL, post_data=post_data).status_code, 200)
+            self.assertTrue(client.compression_rejected)
+
+            # the body is sent again uncompressed, as are the later ones
+            client.request('post', URL, post_data=post_data)
+            self.assertEqual(len(session.requests), 3)
+            for _, _, headers, data in session.requests[1:]:
+                self.assertNotIn('Content-Encoding', headers)
+                self.assertEqual(json.loads(data.decode('utf-8')), payload)
+
+    def test_other_errors_are_not_sent_again(self):
+        session = FakeSession(make_response(400))
+        client = HttpClient(session=session, compression=GZIP, compression_threshold=0)
+
+        self.assertEqual(client.request('post', URL, post_data={'name': 'x'}).status_code, 400)
+        self.assertEqual(len(session.requests), 1)
+        self.assertFalse(client.compression_rejected)
+
+
+def refused():
+    # the connection failed, so the request never reached the server
+    return requests.exceptions.ConnectionError(MaxRetryError(None, URL, NewConnectionError(None, 'refused')))
+
+
+class RetryTest(unittest.TestCase):
+
+    def client(self, session, **kwargs):
+        return HttpClient(session=session, retry=RetryPolicy(max_attempts=3, backoff=0), **kwargs)
+
+    def test_retries_idempotent_requests(self):
+        session = FakeSession(make_response(503), make_response(503), make_response(503))
+        client = self.client(session)
+
+        self.assertEqual(client.request('get', URL).status_code, 503)
+        self.assertEqual(client.retry_metrics.snapshot(), {'attempts': 3, 'retries': 2, 'rejected': 0})
+
+        session.outcomes = [requests.exceptions.ReadTimeout(), make_response(200)]
+        self.assertEqual(client.request('post', URL, idempotent=True).status_code, 200)
+
+    def test_does_not_resend_other_requests(self):
+        session = FakeSession(make_response(503), requests.exceptions.ReadTimeout())
+        client = self.client(session)
+
+        self.assertEqual(client.request('post', URL).status_code, 503)
+        self.assertRaises(errors.APIError, client.request, 'post', URL)
+        self.assertEqual(len(session.requests), 2)
+
+    def test_resends_requests_which_were_not_sent(self):
+        session = FakeSession(refused(), make_response(201))
+        client = self.client(session)
+
+        self.assertEqual(client.request('post', URL).status_code, 201)
+        self.assertEqual(len(session.requests), 2)
+
+    def test_circuit_breaker(self):
+        session = FakeSession(*[refused()] * 3)
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        client = self.client(session, circuit_breaker=breaker)
+
+        self.assertRaises(errors.APIError, client.request, 'get', URL)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.assertRaises(errors.CircuitOpenError, client.request, 'get', URL)
+        self.assertEqual(len(session.requests), 3)
+        self.assertEqual(client.retry_metrics.rejected, 1)
+
+    def test_envoy_client_raises_circuit_open_error(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+
+        client = EnvoyClient(email='EMAIL_ADDRESS', access_key='ACCESS_KEY', url='http://envoy.test')
+        client.http_client = HttpClient(session=FakeSession(), circuit_breaker=breaker)
+
+        self.assertRaises(errors.CircuitOpenError, client.validate_auth)
+
+
+if __name__ == '__main__':
+    unittest.main()
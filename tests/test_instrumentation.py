@@ -0,0 +1,105 @@
+from __future__ import absolute_import
+import unittest
+import requests
+from gridmarkets import HistogramCollector, Instrumentation, errors
+from gridmarkets.http_client import HttpClient
+from gridmarkets.instrumentation import Histogram, RequestInfo, endpoint_name
+from .test_http_client import URL, FakeSession, make_response
+
+
+class Recorder(Instrumentation):
+
+    def __init__(self):
+        self.calls = list()
+
+    def before_request(self, info):
+        self.calls.append(('before', info.endpoint))
+
+    def after_request(self, info):
+        self.calls.append(('after', info.endpoint, info.status, info.attempts, info.error))
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def test_requests_are_reported(self):
+        recorder = Recorder()
+        client = HttpClient(session=FakeSession(make_response(201, b'{"ok": true}')), instrumentation=recorder)
+
+        client.request('post', URL, post_data={'name': 'x'})
+
+        self.assertEqual(recorder.calls, [('before', 'project-submit'), ('after', 'project-submit', 201, 1, None)])
+
+    def test_handled_requests_are_reported_by_handle_response(self):
+        recorder = Recorder()
+        client = HttpClient(session=FakeSession(), instrumentation=recorder)
+
+        response = client.request('get', URL, endpoint='submit', handled=True)
+        self.assertEqual(recorder.calls, [('before', 'submit')])
+
+        self.assertEqual(client.handle_response(response, lambda r: r.status_code, response), 200)
+        self.assertEqual(recorder.calls[1:], [('after', 'submit', 200, 1, None)])
+        self.assertTrue(response.request_info.decode_time >= 0)
+
+    def test_errors_are_reported(self):
+        recorder = Recorder()
+        client = HttpClient(session=FakeSession(requests.exceptions.ReadTimeout(), make_response(200)),
+                            instrumentation=recorder)
+
+        self.assertRaises(errors.APIError, client.request, 'get', URL, handled=True)
+        self.assertIsInstance(recorder.calls[1][4], requests.exceptions.ReadTimeout)
+
+        def fail(response):
+            raise ValueError(response)
+
+        response = client.request('get', URL, handled=True)
+        self.assertRaises(ValueError, client.handle_response, response, fail, response)
+        self.assertIsInstance(recorder.calls[3][4], ValueError)
+
+    def test_bytes_are_counted(self):
+        collector = HistogramCollector()
+        client = HttpClient(session=FakeSession(make_response(200, b'0123456789')), instrumentation=collector)
+
+        client.request('post', URL, post_data={'name': 'x'})
+
+        summary = collector.summary()['project-submit']
+        self.assertEqual(summary['requests'], 1)
+        self.assertEqual(summary['statuses'], {200: 1})
+        self.assertEqual(summary['bytes_sent'], len(b'{"name": "x"}'))
+        self.assertEqual(summary['bytes_received'], 10)
+
+    def test_endpoint_name(self):
+        self.assertEqual(endpoint_name('http://localhost:8090/project-status/my project'), 'project-status')
+        self.assertEqual(RequestInfo('get', 'http://localhost:8090/auth').endpoint, 'auth')
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram(bounds=(1, 2, 4, 8))
+        for value in (0.5, 1.5, 1.5, 3, 3, 3, 3, 6, 7, 20):
+            histogram.add(value)
+
+        self.assertEqual(histogram.counts, [1, 2, 4, 2, 1])
+        self.assertEqual(histogram.percentile(10), 1)
+        self.assertEqual(histogram.percentile(50), 4)
+        self.assertEqual(histogram.percentile(90), 8)
+        self.assertEqual(histogram.percentile(100), 20)
+        self.assertEqual(Histogram().percentile(50), 0)
+
+        summary = histogram.summary()
+        self.assertEqual((summary['count'], summary['max']), (10, 20))
+        self.assertAlmostEqual(summary['mean'], 4.85)
+
+    def test_collector_reset(self):
+        collector = HistogramCollector()
+        info = RequestInfo('get', URL)
+        info.status = 200
+        collector.after_request(info)
+
+        self.assertEqual(list(collector.summary()), ['project-submit'])
+        collector.reset()
+        self.assertEqual(collector.summary(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
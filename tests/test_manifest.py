@@ -0,0 +1,225 @@
+from __future__ import absolute_import
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from gridmarkets import EnvoyClient, Project
+from gridmarkets.envoy_client import upload_finished
+from gridmarkets.http_client import HttpClient
+from gridmarkets.manifest import MANIFEST_NAME, UploadManifest
+from gridmarkets.scanner import FileStat
+from .test_http_client import FakeSession, make_response
+
+STATS = {
+    'a.txt': FileStat(1, 100.0),
+    'b.txt': FileStat(2, 200.0),
+}
+
+
+class UploadManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, MANIFEST_NAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_new_files_are_changed(self):
+        manifest = UploadManifest(self.path, '/project').load()
+
+        self.assertEqual(manifest.entries, {})
+        self.assertEqual(manifest.changed(['a.txt', 'b.txt'], STATS.__getitem__), ['a.txt', 'b.txt'])
+
+    def test_size_and_mtime(self):
+        manifest = UploadManifest(self.path, '/project')
+        manifest.record(['a.txt', 'b.txt'], STATS.__getitem__)
+
+        stats = dict(STATS)
+        self.assertEqual(manifest.changed(['a.txt', 'b.txt'], stats.__getitem__), [])
+
+        stats['a.txt'] = FileStat(1, 101.0)
+        stats['b.txt'] = FileStat(3, 200.0)
+        self.assertEqual(manifest.changed(['a.txt', 'b.txt'], stats.__getitem__), ['a.txt', 'b.txt'])
+
+        # missing files are always uploaded, so the upload reports them
+        stats['a.txt'] = FileStat(None, None)
+        self.assertEqual(manifest.changed(['a.txt'], stats.__getitem__), ['a.txt'])
+
+    def test_digests(self):
+        manifest = UploadManifest(self.path, '/project')
+        manifest.record(['a.txt', 'b.txt'], STATS.__getitem__, {'a.txt': 'aaa'})
+
+        stats = {'a.txt': FileStat(1, 999.0), 'b.txt': FileStat(2, 200.0)}
+        digests = {'a.txt': 'aaa', 'b.txt': 'bbb'}
+
+        # a touched file with the same content is skipped, a file recorded without digest is sent
+        self.assertEqual(manifest.changed(['a.txt', 'b.txt'], stats.__getitem__, digests.__getitem__), ['b.txt'])
+
+        digests['a.txt'] = 'zzz'
+        self.assertEqual(manifest.changed(['a.txt'], stats.__getitem__, digests.__getitem__), ['a.txt'])
+
+    def test_record_drops_missing_files(self):
+        manifest = UploadManifest(self.path, '/project')
+        manifest.record(['a.txt'], STATS.__getitem__)
+        manifest.record(['a.txt'], lambda f: FileStat(None, None))
+
+        self.assertEqual(manifest.entries, {})
+
+    def test_save_and_load(self):
+        manifest = UploadManifest(self.path, '/project')
+        manifest.record(['a.txt', 'b.txt'], STATS.__getitem__, {'b.txt': 'bbb'})
+        manifest.save()
+
+        loaded = UploadManifest(self.path, '/project').load()
+        self.assertEqual(loaded.entries, manifest.entries)
+        self.assertEqual(loaded.changed(['a.txt', 'b.txt'], STATS.__getitem__), [])
+
+    def test_other_remote_root_is_ignored(self):
+        manifest = UploadManifest(self.path, '/project')
+        manifest.record(['a.txt'], STATS.__getitem__)
+        manifest.save()
+
+        self.assertEqual(UploadManifest(self.path, '/other').load().entries, {})
+
+    def test_invalid_files_are_empty(self):
+        for content in (b'{not json', json.dumps([1, 2]).encode('utf-8'),
+                        json.dumps({'version': 0, 'files': {'a.txt': [1, 100.0, None]}}).encode('utf-8')):
+            with open(self.path, 'wb') as f:
+                f.write(content)
+            self.assertEqual(UploadManifest(self.path, '/project').load().entries, {})
+
+
+class ProjectFolderMixin(object):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for name in ('a.txt', 'b.txt', 'c.txt'):
+            self.write(name, name[0], 1000000000)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, name, content, mtime):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def project(self, verify_upload_hashes=False):
+        project = Project(self.folder, 'project')
+        project.incremental_upload = True
+        project.verify_upload_hashes = verify_upload_hashes
+        project.hash_workers = 1
+        project.add_folders(self.folder)
+        return project
+
+
+class IncrementalUploadTest(ProjectFolderMixin, unittest.TestCase):
+
+    def test_only_changed_files_are_uploaded(self):
+        for verify in (False, True):
+            project = self.project(verify)
+            self.assertEqual(sorted(project.upload_files()), ['a.txt', 'b.txt', 'c.txt'])
+            project.record_upload()
+
+            project = self.project(verify)
+            self.assertEqual(project.upload_files(), [])
+
+            os.remove(os.path.join(self.folder, MANIFEST_NAME))
+
+    def test_manifest_is_not_uploaded(self):
+        project = self.project()
+        project.upload_files()
+        project.record_upload()
+
+        self.assertNotIn(MANIFEST_NAME, self.project().files)
+
+    def test_files_edited_after_adding_are_uploaded(self):
+        project = self.project()
+        project.upload_files()
+        project.record_upload()
+
+        # the same project is submitted again after a file was edited, its scan is outdated
+        self.write('a.txt', 'A', 1000000100)
+        self.assertEqual(project.upload_files(), ['a.txt'])
+
+    def test_same_size_edits_with_digests(self):
+        project = self.project(verify_upload_hashes=True)
+        project.upload_files()
+        project.record_upload()
+
+        # a content change keeping the size and mtime, and a touched file
+        self.write('a.txt', 'Z', 1000000000)
+        self.write('b.txt', 'b', 1000000100)
+        self.assertEqual(self.project(verify_upload_hashes=True).upload_files(), ['a.txt'])
+
+        # a digest is recomputed once the stat of its file changes
+        self.write('c.txt', 'Z', 1000000100)
+        self.assertIn('c.txt', project.upload_files())
+
+    def test_files_edited_during_upload_are_sent_again(self):
+        project = self.project()
+        project.upload_files()
+
+        self.write('b.txt', 'B', 1000000100)
+        project.record_upload()
+
+        self.assertEqual(project.upload_files(), ['b.txt'])
+
+
+UPLOADING = {'Code': 200, 'State': 'Uploading', 'BytesDone': 10, 'BytesTotal': 30}
+SUBMITTED = {'Code': 200, 'State': 'Submitted', 'BytesDone': 30, 'BytesTotal': 30}
+
+
+class RecordUploadTest(ProjectFolderMixin, unittest.TestCase):
+
+    def client(self, *responses):
+        client = EnvoyClient(email='EMAIL_ADDRESS', access_key='ACCESS_KEY', url='http://envoy.test')
+        client.validation_cache.mark_valid('auth')
+        client.validation_cache.mark_valid('credits')
+        client.http_client = HttpClient(session=FakeSession(*responses))
+        return client
+
+    def test_upload_finished(self):
+        self.assertTrue(upload_finished(SUBMITTED))
+        self.assertTrue(upload_finished({'State': 'Rendering'}))
+        self.assertFalse(upload_finished(UPLOADING))
+        self.assertFalse(upload_finished({'State': 'Queued', 'BytesDone': 10, 'BytesTotal': 30}))
+        self.assertFalse(upload_finished({'State': 'Cancelled', 'BytesDone': 30, 'BytesTotal': 30}))
+        self.assertFalse(upload_finished({}))
+
+    def test_accepted_submissions_are_not_recorded(self):
+        project = self.project()
+        client = self.client(make_response(201), make_response(200, json.dumps(UPLOADING).encode('utf-8')))
+
+        client.submit_project(project)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, MANIFEST_NAME)))
+
+        # the transfer is still running
+        self.assertFalse(client.record_upload(project))
+        self.assertEqual(len(self.project().upload_files()), 3)
+
+    def test_finished_uploads_are_recorded(self):
+        project = self.project()
+        client = self.client(make_response(200, json.dumps({'ID': 'project'}).encode('utf-8')),
+                             make_response(200, json.dumps(SUBMITTED).encode('utf-8')))
+
+        client.upload_project_files(project)
+        self.assertEqual(len(self.project().upload_files()), 3)
+
+        self.assertTrue(client.record_upload(project))
+        self.assertEqual(self.project().upload_files(), [])
+
+    def test_failed_uploads_are_sent_again(self):
+        project = self.project()
+        client = self.client()
+
+        project.upload_files()
+        self.assertFalse(client.record_upload(project, {'State': 'Failed'}))
+        self.assertEqual(len(self.project().upload_files()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
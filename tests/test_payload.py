@@ -0,0 +1,126 @@
+from __future__ import absolute_import
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from gridmarkets import Project
+from gridmarkets.payload import (FILES_ENCODINGS, FILES_FLAT, FILES_GROUPED, FILES_TREE, JsonArray, JsonObject,
+                                 JsonStream, decode_files, encode_files, negotiate_encoding)
+
+FILES = ['scene.hip', 'tex/a.exr', 'tex/b.exr', 'geo/sim/0001.bgeo', 'tex/c.exr', 'geo/sim/0002.bgeo', 'readme']
+
+
+class FilesEncodingTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for encoding in FILES_ENCODINGS:
+            decoded = decode_files(encode_files(FILES, encoding))
+
+            # the tree encoding lists the files folder by folder
+            if encoding == FILES_TREE:
+                self.assertEqual(sorted(decoded), sorted(FILES))
+            else:
+                self.assertEqual(decoded, FILES)
+
+            self.assertEqual(decode_files(encode_files([], encoding)), [])
+
+    def test_flat_is_unchanged(self):
+        self.assertEqual(encode_files(FILES), {'files': FILES})
+
+    def test_grouped_keeps_runs(self):
+        self.assertEqual(encode_files(FILES, FILES_GROUPED), {
+            'filesEncoding': FILES_GROUPED,
+            'files': [['', ['scene.hip']], ['tex/', ['a.exr', 'b.exr']], ['geo/sim/', ['0001.bgeo']],
+                      ['tex/', ['c.exr']], ['geo/sim/', ['0002.bgeo']], ['', ['readme']]],
+        })
+
+    def test_tree(self):
+        self.assertEqual(encode_files(['a/b/c', 'a/d', 'e'], FILES_TREE), {
+            'filesEncoding': FILES_TREE,
+            'files': [['e'], {'a': [['d'], {'b': [['c'], {}]}]}],
+        })
+
+    def test_unknown_encoding(self):
+        self.assertRaises(ValueError, encode_files, FILES, 'zip')
+        self.assertRaises(ValueError, decode_files, {'filesEncoding': 'zip', 'files': []})
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding(None), FILES_FLAT)
+        self.assertEqual(negotiate_encoding(''), FILES_FLAT)
+        self.assertEqual(negotiate_encoding('zip'), FILES_FLAT)
+        self.assertEqual(negotiate_encoding('tree'), FILES_TREE)
+        self.assertEqual(negotiate_encoding('Tree, GROUPED'), FILES_GROUPED)
+
+
+def stream_json(stream):
+    return json.loads(b''.join(stream).decode('utf-8'))
+
+
+class JsonStreamTest(unittest.TestCase):
+
+    def test_plain_values(self):
+        for value in ({}, {'a': [1, 2.5, None, True], 'b': {'c': u'\u00e9'}}, [], 'text', 3):
+            self.assertEqual(stream_json(JsonStream(value)), value)
+
+    def test_arrays_and_objects(self):
+        files = ['file{0}.exr'.format(i) for i in range(2000)]
+        value = {
+            'files': JsonArray(files),
+            'digests': JsonObject((f, i) for i, f in enumerate(files[:10])),
+            'mixed': JsonArray(['a', {'b': JsonArray([1, 2])}, JsonArray([]), 'c'] + files),
+            'empty': JsonArray([]),
+        }
+
+        self.assertEqual(stream_json(JsonStream(value)), {
+            'files': files,
+            'digests': dict((f, i) for i, f in enumerate(files[:10])),
+            'mixed': ['a', {'b': [1, 2]}, [], 'c'] + files,
+            'empty': [],
+        })
+
+    def test_chunks(self):
+        value = {'files': JsonArray(['file{0}.exr'.format(i) for i in range(1000)])}
+        chunks = list(JsonStream(value, chunk_size=1024))
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertTrue(all(len(chunk) >= 1024 for chunk in chunks[:-1]))
+        self.assertEqual(stream_json(chunks), stream_json(JsonStream(value)))
+
+    def test_can_be_sent_again(self):
+        stream = JsonStream({'files': JsonArray(lambda: iter(['a', 'b']))})
+
+        self.assertEqual(stream_json(stream), stream_json(stream))
+
+
+class ProjectPayloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for path in FILES:
+            path = os.path.join(self.folder, *path.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_streamed_payloads_match(self):
+        for encoding in FILES_ENCODINGS:
+            for include_digests in (False, True):
+                project = Project(self.folder, 'project')
+                project.files_encoding = encoding
+                project.include_digests = include_digests
+                project.hash_workers = 1
+                project.add_folders(self.folder)
+                self.assertEqual(sorted(project.files), sorted(FILES))
+
+                self.assertEqual(stream_json(project.serialize_stream), json.loads(json.dumps(project.serialize)))
+                self.assertEqual(stream_json(project.upload_serialize_stream),
+                                 json.loads(json.dumps(project.upload_serialize)))
+
+
+if __name__ == '__main__':
+    unittest.main()
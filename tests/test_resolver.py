@@ -0,0 +1,310 @@
+from __future__ import absolute_import
+import copy
+import os
+import random
+import re
+import shutil
+import tempfile
+import unittest
+from gridmarkets import Resolver
+from gridmarkets.resolver import SNAPSHOT_MAGIC
+from gridmarkets.versions import version_key
+
+APP_TYPES = ['hou', 'nuke', 'maya', 'c4d']
+PLUGIN_TYPES = ['hou_redshift', 'hou_arnold', 'maya_vray', 'nuke_ofx']
+VERSION_FORMATS = ['{0}.{1}.{2}', '{0}.{1}', '{0}', '{0}.{1}v{2}']
+
+
+def make_products(rnd, count=60):
+    """ returns a random catalog with duplicate, partial and Nuke style versions """
+
+    def version():
+        return rnd.choice(VERSION_FORMATS).format(rnd.randint(1, 20), rnd.randint(0, 9), rnd.randint(0, 300))
+
+    products = dict()
+    while len(products) < count:
+        app_type = rnd.choice(APP_TYPES)
+        modules = ['{0}:{1}'.format(rnd.choice(PLUGIN_TYPES), version()) for _ in range(rnd.randint(0, 5))]
+        product = {'app_type': app_type, 'version': version(), 'compatible_modules': modules}
+        products.setdefault('{0}:{1}'.format(app_type, product['version']), product)
+
+    return list(products.values())
+
+
+def make_queries(rnd, products, count=60):
+    nodes = ['{0}:{1}'.format(p['app_type'], p['version']) for p in products]
+    nodes.extend(m for p in products for m in p['compatible_modules'])
+
+    queries = list()
+    for _ in range(count):
+        query = list()
+        for _ in range(rnd.randint(1, 3)):
+            node = rnd.choice(nodes)
+            item_type, version = node.split(':')
+            query.append(rnd.choice([item_type, node, '{0}:{1}'.format(item_type, version.split('.')[0]),
+                                     'hou.*:1', 'unknown:1']))
+        queries.append(query)
+
+    return queries
+
+
+def reference_combinations(products, query, strict_version_matches, include_query_types):
+    """ the resolver's original algorithm, matching every query item against every edge of the catalog """
+
+    edges = [('{0}:{1}'.format(p['app_type'], p['version']), m) for p in products for m in p['compatible_modules']]
+    is_plugin = dict((m, True) for p in products for m in p['compatible_modules'])
+    is_plugin.update(('{0}:{1}'.format(p['app_type'], p['version']), False) for p in products)
+
+    qry_item_types = [item.split(':')[0] for item in query]
+
+    if strict_version_matches:
+        matches = set([e[1] for e in edges if e[0] in query] + [e[0] for e in edges if e[1] in query])
+    else:
+        re_queries = [re.compile((item if ':' in item else item + ':[0-9]+') + '(\\.|$|(?<=[0-9])[v])')
+                      for item in query]
+
+        matches = set()
+        for edge in edges:
+            for re_query in re_queries:
+                if re_query.match(edge[0]) or re_query.match(edge[1]):
+                    matches.update(edge)
+
+        # the original pruned with the set being rebuilt inside the loop, kept as is
+        pruned_matches = set()
+        non_queried_matches = set()
+        for match in matches:
+            for re_query in re_queries:
+                if re_query.match(match):
+                    pruned_matches.add(match)
+                elif match.split(':')[0] not in qry_item_types:
+                    non_queried_matches.add(match)
+            matches = pruned_matches
+
+        for non_queried_match in non_queried_matches:
+            for edge in edges:
+                if non_queried_match in edge and (edge[0] in matches or edge[1] in matches):
+                    matches.add(non_queried_match)
+
+    result = dict()
+    for item in matches:
+        item_type, item_version = item.split(':')
+        if item_type not in qry_item_types or include_query_types:
+            entry = result.setdefault(item_type, {'is_plugin': is_plugin[item], 'versions': list()})
+            entry['versions'].append(item_version)
+
+    for entry in result.values():
+        entry['versions'].sort(key=version_key)
+
+    return result
+
+
+def normalized(result):
+    # versions with equal sort keys, ex. 1.0 and 1.00, may come in any order
+    return dict((item_type, (entry['is_plugin'], sorted(entry['versions'], key=lambda v: (version_key(v), v))))
+                for item_type, entry in result.items())
+
+
+class ResolverEquivalenceTest(unittest.TestCase):
+
+    def test_matches_original_algorithm(self):
+        for seed in range(5):
+            rnd = random.Random(seed)
+            products = make_products(rnd)
+
+            for compact in (False, True):
+                resolver = Resolver(products, compact=compact)
+
+                for query in make_queries(rnd, products):
+                    for strict in (False, True):
+                        for include in (False, True):
+                            self.assertEqual(
+                                normalized(resolver.get_compatible_combinations(query, strict, include)),
+                                normalized(reference_combinations(products, query, strict, include)),
+                                (seed, compact, query, strict, include))
+
+    def test_versions_by_type(self):
+        products = [
+            {'app_type': 'nuke', 'version': '10.5v1', 'compatible_modules': ['nuke_ofx:2.0']},
+            {'app_type': 'nuke', 'version': '9.0v9', 'compatible_modules': ['nuke_ofx:1.10']},
+            {'app_type': 'nuke', 'version': '10.0v4', 'compatible_modules': ['nuke_ofx:1.9']},
+        ]
+        resolver = Resolver(products)
+
+        self.assertEqual(list(resolver.get_versions_by_type('nuke')), ['9.0v9', '10.0v4', '10.5v1'])
+        self.assertEqual(list(resolver.get_versions_by_type('nuke_ofx')), ['1.9', '1.10', '2.0'])
+        self.assertEqual(list(resolver.get_versions_by_type('unknown')), [])
+        self.assertEqual(resolver.get_all_types(), {
+            'nuke': {'is_plugin': False, 'versions': ['9.0v9', '10.0v4', '10.5v1']},
+            'nuke_ofx': {'is_plugin': True, 'versions': ['1.9', '1.10', '2.0']},
+        })
+
+    def test_invalid_query(self):
+        resolver = Resolver([])
+
+        for query in (None, [], 'hou'):
+            self.assertRaises(ValueError, resolver.get_compatible_combinations, query)
+
+
+class ResolveManyTest(unittest.TestCase):
+
+    def test_same_results_as_single_queries(self):
+        rnd = random.Random(0)
+        products = make_products(rnd)
+        queries = make_queries(rnd, products)
+        resolver = Resolver(products)
+
+        for strict in (False, True):
+            self.assertEqual(resolver.resolve_many(queries, strict),
+                             [Resolver(products).get_compatible_combinations(q, strict) for q in queries])
+
+    def test_accepts_generators(self):
+        rnd = random.Random(1)
+        products = make_products(rnd)
+        queries = make_queries(rnd, products, count=10)
+        resolver = Resolver(products)
+
+        self.assertEqual(resolver.resolve_many(q for q in queries), resolver.resolve_many(queries))
+
+    def test_results_are_copies(self):
+        products = [{'app_type': 'hou', 'version': '17.5.229', 'compatible_modules': ['hou_redshift:2.6.41']}]
+        resolver = Resolver(products)
+
+        resolver.resolve_many([['hou']])[0]['hou_redshift']['versions'].append('9.9')
+        self.assertEqual(resolver.resolve_many([['hou']]),
+                         [{'hou_redshift': {'is_plugin': True, 'versions': ['2.6.41']}}])
+
+    def test_invalid_query(self):
+        self.assertRaises(ValueError, Resolver([]).resolve_many, [['hou'], 'hou'])
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'resolver.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        rnd = random.Random(2)
+        products = make_products(rnd)
+        queries = make_queries(rnd, products)
+
+        for compact in (False, True):
+            resolver = Resolver(products, compact=compact)
+            resolver.save(self.path)
+            loaded = Resolver.load(self.path)
+
+            self.assertEqual(loaded.products, products)
+            self.assertEqual(loaded.graph.order(), resolver.graph.order())
+            self.assertEqual(loaded.graph.size(), resolver.graph.size())
+            self.assertEqual(loaded.get_all_types(), resolver.get_all_types())
+            for strict in (False, True):
+                self.assertEqual(loaded.resolve_many(queries, strict), resolver.resolve_many(queries, strict))
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        self.assertRaises(ValueError, Resolver.load, self.path)
+
+    def test_rejects_other_versions(self):
+        Resolver(make_products(random.Random(3))).save(self.path)
+
+        with open(self.path, 'rb') as f:
+            content = bytearray(f.read())
+        content[len(SNAPSHOT_MAGIC)] += 1
+        with open(self.path, 'wb') as f:
+            f.write(bytes(content))
+
+        self.assertRaises(ValueError, Resolver.load, self.path)
+
+
+class ApplyDeltaTest(unittest.TestCase):
+
+    def assertSameResolver(self, resolver, expected, queries):
+        self.assertEqual(resolver.graph.order(), expected.graph.order())
+        self.assertEqual(resolver.graph.size(), expected.graph.size())
+        self.assertEqual(normalized(resolver.get_all_types()), normalized(expected.get_all_types()))
+        for strict in (False, True):
+            self.assertEqual([normalized(r) for r in resolver.resolve_many(queries, strict)],
+                             [normalized(r) for r in expected.resolve_many(queries, strict)])
+
+    def check_deltas(self, resolver, catalog, extra, rnd, compact):
+        plugins = sorted(set(m for p in list(catalog.values()) + extra for m in p['compatible_modules']))
+
+        for _ in range(5):
+            removed = rnd.sample(list(catalog.values()), 8)
+            added = [extra.pop() for _ in range(4)]
+
+            changed = list()
+            for product in rnd.sample([p for p in catalog.values() if p not in removed], 8):
+                product = copy.deepcopy(product)
+                modules = product['compatible_modules']
+                product['compatible_modules'] = (rnd.sample(modules, rnd.randint(0, len(modules))) +
+                                                 rnd.sample(plugins, 2))
+                changed.append(product)
+
+            # answer a query first so the delta must clear the query cache
+            resolver.get_compatible_combinations(['hou'])
+            resolver.apply_delta(added=added, removed=removed, changed=changed)
+
+            for product in removed:
+                del catalog['{0}:{1}'.format(product['app_type'], product['version'])]
+            for product in added + changed:
+                catalog['{0}:{1}'.format(product['app_type'], product['version'])] = product
+
+            products = list(catalog.values())
+            self.assertSameResolver(resolver, Resolver(products, compact=compact), make_queries(rnd, products))
+
+    def test_matches_rebuilt_resolver(self):
+        for seed in range(5):
+            rnd = random.Random(seed)
+            products = make_products(rnd, 100)
+
+            for compact in (False, True):
+                catalog = dict(('{0}:{1}'.format(p['app_type'], p['version']), p) for p in products[:80])
+                resolver = Resolver(list(catalog.values()), compact=compact)
+                self.check_deltas(resolver, catalog, list(products[80:]), rnd, compact)
+
+    def test_loaded_snapshot(self):
+        folder = tempfile.mkdtemp()
+        try:
+            rnd = random.Random(5)
+            products = make_products(rnd, 100)
+            catalog = dict(('{0}:{1}'.format(p['app_type'], p['version']), p) for p in products[:80])
+
+            path = os.path.join(folder, 'resolver.snapshot')
+            Resolver(list(catalog.values())).save(path)
+            self.check_deltas(Resolver.load(path), catalog, list(products[80:]), rnd, True)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_unknown_and_orphaned_nodes(self):
+        products = [
+            {'app_type': 'hou', 'version': '17.5.229', 'compatible_modules': ['hou_redshift:2.6.41']},
+            {'app_type': 'hou', 'version': '18.0.287', 'compatible_modules': ['hou_redshift:2.6.41',
+                                                                              'hou_redshift:3.0.13']},
+        ]
+        resolver = Resolver(products)
+
+        resolver.apply_delta(removed=[{'app_type': 'maya', 'version': '2019', 'compatible_modules': []},
+                                      products[1]])
+
+        self.assertEqual(resolver.products, products[:1])
+        self.assertEqual(resolver.get_all_types(), {
+            'hou': {'is_plugin': False, 'versions': ['17.5.229']},
+            'hou_redshift': {'is_plugin': True, 'versions': ['2.6.41']},
+        })
+
+    def test_products_setter_rebuilds(self):
+        rnd = random.Random(6)
+        products = make_products(rnd)
+        resolver = Resolver(make_products(rnd))
+
+        resolver.products = products
+        self.assertSameResolver(resolver, Resolver(products), make_queries(rnd, products))
+
+
+if __name__ == '__main__':
+    unittest.main()
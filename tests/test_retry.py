@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+import time
+import unittest
+from email.utils import formatdate
+from gridmarkets import errors
+from gridmarkets.retry import CircuitBreaker, RetryPolicy, parse_retry_after
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def test_backoff_doubles_up_to_max_backoff(self):
+        policy = RetryPolicy(backoff=0.5, max_backoff=3, jitter=False)
+
+        self.assertEqual([policy.backoff_delay(attempt) for attempt in range(1, 6)], [0.5, 1, 2, 3, 3])
+
+    def test_full_jitter(self):
+        policy = RetryPolicy(backoff=1, max_backoff=30)
+
+        delays = [policy.backoff_delay(3) for _ in range(200)]
+        self.assertTrue(all(0 <= delay <= 4 for delay in delays))
+        self.assertTrue(len(set(delays)) > 100)
+
+    def test_error_delay(self):
+        policy = RetryPolicy(max_attempts=3, jitter=False)
+
+        self.assertEqual(policy.error_delay(1, idempotent=True, sent=True), 0.5)
+        # requests which may have reached the server are only sent again if idempotent
+        self.assertIsNone(policy.error_delay(1, idempotent=False, sent=True))
+        self.assertEqual(policy.error_delay(1, idempotent=False, sent=False), 0.5)
+        self.assertIsNone(policy.error_delay(3, idempotent=True, sent=False))
+
+    def test_response_delay(self):
+        policy = RetryPolicy(max_attempts=3, max_backoff=10, jitter=False)
+
+        self.assertEqual(policy.response_delay(2, True, 503), 1)
+        self.assertIsNone(policy.response_delay(1, True, 500))
+        self.assertIsNone(policy.response_delay(1, False, 503))
+        self.assertIsNone(policy.response_delay(3, True, 503))
+
+        # Retry-After waits longer than the backoff, and gives up past max_backoff
+        self.assertEqual(policy.response_delay(1, True, 429, '5'), 5)
+        self.assertEqual(policy.response_delay(2, True, 429, '0'), 1)
+        self.assertIsNone(policy.response_delay(1, True, 429, '60'))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('12'), 12)
+        self.assertEqual(parse_retry_after('-3'), 0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after(formatdate(0, usegmt=True)), 0)
+        self.assertAlmostEqual(parse_retry_after(formatdate(time.time() + 60, usegmt=True)), 60, delta=2)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=self.clock)
+
+    def open_circuit(self):
+        for _ in range(3):
+            self.breaker.allow()
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertRaises(errors.CircuitOpenError, self.breaker.allow)
+
+    def test_trial_request_after_reset_timeout(self):
+        self.open_circuit()
+
+        self.clock.now += 29
+        self.assertRaises(errors.CircuitOpenError, self.breaker.allow)
+
+        self.clock.now += 1
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.breaker.allow()
+
+        # only one trial request at a time
+        self.assertRaises(errors.CircuitOpenError, self.breaker.allow)
+
+    def test_trial_success_closes(self):
+        self.open_circuit()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.allow()
+        self.breaker.allow()
+
+    def test_trial_failure_opens_again(self):
+        self.open_circuit()
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertRaises(errors.CircuitOpenError, self.breaker.allow)
+
+        self.clock.now += 30
+        self.breaker.allow()
+
+
+if __name__ == '__main__':
+    unittest.main()
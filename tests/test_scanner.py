@@ -0,0 +1,166 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+from gridmarkets import Project, scanner
+from gridmarkets.scanner import FileStat, PathMatcher, scan_folder
+
+# folders whose listing fails, like folders without read permission, which root can list anyway
+LOCKED = 'locked'
+
+
+class ScannerMixin(object):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.listed = list()
+        self.scandir = scanner.scandir
+        self.os_scandir = os.scandir
+        scanner.scandir = os.scandir = self.failing_scandir
+
+    def tearDown(self):
+        scanner.scandir = self.scandir
+        os.scandir = self.os_scandir
+        shutil.rmtree(self.root)
+
+    def failing_scandir(self, path):
+        self.listed.append(path)
+        if os.path.basename(path) == LOCKED:
+            raise OSError(13, 'Permission denied', path)
+        return self.os_scandir(path)
+
+    def write(self, *names):
+        for name in names:
+            path = os.path.join(self.root, *name.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(name.encode('utf-8'))
+
+    def walk(self, path, exclude=lambda rel_path, name: False):
+        """ returns the files os.walk lists under path, relative to the root and '/' separated """
+
+        files = list()
+        for folder, dirs, names in os.walk(path):
+            rel_folder = os.path.relpath(folder, self.root).replace(os.sep, '/')
+            rel_folder = '' if rel_folder == '.' else rel_folder + '/'
+
+            dirs[:] = [d for d in dirs if not exclude(rel_folder + d, d)]
+            files.extend(rel_folder + name for name in names if not exclude(rel_folder + name, name))
+        return files
+
+
+class ScanFolderTest(ScannerMixin, unittest.TestCase):
+
+    def make_tree(self):
+        self.write('scene.hip', 'tex/a.png', 'tex/b.png', 'tex/udim/c.1001.exr', 'tex/udim/c.1002.exr',
+                   'geo/sim/v1/frame.0001.bgeo', 'geo/sim/v1/frame.0002.bgeo', 'geo/cache.abc',
+                   'locked/hidden.exr', 'renders/locked/hidden.exr', 'renders/beauty.0001.exr')
+        os.makedirs(os.path.join(self.root, 'empty', 'nested'))
+
+        if hasattr(os, 'symlink'):
+            os.symlink(os.path.join(self.root, 'tex'), os.path.join(self.root, 'linked_tex'))
+            os.symlink(os.path.join(self.root, 'scene.hip'), os.path.join(self.root, 'geo', 'linked.hip'))
+            os.symlink(os.path.join(self.root, 'missing'), os.path.join(self.root, 'broken'))
+
+    def test_same_files_as_os_walk(self):
+        self.make_tree()
+        expected = self.walk(self.root)
+
+        self.assertIn('tex/udim/c.1002.exr', expected)
+        self.assertNotIn('locked/hidden.exr', expected)
+        if hasattr(os, 'symlink'):
+            # links to files are listed, even broken ones, links to folders are not followed
+            self.assertIn('geo/linked.hip', expected)
+            self.assertIn('broken', expected)
+            self.assertFalse([f for f in expected if f.startswith('linked_tex')])
+
+        for workers in (1, 2, 8):
+            self.assertEqual([f for f, _ in scan_folder(self.root, self.root, workers)], expected)
+
+    def test_sub_folder_paths_are_relative_to_root(self):
+        self.make_tree()
+        folder = os.path.join(self.root, 'geo')
+
+        files = [f for f, _ in scan_folder(folder, self.root)]
+
+        self.assertEqual(files, self.walk(folder))
+        self.assertTrue(all(f.startswith('geo/') for f in files))
+
+    def test_stats(self):
+        self.make_tree()
+
+        for path, stat in scan_folder(self.root, self.root, stat=True):
+            full_path = os.path.join(self.root, path)
+            if os.path.exists(full_path):
+                st = os.stat(full_path)
+                self.assertEqual(stat, FileStat(st.st_size, st.st_mtime))
+            else:
+                # broken symbolic links are listed like os.walk does, without a stat
+                self.assertEqual(stat, FileStat(None, None))
+
+        self.assertEqual(set(stat for _, stat in scan_folder(self.root, self.root)), set([None]))
+
+    def test_missing_folder(self):
+        self.assertEqual(scan_folder(os.path.join(self.root, 'missing'), self.root), [])
+
+
+class FilterTest(ScannerMixin, unittest.TestCase):
+
+    def test_name_and_path_patterns(self):
+        matcher = PathMatcher(['*.tmp', '.git', 'cache/sim', '/renders/old/*'])
+
+        # patterns without a '/' match the name at any depth
+        self.assertTrue(matcher.match('a/b/file.tmp', 'file.tmp'))
+        self.assertTrue(matcher.match('shots/.git', '.git'))
+        self.assertFalse(matcher.match('a/file.tmp.exr', 'file.tmp.exr'))
+
+        # patterns with a '/' match the whole path from the scanned root
+        self.assertTrue(matcher.match('cache/sim', 'sim'))
+        self.assertFalse(matcher.match('shots/cache/sim', 'sim'))
+        self.assertFalse(matcher.match('sim', 'sim'))
+        self.assertTrue(matcher.match('renders/old/beauty.exr', 'beauty.exr'))
+        self.assertTrue(matcher.match('renders/old/v1/beauty.exr', 'beauty.exr'))
+
+        self.assertTrue(PathMatcher('*.tmp').match('file.tmp', 'file.tmp'))
+        self.assertFalse(PathMatcher([]).match('file.tmp', 'file.tmp'))
+
+    def test_excluded_folders_are_pruned(self):
+        self.write('scene.hip', 'scene.hip.tmp', '.git/objects/ab', 'cache/sim/frame.0001.bgeo',
+                   'shots/cache/sim/frame.0001.bgeo', 'shots/cache/sim.tmp/frame.0001.bgeo')
+        exclude = ['*.tmp', '.git', 'cache/sim']
+
+        files = [f for f, _ in scan_folder(self.root, self.root, exclude=exclude)]
+
+        # excluded folders are not listed at all
+        listed = [os.path.relpath(path, self.root).replace(os.sep, '/') for path in self.listed]
+        self.assertEqual(sorted(listed), ['.', 'cache', 'shots', 'shots/cache', 'shots/cache/sim'])
+
+        self.assertEqual(files, self.walk(self.root, PathMatcher(exclude).match))
+        self.assertEqual(sorted(files), ['scene.hip', 'shots/cache/sim/frame.0001.bgeo'])
+
+    def test_include_patterns_keep_walking_folders(self):
+        self.write('scene.hip', 'renders/beauty.0001.exr', 'renders/v1/beauty.0001.exr', 'renders/v1/notes.txt')
+
+        files = [f for f, _ in scan_folder(self.root, self.root, include=['*.exr', 'scene.*'], exclude='v1')]
+        self.assertEqual(sorted(files), ['renders/beauty.0001.exr', 'scene.hip'])
+
+        files = [f for f, _ in scan_folder(self.root, self.root, include=PathMatcher('renders/*.exr'))]
+        self.assertEqual(sorted(files), ['renders/beauty.0001.exr', 'renders/v1/beauty.0001.exr'])
+
+    def test_add_folders(self):
+        self.write('scene.hip', 'tex/a.png', 'tex/a.png.tmp', 'cache/sim/frame.0001.bgeo')
+        project = Project(self.root, 'project')
+
+        project.add_folders('tex', 'cache', exclude=['*.tmp', 'cache/sim'])
+        self.assertEqual(list(project.files), ['tex/a.png'])
+
+        project.add_folders(self.root, include='*.hip')
+        self.assertEqual(list(project.files), ['tex/a.png', 'scene.hip'])
+
+        self.assertRaises(TypeError, project.add_folders, self.root, exlude=['*.tmp'])
+
+
+if __name__ == '__main__':
+    unittest.main()
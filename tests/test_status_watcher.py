@@ -0,0 +1,117 @@
+from __future__ import absolute_import
+import unittest
+from gridmarkets import StatusWatcher, errors
+
+
+class FakeClock(object):
+    """Clock whose sleep advances the time, recording the sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = list()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeClient(object):
+    """Answers get_project_status with the queued states of every project, repeating the last one"""
+
+    def __init__(self, clock, states):
+        self.clock = clock
+        self.states = dict((name, list(states)) for name, states in states.items())
+        self.polls = list()
+
+    def get_project_status(self, name):
+        self.polls.append((self.clock(), name))
+        states = self.states[name]
+        state = states.pop(0) if len(states) > 1 else states[0]
+
+        if isinstance(state, Exception):
+            raise state
+        return {'State': state}
+
+
+class StatusWatcherTest(unittest.TestCase):
+
+    def watcher(self, states, **kwargs):
+        self.clock = FakeClock()
+        self.client = FakeClient(self.clock, states)
+        return StatusWatcher(self.client, active_interval=2, idle_interval=5, max_interval=30, backoff=2,
+                             clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def polls(self, name):
+        return [time for time, polled in self.client.polls if polled == name]
+
+    def test_submitted_projects_stop_watching(self):
+        watcher = self.watcher({'p': ['Uploading', 'Uploading', 'Submitted']})
+        watcher.add('p')
+
+        transitions = [(t.previous_state, t.state, t.is_terminal) for t in watcher.watch(timeout=1000)]
+
+        self.assertEqual(transitions, [(None, 'Uploading', False), ('Uploading', 'Submitted', True)])
+        self.assertEqual(self.polls('p'), [0, 2, 4])
+        self.assertEqual(len(watcher), 0)
+
+    def test_idle_backoff_schedule(self):
+        watcher = self.watcher({'p': ['Queued'] * 6 + ['Rendering', 'Completed']})
+        watcher.add('p')
+
+        list(watcher.watch(timeout=1000))
+
+        # 5, 10, 20 then capped at 30 while queued, active polls every 2 seconds
+        self.assertEqual(self.polls('p'), [0, 5, 15, 35, 65, 95, 125, 127])
+        self.assertEqual(len(watcher), 0)
+
+    def test_projects_share_one_schedule(self):
+        watcher = self.watcher({
+            'a': ['Uploading', 'Uploading', 'Submitted'],
+            'b': ['Queued', 'Queued', 'Failed'],
+            'c': ['Completed'],
+        })
+        watcher.add('a', 'b', 'c')
+
+        states = dict()
+        for transition in watcher.watch(timeout=1000):
+            states.setdefault(transition.name, list()).append(transition.state)
+
+        self.assertEqual(states, {'a': ['Uploading', 'Submitted'], 'b': ['Queued', 'Failed'], 'c': ['Completed']})
+        self.assertEqual(self.polls('a'), [0, 2, 4])
+        self.assertEqual(self.polls('b'), [0, 5, 15])
+        self.assertEqual(self.polls('c'), [0])
+        self.assertEqual(len(watcher), 0)
+        # a single loop sleeps until the next project is due
+        self.assertEqual(self.clock.sleeps, [2, 2, 1, 10])
+
+    def test_errors_back_off(self):
+        watcher = self.watcher({'p': [errors.APIError('unavailable'), errors.APIError('unavailable'), 'Completed']})
+        watcher.add('p')
+
+        self.assertEqual([t.state for t in watcher.watch(timeout=1000)], ['Completed'])
+        self.assertEqual(self.polls('p'), [0, 5, 15])
+        self.assertEqual(watcher.last_errors, {})
+        self.assertEqual(len(watcher), 0)
+
+    def test_authentication_errors_are_raised(self):
+        watcher = self.watcher({'p': [errors.AuthenticationError('invalid key')]})
+        watcher.add('p')
+
+        self.assertRaises(errors.AuthenticationError, list, watcher.watch(timeout=1000))
+
+    def test_timeout_and_remove(self):
+        watcher = self.watcher({'p': ['Rendering'], 'q': ['Rendering']})
+        watcher.add('p', 'q')
+        watcher.remove('q')
+
+        self.assertEqual([t.name for t in watcher.watch(timeout=7)], ['p'])
+        self.assertEqual(self.polls('p'), [0, 2, 4, 6])
+        self.assertEqual(self.polls('q'), [])
+        self.assertIn('p', watcher)
+
+
+if __name__ == '__main__':
+    unittest.main()